@@ -0,0 +1,120 @@
+# answer_cache.py
+# generate_answer 앞단의 2단계 답변 캐시: 정규화된 질문 일치 → 질문 임베딩 코사인 유사도
+# 항목은 인덱스 버전별로 나뉘어 온톨로지가 다시 빌드되면 이전 답변은 쓰이지 않는다
+#
+# 의미 캐시(2단계)는 기본으로 꺼 둔다. 이 도메인의 질문은 같은 틀에 조건 하나만 바뀌는 경우가 많아
+# ("EXW면 누가 운송하나요?" / "FOB면 누가 운송하나요?") ada-002 임베딩 유사도가 0.95를 쉽게 넘고,
+# 그러면 다른 질문의 답변을 그대로 돌려주게 된다. 켤 때는 ANSWER_CACHE_SIMILARITY를 0.97 이상으로 두고
+# 자주 묻는 질문의 표현 차이(띄어쓰기·어미)만 흡수하는 용도로 쓴다. 정확 일치(1단계)는 정규화한 질문이
+# 같을 때만 적중하므로 이런 위험이 없다.
+
+import os
+import re
+import threading
+import time
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # 초
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# 의미 캐시로 재사용할 최소 코사인 유사도 (0이면 의미 캐시를 쓰지 않는다, 켤 때는 0.97 이상 권장)
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+def normalize_question(question: str) -> str:
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.？！。 ")
+
+class AnswerCache:
+    def __init__(
+        self,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+    def _expired(self, entry: Dict) -> bool:
+        return time.time() - entry["created"] > self.ttl
+
+    def _hit(self, key, entry: Dict) -> str:
+        self._entries.move_to_end(key)
+        self.latency_saved += entry["latency"]
+        return entry["answer"]
+
+    def get_exact(self, question: str, version: Hashable, variant: Hashable = None) -> Optional[str]:
+        key = (version, variant, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                return None
+            self.exact_hits += 1
+            return self._hit(key, entry)
+
+    def get_semantic(self, query_vector, version: Hashable, variant: Hashable = None) -> Optional[str]:
+        if self.similarity <= 0:
+            with self._lock:
+                self.misses += 1
+            return None
+        query = np.asarray(query_vector, dtype="float32")
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if key[:2] == (version, variant) and not self._expired(entry)
+            ]
+            if candidates:
+                matrix = np.stack([entry["vector"] for _, entry in candidates])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    self.semantic_hits += 1
+                    return self._hit(*candidates[best])
+            self.misses += 1
+            return None
+
+    def put(self, question: str, query_vector, answer: str, version: Hashable, latency: float, variant: Hashable = None):
+        vector = np.asarray(query_vector, dtype="float32")
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        key = (version, variant, normalize_question(question))
+        with self._lock:
+            self._entries[key] = {
+                "vector": vector,
+                "answer": answer,
+                "created": time.time(),
+                "latency": latency,
+            }
+            self._entries.move_to_end(key)
+            # 인덱스가 바뀌어 더 이상 쓰이지 않는 항목과 가장 오래 안 쓰인 항목부터 제거
+            for stale in [k for k in self._entries if k[0] != version]:
+                del self._entries[stale]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "latency_saved_seconds": self.latency_saved,
+        }
@@ -1,5 +1,21 @@
+import logging
 import streamlit as st
-from rag_query import generate_answer
+from rag_query import generate_answer_stream
+from metrics import start_metrics_server_from_env
+
+# 로깅 설정 (rag_query의 첫 토큰·전체 생성 시간 로그를 남긴다)
+# Streamlit은 질문마다 스크립트를 다시 실행하지만 basicConfig는 루트 핸들러가 있으면 아무것도 하지 않는다
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[
+        logging.FileHandler("rag_app.log", encoding="utf-8"),
+        logging.StreamHandler()
+    ],
+)
+
+# METRICS_PORT가 있으면 /metrics 노출 (Streamlit이 스크립트를 다시 실행해도 서버는 한 번만 뜬다)
+start_metrics_server_from_env()
 
 st.set_page_config(page_title="Ontology RAG QA", page_icon="🧠")
 st.title("📦 온톨로지 기반 RAG 질의응답")
@@ -7,7 +23,13 @@ st.title("📦 온톨로지 기반 RAG 질의응답")
 user_input = st.text_input("🗣️ 질문을 입력하세요", placeholder="예: 수출업체는 어떤 조건에서 운송을 담당하나요?")
 
 if user_input:
-    with st.spinner("🧠 GPT가 답변을 생성 중입니다..."):
-        answer = generate_answer(user_input)
     st.markdown("### 🤖 GPT 응답")
-    st.success(answer)
\ No newline at end of file
+    placeholder = st.empty()
+    tokens = generate_answer_stream(user_input)
+    # 스피너는 첫 토큰이 도착할 때까지만 표시하고, 이후에는 생성 중인 답변을 바로 갱신
+    with st.spinner("🧠 GPT가 답변을 생성 중입니다..."):
+        answer = next(tokens, "")
+    placeholder.success(answer)
+    for token in tokens:
+        answer += token
+        placeholder.success(answer)
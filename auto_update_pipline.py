@@ -2,13 +2,23 @@ import os
 import time
 import hashlib
 import logging
+import threading
 import requests
 from update_pipeline import main as run_pipeline
+from metrics import start_metrics_server_from_env
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog이 없으면 stat 기반 폴링으로 동작
+    Observer = None
+    FileSystemEventHandler = object
 
 # 환경 설정
 RDF_FILE = "./ontology/RDF_Forwarding.xml"  # 감지할 RDF/TTL/OWL 파일명
 FUSEKI_UPDATE_URL = "http://3.36.178.68:3030/dataset/data?graph=default"  # Fuseki 데이터셋 주소
-CHECK_INTERVAL = 10  # 변경 감지 주기 (초)
+CHECK_INTERVAL = 10  # watchdog이 없을 때 stat 확인 주기 (초)
+DEBOUNCE_SECONDS = 0.5  # 연속 저장을 한 번의 업데이트로 묶는 대기 시간
 
 # 로깅 설정
 logging.basicConfig(
@@ -21,8 +31,15 @@ logging.basicConfig(
 )
 
 def get_file_hash(path):
+    h = hashlib.md5()
     with open(path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def get_file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
 
 def update_fuseki(rdf_path):
     with open(rdf_path, "rb") as f:
@@ -31,26 +48,106 @@ def update_fuseki(rdf_path):
         res.raise_for_status()
     logging.info("✅ Fuseki에 RDF 업로드 완료")
 
-def watch_rdf_file():
-    if not os.path.exists(RDF_FILE):
-        logging.error(f"❌ {RDF_FILE} 파일이 존재하지 않습니다.")
-        return
+# 업데이트는 한 번에 하나만 실행하고, 실행 중에 들어온 변경은 후속 실행 한 번으로 합친다
+class SingleFlightUpdater:
+    def __init__(self, rdf_path):
+        self.rdf_path = rdf_path
+        self.last_hash = get_file_hash(rdf_path)
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+        self._timer = None
+
+    def notify(self):
+        # 디바운스: 마지막 이벤트 후 DEBOUNCE_SECONDS 동안 조용하면 실행
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(DEBOUNCE_SECONDS, self._request)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _request(self):
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._run_loop, daemon=True).start()
+
+    def _run_loop(self):
+        while True:
+            try:
+                self._update_if_changed()
+            except Exception as e:
+                logging.error(f"❌ 오류 발생: {e}")
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
 
-    last_hash = get_file_hash(RDF_FILE)
-    logging.info("👀 RDF 파일 변경 감지 시작...")
+    def _update_if_changed(self):
+        if not os.path.exists(self.rdf_path):
+            return
+        current_hash = get_file_hash(self.rdf_path)
+        if current_hash == self.last_hash:
+            return
+        started = time.perf_counter()
+        logging.info("🔄 RDF 파일 변경 감지됨. 업데이트 실행 중...")
+        update_fuseki(self.rdf_path)
+        run_pipeline()  # update_pipeline.py의 메인 함수 실행
+        self.last_hash = current_hash
+        logging.info(f"✅ 변경 처리 완료 ({time.perf_counter() - started:.1f}초)")
 
+class _RdfEventHandler(FileSystemEventHandler):
+    def __init__(self, rdf_path, updater):
+        self.rdf_path = os.path.abspath(rdf_path)
+        self.updater = updater
+
+    def on_any_event(self, event):
+        # 에디터는 임시 파일에 쓴 뒤 rename 하는 경우가 많아 이동 대상 경로도 확인
+        paths = {getattr(event, "src_path", None), getattr(event, "dest_path", None)}
+        if self.rdf_path in {os.path.abspath(p) for p in paths if p}:
+            self.updater.notify()
+
+def _watch_with_events(updater):
+    observer = Observer()
+    observer.schedule(_RdfEventHandler(RDF_FILE, updater), os.path.dirname(os.path.abspath(RDF_FILE)))
+    observer.start()
+    logging.info("👀 RDF 파일 변경 감지 시작 (파일 시스템 이벤트)")
+    try:
+        while observer.is_alive():
+            observer.join(1)
+    finally:
+        observer.stop()
+        observer.join()
+
+def _watch_with_polling(updater):
+    logging.info("👀 RDF 파일 변경 감지 시작 (stat 폴링)")
+    last_signature = get_file_signature(RDF_FILE)
     while True:
         try:
             time.sleep(CHECK_INTERVAL)
-            current_hash = get_file_hash(RDF_FILE)
-            if current_hash != last_hash:
-                logging.info("🔄 RDF 파일 변경 감지됨. 업데이트 실행 중...")
-                update_fuseki(RDF_FILE)
-                run_pipeline()  # update_pipeline.py의 메인 함수 실행
-                last_hash = current_hash
-                logging.info("✅ 변경 처리 완료")
+            # 수정 시각/크기가 바뀐 경우에만 해시 계산으로 넘어간다
+            signature = get_file_signature(RDF_FILE)
+            if signature != last_signature:
+                last_signature = signature
+                updater.notify()
         except Exception as e:
             logging.error(f"❌ 오류 발생: {e}")
 
+def watch_rdf_file():
+    if not os.path.exists(RDF_FILE):
+        logging.error(f"❌ {RDF_FILE} 파일이 존재하지 않습니다.")
+        return
+
+    updater = SingleFlightUpdater(RDF_FILE)
+    if Observer is not None:
+        _watch_with_events(updater)
+    else:
+        _watch_with_polling(updater)
+
 if __name__ == "__main__":
+    start_metrics_server_from_env()  # 상주하며 업데이트를 반복하므로 METRICS_PORT가 있으면 /metrics로 노출
     watch_rdf_file()
@@ -0,0 +1,123 @@
+# batch_qa.py
+# 회귀 평가용 일괄 질의응답: 질문 임베딩 1회 배치 → 다중 질의 FAISS 검색 1회(+ 질문별 BM25 결합·그래프 확장) → 채팅 완성 동시 실행
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List
+
+from embedding import embed_sentences_batched
+from openai_clients import RETRYABLE_ERRORS, get_async_client, retry_delay
+from metrics import count_tokens
+from context_builder import count_message_tokens
+from rag_query import GPT_MODEL, NO_CONTEXT_ANSWER, build_messages, retrieve_batch
+
+BATCH_CONCURRENCY = 8  # 동시에 보내는 채팅 완성 요청 수
+MAX_RETRIES = 6
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+async def _complete_with_retry(messages, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await get_async_client().chat.completions.create(
+                    model=GPT_MODEL,
+                    messages=messages,
+                    temperature=0.3
+                )
+                count_tokens("completion", response, mode="batch")
+                return response.choices[0].message.content.strip()
+            except RETRYABLE_ERRORS as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = retry_delay(e, attempt)
+                logging.warning(f"⏳ {type(e).__name__} → {delay:.1f}초 후 재시도 ({attempt + 1}/{MAX_RETRIES})")
+                await asyncio.sleep(delay)
+
+async def _complete_all(questions: List[str], contexts: List[List[str]], concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question, context):
+        if not context:
+            return NO_CONTEXT_ANSWER, None, 0.0, 0
+        started = time.perf_counter()
+        messages = build_messages(question, context)
+        try:
+            answer, error = await _complete_with_retry(messages, semaphore), None
+        except Exception as e:
+            answer, error = None, f"{type(e).__name__}: {e}"
+        return answer, error, time.perf_counter() - started, count_message_tokens(messages)
+
+    return await asyncio.gather(*(one(q, c) for q, c in zip(questions, contexts)))
+
+def answer_questions_batch(questions: List[str], top_k: int = 5, concurrency: int = BATCH_CONCURRENCY) -> List[Dict]:
+    """질문 목록에 대한 답변, 검색된 문맥, 단계별 소요 시간을 반환한다."""
+    started = time.perf_counter()
+    vectors, valid_indices = embed_sentences_batched(questions)
+    embed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    valid_questions = [questions[i] for i in valid_indices]
+    # 온라인 질의와 같은 검색 결과로 평가하도록 BM25 결합·종류 선택·그래프 확장도 적용 (벡터 검색만 묶어서 한 번)
+    contexts = retrieve_batch(valid_questions, vectors, top_k) if valid_questions else []
+    search_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    completions = asyncio.run(_complete_all(valid_questions, contexts, concurrency))
+    completion_seconds = time.perf_counter() - started
+
+    # 모든 행이 같은 필드를 갖도록 임베딩에 실패한 질문도 빈 값으로 채운다
+    results = [
+        {
+            "question": q,
+            "answer": None,
+            "contexts": [],
+            "prompt_tokens": 0,
+            "error": "임베딩 실패",
+            "timings": {"completion": 0.0},
+        }
+        for q in questions
+    ]
+    for i, context, (answer, error, seconds, prompt_tokens) in zip(valid_indices, contexts, completions):
+        results[i] = {
+            "question": questions[i],
+            "answer": answer,
+            "contexts": context,
+            "prompt_tokens": prompt_tokens,
+            "error": error,
+            "timings": {"completion": seconds},
+        }
+
+    n = max(len(valid_indices), 1)
+    logging.info(
+        f"📊 {len(questions)}개 질문 처리: 임베딩 {embed_seconds:.2f}초, 검색 {search_seconds:.3f}초, "
+        f"완성 {completion_seconds:.2f}초 ({len(valid_indices) / completion_seconds if completion_seconds else 0:.1f} 질문/초)"
+    )
+    for r in results:
+        # 배치 단계 소요 시간은 질문 수로 나눠 질문별로 기록
+        r["timings"].update({"embed": embed_seconds / n, "search": search_seconds / n})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 질문 파일 일괄 질의응답")
+    parser.add_argument("input", help='한 줄에 {"question": ...} 하나씩 (id 등 다른 필드는 결과에 그대로 유지)')
+    parser.add_argument("output", help="결과 JSONL 경로")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    results = answer_questions_batch([r["question"] for r in records], args.top_k, args.concurrency)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for record, result in zip(records, results):
+            f.write(json.dumps({**record, **result}, ensure_ascii=False) + "\n")
+    failed = sum(1 for r in results if r["error"])
+    logging.info(f"✅ 결과 저장 완료: '{args.output}' (실패 {failed}개)")
+
+if __name__ == "__main__":
+    main()
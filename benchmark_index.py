@@ -0,0 +1,132 @@
+# benchmark_index.py
+# FAISS 인덱스 종류별 recall@k, 질의 지연(p50/p99), 메모리 사용량, 적재 시간 비교
+# float32(flat) 대비 float16/8비트 양자화(sq_fp16/sq8)와 PCA 차원 축소(--pca-dims)의 손실을 확인한다
+
+import argparse
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+
+from faiss_store import METRIC, VECTOR_SIZE, build_index, apply_search_params, load_faiss_index
+from metadata_store import MetadataStore
+
+def synthetic_vectors(n: int, seed: int = 0, n_clusters: int = 64) -> np.ndarray:
+    # 실제 임베딩처럼 군집 구조를 가진 벡터 생성
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, VECTOR_SIZE)).astype("float32")
+    labels = rng.integers(0, n_clusters, n)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((n, VECTOR_SIZE)).astype("float32")
+    return np.ascontiguousarray(vectors, dtype="float32")
+
+def vectors_from_saved_index() -> np.ndarray:
+    """저장된 인덱스의 문장 벡터.
+
+    임베딩 캐시에 모든 문장이 있으면 원래 임베딩(PCA·양자화 전)을 쓰고, 없으면 인덱스에서 복원한다.
+    """
+    # embedding은 import 시점에 OpenAI 클라이언트를 만들므로 합성 벡터만 쓸 때는 불러오지 않는다
+    from embedding import EMBEDDING_MODEL, get_embedding_cache
+
+    index, metadata = load_faiss_index()
+    texts = [r["text"] for r in metadata.records()] if isinstance(metadata, MetadataStore) else list(metadata.values())
+    cache = get_embedding_cache()
+    cached = cache.get_many(texts, EMBEDDING_MODEL) if cache is not None else {}
+    if texts and len(cached) == len(set(texts)):
+        return np.stack([cached[t] for t in texts]).astype("float32")
+    return reconstruct_all(index)
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    # ID 매핑 아래의 실제 인덱스는 0..ntotal-1 순번으로 벡터를 갖는다
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexPreTransform):
+        raise SystemExit("❌ PCA로 줄인 인덱스에서는 원래 벡터를 복원할 수 없습니다. 임베딩 캐시를 켠 상태로 다시 빌드하세요.")
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()  # IVF는 목록 위치 → 순번 매핑이 있어야 복원할 수 있다
+    return index.reconstruct_n(0, index.ntotal)
+
+def recall_at_k(ground_truth: np.ndarray, found: np.ndarray, k: int) -> float:
+    hits = sum(len(set(gt[:k]) & set(f[:k])) for gt, f in zip(ground_truth, found))
+    return hits / (len(ground_truth) * k)
+
+def file_size_and_load_time(index: faiss.Index):
+    # 서비스 시작 시와 같은 경로(파일 → read_index)로 적재 시간을 잰다
+    fd, path = tempfile.mkstemp(suffix=".index")
+    os.close(fd)
+    try:
+        faiss.write_index(index, path)
+        start = time.perf_counter()
+        faiss.read_index(path)
+        load_ms = (time.perf_counter() - start) * 1000
+        return os.path.getsize(path) / 1024 / 1024, load_ms
+    finally:
+        os.remove(path)
+
+def measure(index: faiss.Index, queries: np.ndarray, k: int):
+    latencies = []
+    results = np.empty((len(queries), k), dtype="int64")
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = ids[0]
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 종류별 성능 비교")
+    parser.add_argument("--n", type=int, default=50_000, help="합성 벡터 수")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", default="flat,sq_fp16,sq8,ivf_flat,ivf_pq,hnsw")
+    parser.add_argument("--pca-dims", default="0", help="비교할 PCA 차원 목록 (0은 원래 차원, 예: 0,512,256)")
+    parser.add_argument("--nprobe", default="4,16,64", help="IVF 계열에서 비교할 nprobe 목록")
+    parser.add_argument("--ef-search", default="32,64,128", help="HNSW에서 비교할 efSearch 목록")
+    parser.add_argument("--from-index", action="store_true", help="합성 벡터 대신 저장된 FAISS 인덱스의 벡터 사용")
+    parser.add_argument("--metric", choices=["cosine", "l2"], default=METRIC, help="서비스와 같은 거리 척도 (FAISS_METRIC)")
+    args = parser.parse_args()
+
+    vectors = vectors_from_saved_index() if args.from_index else synthetic_vectors(args.n)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+    if args.metric == "cosine":
+        # 서비스와 같이 정규화한 벡터를 내적 인덱스에 넣고 질의한다
+        vectors, queries = np.array(vectors), np.ascontiguousarray(queries, dtype="float32")
+        faiss.normalize_L2(vectors)
+        faiss.normalize_L2(queries)
+    print(f"📊 벡터 {len(vectors)}개, 질의 {len(queries)}개, k={args.k}, 척도 {args.metric}")
+
+    baseline = faiss.IndexFlat(VECTOR_SIZE, faiss.METRIC_INNER_PRODUCT if args.metric == "cosine" else faiss.METRIC_L2)
+    baseline.add(vectors)
+    ground_truth, _, _ = measure(baseline, queries, args.k)
+
+    print(f"{'type':<10} {'pca':>5} {'param':<14} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'build s':>8} {'size MB':>8} {'load ms':>8}")
+    for index_type, pca_dim in [(t, int(d)) for t in args.types.split(",") for d in args.pca_dims.split(",")]:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type, pca_dim, metric=args.metric)
+        index.add(vectors)
+        build_s = time.perf_counter() - start
+        size_mb, load_ms = file_size_and_load_time(index)
+
+        if index_type.startswith("ivf"):
+            settings = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        elif index_type == "hnsw":
+            settings = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+        else:
+            settings = [("-", None)]
+
+        for name, value in settings:
+            if name == "nprobe":
+                apply_search_params(index, nprobe=value)
+            elif name == "efSearch":
+                apply_search_params(index, ef_search=value)
+            found, p50, p99 = measure(index, queries, args.k)
+            param = f"{name}={value}" if value is not None else "-"
+            print(f"{index_type:<10} {pca_dim or '-':>5} {param:<14} {recall_at_k(ground_truth, found, args.k):>9.3f} "
+                  f"{p50:>8.3f} {p99:>8.3f} {build_s:>8.2f} {size_mb:>8.1f} {load_ms:>8.1f}")
+
+if __name__ == "__main__":
+    main()
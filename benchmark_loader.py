@@ -0,0 +1,103 @@
+# benchmark_loader.py
+# 로컬 RDF/XML 추출과 Fuseki SPARQL 추출의 소요 시간 비교 (원본 파일 + 개체를 복제한 확대본, Fuseki는 stub_fuseki 대역 또는 실제 서버)
+
+import argparse
+import os
+import tempfile
+import time
+from rdflib import RDF, URIRef
+
+import ontology_loader
+from ontology_loader import OWL, load_graph, load_local_ontology_elements
+
+SCHEMA_TYPES = {URIRef(OWL + t) for t in ("Class", "ObjectProperty", "DatatypeProperty", "AnnotationProperty", "Ontology")}
+
+def scale_graph(graph, scale: int):
+    """개체(스키마가 아닌 IRI 주어)의 트리플을 scale배로 복제한다 (그래프를 직접 수정)."""
+    individuals = {
+        s for s, t in graph.subject_objects(RDF.type)
+        if isinstance(s, URIRef) and t not in SCHEMA_TYPES
+    }
+    originals = [(s, p, o) for s, p, o in graph if s in individuals]
+    for i in range(1, scale):
+        rename = lambda term: URIRef(f"{term}_{i}") if term in individuals else term
+        for s, p, o in originals:
+            graph.add((rename(s), p, rename(o)))
+    return graph
+
+def make_scaled_file(path: str, scale: int, graph=None) -> str:
+    """scale_graph로 확대한 RDF/XML 파일을 임시 경로에 만든다 (이미 확대한 graph를 주면 그대로 저장)."""
+    graph = scale_graph(load_graph(path), scale) if graph is None else graph
+
+    fd, scaled_path = tempfile.mkstemp(suffix=f"_x{scale}.xml")
+    os.close(fd)
+    graph.serialize(scaled_path, format="xml")
+    return scaled_path
+
+def time_it(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def time_stub_fuseki(graph, repeat: int):
+    """stub_fuseki로 graph를 띄워 fetch_ontology_elements의 소요 시간을 잰다.
+
+    대역은 질의 결과를 미리 계산해 두므로 SPARQL 전송·파싱과 페이지 요청 등 클라이언트 쪽 비용이 주로 잡힌다.
+    """
+    import fuseki_query
+    from stub_fuseki import start_stub_fuseki
+
+    server = start_stub_fuseki(graph)
+    endpoint = fuseki_query.FUSEKI_ENDPOINT
+    fuseki_query.FUSEKI_ENDPOINT = f"http://127.0.0.1:{server.server_port}/dataset/query"
+    try:
+        return time_it(fuseki_query.fetch_ontology_elements, repeat)
+    finally:
+        fuseki_query.FUSEKI_ENDPOINT = endpoint
+        server.shutdown()
+        server.server_close()
+
+def report(label: str, seconds: float, elements):
+    counts = ", ".join(f"{k}={len(v)}" for k, v in elements.items())
+    print(f"{label:<28} {seconds * 1000:>10.1f} ms   {counts}")
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 RDF/XML vs Fuseki 온톨로지 추출 비교")
+    parser.add_argument("--file", default=ontology_loader.ONTOLOGY_FILE)
+    parser.add_argument("--scale", type=int, default=100, help="확대본의 개체 복제 배수")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fuseki", action="store_true", help="실제 Fuseki 경로도 측정 (같은 데이터가 로드되어 있어야 함)")
+    parser.add_argument("--no-stub", action="store_true", help="stub_fuseki로 원본·확대본을 SPARQL 경로로 측정하지 않음")
+    args = parser.parse_args()
+
+    size_kb = os.path.getsize(args.file) / 1024
+    seconds, elements = time_it(lambda: load_local_ontology_elements(args.file), args.repeat)
+    report(f"local x1 ({size_kb:.0f} KB)", seconds, elements)
+    if not args.no_stub:
+        seconds, elements = time_stub_fuseki(load_graph(args.file), args.repeat)
+        report("fuseki stub x1", seconds, elements)
+
+    if args.fuseki:
+        from fuseki_query import fetch_ontology_elements
+        seconds, elements = time_it(fetch_ontology_elements, args.repeat)
+        report("fuseki (현재 데이터셋)", seconds, elements)
+
+    if args.scale > 1:
+        # 같은 확대 그래프를 파일(로컬 경로)과 대역(SPARQL 경로) 양쪽으로 측정
+        graph = scale_graph(load_graph(args.file), args.scale)
+        scaled_path = make_scaled_file(args.file, args.scale, graph)
+        try:
+            size_kb = os.path.getsize(scaled_path) / 1024
+            seconds, elements = time_it(lambda: load_local_ontology_elements(scaled_path), args.repeat)
+            report(f"local x{args.scale} ({size_kb:.0f} KB)", seconds, elements)
+        finally:
+            os.remove(scaled_path)
+        if not args.no_stub:
+            seconds, elements = time_stub_fuseki(graph, args.repeat)
+            report(f"fuseki stub x{args.scale}", seconds, elements)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmark_retrieval.py
+# 저장된 인덱스에 대해 벡터 검색 / BM25 / 혼합(RRF) 검색의 recall@k와 질의 지연(p50/p99) 비교
+# 질의는 요소의 로컬 이름(extract_local_name)으로 만들고, 정답은 그 URI를 가진 문장이다
+
+import argparse
+import os
+import time
+import numpy as np
+
+from ontology_to_text import extract_local_name
+
+QUERY_TEMPLATES = ["{}", "What is {}?", "{}에 대해 알려줘"]
+
+def make_queries(metadata, n: int, seed: int = 0):
+    # 같은 로컬 이름을 가진 URI가 여럿이면 정답이 모호하므로 제외
+    by_name = {}
+    for record in metadata.records():
+        if record["uri"] and ":" in record["uri"]:
+            by_name.setdefault(extract_local_name(record["uri"]), set()).add(record["uri"])
+    targets = {}
+    for record in metadata.records():
+        name = extract_local_name(record["uri"]) if record["uri"] else None
+        if name and len(by_name.get(name, ())) == 1:
+            targets.setdefault(name, set()).add(record["id"])
+    names = sorted(targets)
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(names), size=min(n, len(names)), replace=False)
+    return [
+        (QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)].format(names[p]), targets[names[p]])
+        for i, p in enumerate(picks)
+    ]
+
+def evaluate(search, queries, vectors, k: int):
+    hits, latencies = 0, []
+    for (text, relevant), vector in zip(queries, vectors):
+        start = time.perf_counter()
+        found = search(vector, text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += bool(relevant & {int(i) for i in found[:k]})
+    return hits / len(queries), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터 / BM25 / 혼합 검색 recall·지연 비교 (현재 디렉터리의 인덱스 사용)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=50, help="혼합 검색에서 각 검색기가 내는 후보 수")
+    parser.add_argument("--stub", action="store_true",
+                        help="OpenAI 대신 로컬 대역 임베딩 사용 (무작위 벡터라 벡터 recall은 의미 없음, 지연만 비교)")
+    args = parser.parse_args()
+
+    if args.stub:
+        from stub_openai import start_stub_server
+        server = start_stub_server(embed_latency=0.0)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+    from embedding import embed_sentences_batched
+    from faiss_store import get_index_holder
+
+    holder = get_index_holder()
+    snapshot = holder.pin()
+    metadata, lexical = snapshot.metadata, snapshot.lexical
+    if lexical is None:
+        raise SystemExit("❌ BM25 색인이 없습니다. update_pipeline.py --full 로 인덱스를 다시 만드세요.")
+
+    queries = make_queries(metadata, args.queries)
+    vectors, valid = embed_sentences_batched([q for q, _ in queries])
+    queries = [queries[i] for i in valid]
+    vectors = vectors[:, None, :]
+
+    modes = {
+        "vector": lambda v, t: snapshot.search(v, args.k)[1][0],
+        "bm25": lambda v, t: lexical.search(t, args.k)[1],
+        "hybrid (RRF)": lambda v, t: snapshot.search_hybrid(v, t, args.k, args.candidates)[0],
+    }
+    print(f"🧪 질의 {len(queries)}개, 문장 {len(metadata)}개, k={args.k}")
+    print(f"{'mode':<14} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, search in modes.items():
+        recall, p50, p99 = evaluate(search, queries, vectors, args.k)
+        print(f"{name:<14} {recall:>10.3f} {p50:>8.3f} {p99:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# benchmark_suite.py
+# 로컬 대역(OpenAI: stub_openai, Fuseki: stub_fuseki)만으로 주요 경로의 소요 시간을 재현 가능하게 측정
+# 온톨로지는 RDF_Forwarding.xml의 개체를 1배/10배/100배로 복제해 쓰고, 실행 결과는 기록 파일에 누적해 직전 실행과 비교한다
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+from stub_openai import fake_embedding, start_stub_server
+from stub_fuseki import start_stub_fuseki
+from benchmark_loader import scale_graph
+from ontology_loader import ONTOLOGY_FILE, load_graph, ontology_elements_from_graph
+
+BENCHMARK_HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_history.jsonl")
+# 기본 온톨로지는 실행 위치와 무관하게 이 파일 옆의 ontology/ 기준 (ONTOLOGY_FILE이 절대 경로면 그대로)
+DEFAULT_ONTOLOGY_FILE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ONTOLOGY_FILE))
+DEFAULT_SCALES = "1,10,100"
+QUESTIONS = [
+    "수출업체는 어떤 조건에서 운송을 담당하나요?",
+    "What does the importer pay for under FOB?",
+    "Which transport modes are used for forwarding?",
+    "운임은 누가 부담하나요?",
+]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    values = np.array(samples) * 1000
+    return {
+        "median_ms": float(np.median(values)),
+        "min_ms": float(values.min()),
+        "p99_ms": float(np.percentile(values, 99)),
+        "runs": len(values),
+    }
+
+def measure(fn: Callable, repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def measure_each(fn: Callable, inputs) -> Dict[str, float]:
+    samples = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def run_scale(scale: int, args, workdir: str) -> Dict[str, Dict]:
+    # 모듈이 환경 변수를 import 시점에 읽으므로 main에서 환경을 맞춘 뒤 불러온다
+    import fuseki_query
+    import rag_query
+    import update_pipeline
+    from faiss_store import save_embeddings_to_faiss, search_faiss
+    from ontology_to_text import ontology_elements_to_sentences
+
+    logging.getLogger().setLevel(logging.WARNING)  # 파이프라인 진행 로그가 결과 표를 가리지 않도록
+    scale_dir = os.path.join(workdir, f"x{scale}")
+    os.makedirs(scale_dir, exist_ok=True)
+    os.chdir(scale_dir)
+
+    graph = scale_graph(load_graph(args.file), scale)
+    fuseki = start_stub_fuseki(graph)
+    fuseki_query.FUSEKI_ENDPOINT = f"http://127.0.0.1:{fuseki.server_port}/dataset/query"
+    results = {}
+    try:
+        elements = ontology_elements_from_graph(graph)
+        element_lists = [elements[k] for k in ("classes", "object_props", "data_props", "individuals", "rules")]
+        results["ontology_elements_to_sentences"] = measure(
+            lambda: ontology_elements_to_sentences(*element_lists), args.repeat)
+
+        sentences = ontology_elements_to_sentences(*element_lists)
+        vectors = np.stack([fake_embedding(s) for s in sentences])
+        results["save_embeddings_to_faiss"] = measure(
+            lambda: save_embeddings_to_faiss(sentences, vectors), args.repeat)
+
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(sentences), size=min(args.queries, len(sentences)), replace=False)
+        search_faiss(vectors[picks[0]], k=5)  # 인덱스 로드는 측정에서 제외
+        results["search_faiss"] = measure_each(lambda i: search_faiss(vectors[i], k=5), picks)
+
+        # 대역 서버가 질의 결과를 처음 계산하는 시간은 빼기 위해 한 번 미리 실행
+        update_pipeline.main(incremental=False, source="fuseki")
+        results["update_pipeline_full"] = measure(
+            lambda: update_pipeline.main(incremental=False, source="fuseki"), args.repeat)
+        results["update_pipeline_unchanged"] = measure(
+            lambda: update_pipeline.main(incremental=True, source="fuseki"), args.repeat)
+
+        questions = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(args.queries)]
+        results["generate_answer"] = measure_each(rag_query.generate_answer, questions)
+    finally:
+        fuseki.shutdown()
+    results["_size"] = {"sentences": len(sentences)}
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_previous(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+def report(results: Dict[str, Dict], previous: Optional[Dict]):
+    print(f"{'benchmark':<42} {'median ms':>10} {'min ms':>10} {'p99 ms':>10} {'vs prev':>9}")
+    for name, stats in results.items():
+        if name.endswith("/_size"):
+            continue
+        delta = ""
+        prev = (previous or {}).get("results", {}).get(name)
+        if prev and prev["median_ms"]:
+            delta = f"{(stats['median_ms'] / prev['median_ms'] - 1) * 100:+.1f}%"
+        print(f"{name:<42} {stats['median_ms']:>10.2f} {stats['min_ms']:>10.2f} {stats['p99_ms']:>10.2f} {delta:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 대역 기반 성능 벤치마크 (결과를 기록 파일에 누적)")
+    parser.add_argument("--file", default=DEFAULT_ONTOLOGY_FILE)
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="개체 복제 배수 목록")
+    parser.add_argument("--repeat", type=int, default=3, help="구간별 반복 횟수")
+    parser.add_argument("--queries", type=int, default=100, help="검색/질의 경로 측정에 쓸 질의 수")
+    parser.add_argument("--history", default=BENCHMARK_HISTORY_FILE, help="실행 기록 파일 (JSON Lines)")
+    parser.add_argument("--no-record", action="store_true", help="기록 파일에 추가하지 않음")
+    args = parser.parse_args()
+    args.file = os.path.abspath(args.file)
+    args.history = os.path.abspath(args.history)
+
+    openai_stub = start_stub_server(embed_latency=0.0, chat_latency=0.0)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{openai_stub.server_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    # 캐시가 켜져 있으면 반복 실행 간 결과가 달라지므로 끈다
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "0"
+    os.environ["ANSWER_CACHE_ENABLED"] = "0"
+    os.environ["PIPELINE_METRICS_FILE"] = ""
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    os.chdir(workdir)
+    results = {}
+    try:
+        for scale in (int(s) for s in args.scales.split(",")):
+            for name, stats in run_scale(scale, args, workdir).items():
+                results[f"x{scale}/{name}"] = stats
+    finally:
+        openai_stub.shutdown()
+
+    previous = load_previous(args.history)
+    report(results, previous)
+    if not args.no_record:
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpu)",
+            "args": {"scales": args.scales, "repeat": args.repeat, "queries": args.queries},
+            "results": results,
+        }
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"📝 결과를 '{args.history}'에 추가했습니다.")
+
+if __name__ == "__main__":
+    main()
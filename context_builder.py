@@ -0,0 +1,171 @@
+# context_builder.py
+# 검색된 문장을 토큰 예산 안에 채워 넣는 문맥 구성기
+# 거의 같은 문장은 임베딩 유사도로 걸러내고, 너무 긴 개체 설명은 나눠서 앞부분부터 싣는다
+
+import os
+import re
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 UTF-8 바이트 수로 근사
+    tiktoken = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))  # 문맥에 쓸 최대 토큰 수
+CONTEXT_MAX_SENTENCE_TOKENS = 250  # 이보다 긴 문장은 나눈다
+CONTEXT_DEDUP_SIMILARITY = 0.97  # 이미 실린 문장과 코사인 유사도가 이 이상이면 제외
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+MESSAGE_OVERHEAD_TOKENS = 4  # 채팅 메시지 하나당 역할/구분자 토큰
+
+_encoding = None
+_encoding_unavailable = tiktoken is None
+
+def _get_encoding():
+    global _encoding, _encoding_unavailable
+    if _encoding is None and not _encoding_unavailable:
+        try:
+            _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except Exception as e:  # 인코딩 파일을 내려받지 못하는 환경
+            logging.warning(f"⚠️ tiktoken 인코딩을 불러오지 못해 근사치로 셉니다: {e}")
+            _encoding_unavailable = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text.encode("utf-8")) + 3) // 4
+
+def count_message_tokens(messages: Sequence[Dict]) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages) + 3
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens - 1]) + "…"
+    data = text.encode("utf-8")[:(max_tokens - 1) * 4]
+    return data.decode("utf-8", errors="ignore") + "…"
+
+def _token_windows(text: str, max_tokens: int) -> List[str]:
+    """경계 없이 긴 문자열을 max_tokens 토큰 이하의 조각으로 자른다 (글자 중간에서는 자르지 않는다)."""
+    max_tokens = max(max_tokens, 1)
+    encoding = _get_encoding()
+    windows = []
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        step = max(max_tokens - 3, 1)  # 앞 조각에서 넘어온 바이트(글자 하나, 최대 3토큰) 자리
+        carry = b""
+        for start in range(0, len(tokens), step):
+            data = carry + encoding.decode_bytes(tokens[start:start + step])
+            # 한 글자가 두 토큰에 걸치면 남은 바이트를 다음 조각으로 넘긴다
+            cut = len(data)
+            while cut and (data[cut - 1] & 0xC0) == 0x80:
+                cut -= 1
+            if cut:
+                lead = data[cut - 1]
+                needed = 3 if lead >= 0xF0 else 2 if lead >= 0xE0 else 1 if lead >= 0xC0 else 0
+                cut = cut - 1 if len(data) - cut < needed else len(data)
+            else:
+                cut = len(data)
+            windows.append(data[:cut].decode("utf-8", errors="ignore"))
+            carry = data[cut:]
+        if carry:
+            windows.append(carry.decode("utf-8", errors="ignore"))
+        return [w for w in windows if w]
+    # 근사: UTF-8 4바이트를 1토큰으로 보고 글자 단위로 채운다
+    current, size = [], 0
+    for char in text:
+        n = len(char.encode("utf-8"))
+        if current and size + n > max_tokens * 4:
+            windows.append("".join(current))
+            current, size = [], 0
+        current.append(char)
+        size += n
+    if current:
+        windows.append("".join(current))
+    return windows
+
+def split_sentence(text: str, max_tokens: int = CONTEXT_MAX_SENTENCE_TOKENS) -> List[str]:
+    """긴 설명을 '; ' / '. ' 경계에서 나누고, 조각마다 첫 문장(주어)을 붙여 따로 읽혀도 뜻이 통하게 한다.
+
+    '. '가 없거나 첫 문장이 조각 한도의 절반을 넘으면 주어를 붙이지 않고, 경계 사이가 그래도 길면 토큰 단위로 자른다.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    head, sep, body = text.partition(". ")
+    head = head + "." if sep else ""
+    if not head or count_tokens(head) > max_tokens // 2:
+        head, body = "", text
+    prefix = f"{head} " if head else ""
+    room = max_tokens - count_tokens(prefix) - 1  # 조각을 다시 셀 때 경계에서 생기는 토큰 차이 여유
+    parts = []
+    for part in re.split(r"(?<=[;.]) ", body):
+        parts.extend(_token_windows(part, room) if count_tokens(part) > room else [part])
+    chunks, current = [], []
+    for part in parts:
+        if current and count_tokens(prefix + " ".join(current + [part])) > max_tokens:
+            chunks.append(prefix + " ".join(current))
+            current = []
+        current.append(part)
+    if current:
+        chunks.append(prefix + " ".join(current))
+    return [truncate_tokens(c[:-1] + "." if c.endswith(";") else c, max_tokens) for c in chunks]
+
+def _duplicates(sentences: Sequence[str], vectors: Optional[np.ndarray], threshold: float) -> List[bool]:
+    # 순위가 높은 문장을 남기고, 앞서 남긴 문장과 같거나 매우 비슷한 문장만 제외
+    duplicate = [False] * len(sentences)
+    seen_texts = set()
+    normed = None
+    if vectors is not None and len(vectors) == len(sentences):
+        normed = np.asarray(vectors, dtype="float32")
+        normed = normed / np.maximum(np.linalg.norm(normed, axis=1, keepdims=True), 1e-12)
+    kept = []
+    for i, text in enumerate(sentences):
+        if text in seen_texts or (normed is not None and kept and float(np.max(normed[kept] @ normed[i])) >= threshold):
+            duplicate[i] = True
+            continue
+        seen_texts.add(text)
+        kept.append(i)
+    return duplicate
+
+def build_context(
+    sentences: Sequence[str],
+    vectors: Optional[np.ndarray] = None,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    max_sentence_tokens: int = CONTEXT_MAX_SENTENCE_TOKENS,
+    dedup_similarity: float = CONTEXT_DEDUP_SIMILARITY,
+) -> Tuple[List[str], Dict[str, int]]:
+    """순위 순서의 문장에서 (예산 안에 실을 문장 목록, 통계)를 만든다.
+
+    모든 문장의 첫 조각을 순위대로 먼저 싣고, 예산이 남으면 나뉜 나머지 조각을 싣는다.
+    """
+    duplicate = _duplicates(sentences, vectors, dedup_similarity)
+    pieces = [split_sentence(s, max_sentence_tokens) for s, dup in zip(sentences, duplicate) if not dup]
+    ordered = [p[0] for p in pieces] + [chunk for p in pieces for chunk in p[1:]]
+
+    context, used, dropped = [], 0, 0
+    for piece in ordered:
+        tokens = count_tokens(piece) + 1  # 줄바꿈
+        if used + tokens > budget:
+            dropped += 1
+            continue
+        context.append(piece)
+        used += tokens
+    # 나뉜 조각이 원래 순위 자리에 오도록 정렬 (첫 조각 뒤에 같은 문장의 나머지 조각)
+    position = {}
+    for rank, p in enumerate(pieces):
+        for j, chunk in enumerate(p):
+            position.setdefault(chunk, (rank, j))
+    context.sort(key=lambda c: position[c])
+    stats = {
+        "tokens": used,
+        "sentences": len(context),
+        "duplicates": sum(duplicate),
+        "split": sum(1 for p in pieces if len(p) > 1),
+        "dropped": dropped,
+    }
+    return context, stats
@@ -1,26 +1,173 @@
 # embedding.py (OpenAI v1.0 이상 호환)
 import os
-from openai import OpenAI
-from typing import List
+import base64
+import asyncio
+import logging
+import numpy as np
+from openai import BadRequestError
+from typing import List, Tuple
 from dotenv import load_dotenv
+from embedding_cache import EmbeddingCache
+from metrics import timed, count_tokens, count_items, observe_payload
+from openai_clients import client, get_async_client
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_DIM = 1536
+EMBEDDING_BATCH_SIZE = 256  # 요청당 최대 입력 수 (API 한도 2048)
+EMBEDDING_BATCH_MAX_CHARS = 200_000  # 요청당 문자 수 상한 (토큰 한도에 대한 보수적 근사치)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "0"
 
-def get_embedding(text: str) -> List[float]:
-    response = client.embeddings.create(
-        input=[text],
-        model=EMBEDDING_MODEL
-    )
-    embedding = response.data[0].embedding
+_cache = None
+
+def get_embedding_cache():
+    global _cache
+    if EMBEDDING_CACHE_ENABLED and _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
 
+def _validate_embedding(embedding) -> List[float]:
     # ✅ 방어적 체크
     if not isinstance(embedding, list) or not all(isinstance(x, float) for x in embedding):
         raise ValueError(f"임베딩 형식 오류: {embedding[:5]}...")
+    return embedding
+
+def get_embedding(text: str) -> List[float]:
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(text, EMBEDDING_MODEL)
+        if cached is not None:
+            return cached.tolist()
 
+    with timed("embed", mode="single"):
+        response = client.embeddings.create(
+            input=[text],
+            model=EMBEDDING_MODEL
+        )
+    count_tokens("embed", response)
+    embedding = _validate_embedding(response.data[0].embedding)
+    if cache is not None:
+        cache.put(text, embedding, EMBEDDING_MODEL)
     return embedding
 
-def embed_sentences(sentences: List[str]) -> List[List[float]]:
-    return [get_embedding(s) for s in sentences]
+async def get_embedding_async(text: str) -> List[float]:
+    # SQLite 캐시 조회·기록은 블로킹 I/O이므로 이벤트 루프를 막지 않도록 기본 스레드 풀에서 실행
+    loop = asyncio.get_running_loop()
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = await loop.run_in_executor(None, cache.get, text, EMBEDDING_MODEL)
+        if cached is not None:
+            return cached.tolist()
+
+    with timed("embed", mode="async"):
+        response = await get_async_client().embeddings.create(
+            input=[text],
+            model=EMBEDDING_MODEL
+        )
+    count_tokens("embed", response)
+    embedding = _validate_embedding(response.data[0].embedding)
+    if cache is not None:
+        await loop.run_in_executor(None, cache.put, text, embedding, EMBEDDING_MODEL)
+    return embedding
+
+def _decode_embeddings(data, count: int) -> np.ndarray:
+    # base64로 받은 float32 바이트를 파이썬 float 리스트를 거치지 않고 바로 행렬로 읽는다
+    if len(data) != count:
+        raise ValueError(f"임베딩 개수 불일치: 요청 {count}개, 응답 {len(data)}개")
+    matrix = np.empty((count, EMBEDDING_DIM), dtype="float32")
+    for d in data:
+        row = d.embedding
+        row = np.frombuffer(base64.b64decode(row), dtype="<f4") if isinstance(row, str) else np.asarray(row, dtype="float32")
+        if row.shape != (EMBEDDING_DIM,) or not np.isfinite(row).all():
+            raise ValueError(f"임베딩 형식 오류: 차원 {row.shape}, 값 {row[:5]}...")
+        matrix[d.index] = row
+    return matrix
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    observe_payload("embed", sum(len(t.encode("utf-8")) for t in texts))
+    with timed("embed", mode="batch"):
+        response = client.embeddings.create(
+            input=texts,
+            model=EMBEDDING_MODEL,
+            encoding_format="base64"
+        )
+    count_tokens("embed", response)
+    count_items("embed", len(texts))
+    return _decode_embeddings(response.data, len(texts))
+
+def _iter_batches(sentences: List[str], batch_size: int, max_chars: int):
+    batch, chars = [], 0
+    for i, s in enumerate(sentences):
+        if batch and (len(batch) >= batch_size or chars + len(s) > max_chars):
+            yield batch
+            batch, chars = [], 0
+        batch.append(i)
+        chars += len(s)
+    if batch:
+        yield batch
+
+def _embed_bisect(sentences: List[str], indices: List[int], out: np.ndarray, ok: np.ndarray):
+    # 배치가 실패하면 반으로 나눠 재시도해 문제 문장만 골라낸다
+    try:
+        vectors = _embed_batch([sentences[i] for i in indices])
+    except (BadRequestError, ValueError) as e:
+        if len(indices) == 1:
+            logging.warning(f"❌ 임베딩 실패: '{sentences[indices[0]]}' => {e}")
+            return
+        mid = len(indices) // 2
+        _embed_bisect(sentences, indices[:mid], out, ok)
+        _embed_bisect(sentences, indices[mid:], out, ok)
+        return
+    out[indices] = vectors
+    ok[indices] = True
+
+def embed_sentences_batched(
+    sentences: List[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_chars: int = EMBEDDING_BATCH_MAX_CHARS,
+) -> Tuple[np.ndarray, List[int]]:
+    """문장을 배치로 임베딩해 (float32 행렬, 성공한 문장 인덱스)를 반환한다.
+
+    실패한 문장은 행렬에서 제외되며, 반환된 인덱스로 원래 문장과 대응시킨다.
+    """
+    out = np.empty((len(sentences), EMBEDDING_DIM), dtype="float32")
+    ok = np.zeros(len(sentences), dtype=bool)
+
+    # 캐시에 있는 문장은 네트워크 호출 없이 채우고, 나머지 고유 문장만 요청한다
+    cache = get_embedding_cache()
+    cached = cache.get_many(sentences, EMBEDDING_MODEL) if cache is not None else {}
+    for i, s in enumerate(sentences):
+        if s in cached:
+            out[i] = cached[s]
+            ok[i] = True
+
+    pending = list(dict.fromkeys(s for s in sentences if s not in cached))
+    direct = len(pending) == len(sentences)  # 캐시 적중·중복이 없으면 결과 행렬에 바로 채운다
+    pending_out = out if direct else np.empty((len(pending), EMBEDDING_DIM), dtype="float32")
+    pending_ok = ok if direct else np.zeros(len(pending), dtype=bool)
+    for indices in _iter_batches(pending, batch_size, max_chars):
+        _embed_bisect(pending, indices, pending_out, pending_ok)
+
+    embedded = np.flatnonzero(pending_ok)
+    if cache is not None and len(embedded):
+        cache.put_many([pending[j] for j in embedded], pending_out[embedded], EMBEDDING_MODEL)
+    vector_of = {pending[j]: pending_out[j] for j in embedded}
+    for i, s in enumerate(sentences):
+        if not ok[i] and s in vector_of:
+            out[i] = vector_of[s]
+            ok[i] = True
+    if cache is not None:
+        count_items("embed_cache_hit", len(sentences) - len(pending))
+        logging.info(f"📦 임베딩 캐시: 적중 {len(sentences) - len(pending)}건, 신규 요청 {len(pending)}건")
+
+    valid = np.flatnonzero(ok)
+    if len(valid) == len(sentences):
+        return out, list(range(len(sentences)))
+    return np.ascontiguousarray(out[valid]), valid.tolist()
+
+def embed_sentences(sentences: List[str]) -> np.ndarray:
+    vectors, valid = embed_sentences_batched(sentences)
+    if len(valid) != len(sentences):
+        raise ValueError(f"임베딩 실패: {len(sentences) - len(valid)}개 문장")
+    return vectors
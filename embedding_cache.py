@@ -0,0 +1,123 @@
+# embedding_cache.py
+
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, List
+
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000  # 초과 시 가장 오래 사용되지 않은 항목부터 삭제
+EMBEDDING_CACHE_EVICT_FRACTION = 0.1  # 한도를 넘으면 한도의 이 비율만큼 더 지워 매 put마다 삭제하지 않도록 한다
+EMBEDDING_CACHE_TOUCH_BATCH = 256  # 적중한 항목의 last_used는 모아 두었다가 이만큼 쌓이면 한 번에 기록
+
+# sha256(문장) + 모델명을 키로 하는 디스크 기반 임베딩 캐시 (SQLite, LRU 제거)
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_FILE, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched: Dict[str, float] = {}  # 아직 기록하지 않은 {키: 마지막 사용 시각}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        # 행 수는 여기서 한 번만 세고 이후에는 추가·삭제한 수로 맞춘다 (COUNT(*)는 표 전체를 훑는다)
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        return f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}:{model}"
+
+    def get_many(self, texts: List[str], model: str) -> Dict[str, np.ndarray]:
+        """캐시에 있는 문장만 {문장: float32 벡터}로 반환한다."""
+        keys = {self.make_key(t, model): t for t in set(texts)}
+        found: Dict[str, np.ndarray] = {}
+        key_list = list(keys)
+        with self._lock:
+            # SQLite 바인딩 변수 한도를 넘지 않도록 나눠서 조회
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype="float32")
+            if found:
+                now = time.time()
+                self._touched.update((self.make_key(t, model), now) for t in found)
+                if len(self._touched) >= EMBEDDING_CACHE_TOUCH_BATCH:
+                    self._flush_touched()
+                    self._conn.commit()
+            self.hits += sum(1 for t in texts if t in found)
+            self.misses += sum(1 for t in texts if t not in found)
+        return found
+
+    def get(self, text: str, model: str):
+        return self.get_many([text], model).get(text)
+
+    def put_many(self, texts: List[str], vectors, model: str):
+        now = time.time()
+        rows = [
+            (self.make_key(t, model), np.asarray(v, dtype="float32").tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            # 같은 키(문장 + 모델)의 벡터는 같으므로 이미 있는 항목은 그대로 두고 새로 들어간 행만 센다
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._count += cursor.rowcount
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def put(self, text: str, vector, model: str):
+        self.put_many([text], [vector], model)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        # 최근 사용 기록을 먼저 반영한 뒤, 한도보다 조금 더 아래까지 한 번에 지운다
+        self._flush_touched()
+        target = self.max_entries - int(self.max_entries * EMBEDDING_CACHE_EVICT_FRACTION)
+        cursor = self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (self._count - target,),
+        )
+        self._count -= cursor.rowcount
+
+    def flush(self):
+        """모아 둔 last_used 갱신을 기록한다 (기록하지 못하고 끝나도 LRU 순서만 조금 부정확해진다)."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
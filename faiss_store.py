@@ -1,39 +1,909 @@
 # faiss_store.py
 
+import os
+import glob
+import json
+import shutil
+import hashlib
+import pickle
+import tempfile
+import threading
+import time
 import faiss
 import numpy as np
-import pickle
-from typing import List, Tuple
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from metadata_store import MetadataStore, MetadataWriter
+from lexical_index import LEXICAL_DIR, LexicalIndex, reciprocal_rank_fusion
+from graph_index import GRAPH_DIR, GraphIndex
+from metrics import timed, count_items
 
 VECTOR_SIZE = 1536  # OpenAI embedding vector size (e.g., text-embedding-ada-002)
-INDEX_FILE = "faiss_index.index"
-META_FILE = "faiss_metadata.pkl"
+BUILD_DIR = "faiss_build"  # 버전별 빌드 디렉터리: faiss_build.<version>/{index.faiss, metadata/, manifest.json}
+BUILD_INDEX_FILE = "index.faiss"
+BUILD_META_DIR = "metadata"  # 열 단위 메타데이터 (lexical/, graph/ 하위 디렉터리 포함)
+BUILD_MANIFEST = "manifest.json"
+VERSION_FILE = "faiss_index.version"  # 서비스할 빌드 버전을 가리키는 포인터 — 빌드가 끝난 뒤 rename으로 한 번에 바뀐다
+KEEP_VERSIONS = int(os.getenv("FAISS_KEEP_VERSIONS", "2"))  # 남겨 둘 빌드 수 (아직 이전 버전을 읽는 프로세스용)
+INDEX_FILE = "faiss_index.index"  # 구버전 배치(작업 디렉터리의 단일 인덱스 파일) — 읽기만 지원
+META_FILE = "faiss_metadata.pkl"  # 구버전(pickle) 메타데이터 — 읽기만 지원
+META_DIR = "faiss_metadata"  # 구버전 버전별 메타데이터 디렉터리: faiss_metadata.<version>/ — 읽기만 지원
+
+# 인덱스 종류: flat(전수 탐색) | sq_fp16(float16 저장) | sq8(8비트 스칼라 양자화) | ivf_flat | ivf_pq | hnsw
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+# 거리 척도: cosine(정규화한 벡터의 내적, IndexFlatIP 계열) | l2 — 기존 L2 저장본도 그대로 읽힌다
+METRIC = os.getenv("FAISS_METRIC", "cosine")
+PCA_DIM = int(os.getenv("FAISS_PCA_DIM", "0"))  # 0이 아니면 PCA로 차원을 줄인 뒤 저장 (예: 256)
+IVF_NLIST = 1024  # 학습 벡터가 적으면 클러스터당 39개 이상이 되도록 줄어든다
+IVF_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+PQ_M = 96  # 서브벡터 수 (VECTOR_SIZE의 약수)
+PQ_NBITS = 8
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+HYBRID_CANDIDATES = 50  # 혼합 검색에서 벡터/BM25 각각 가져와 합칠 후보 수
+CHUNK_OVERFETCH = 3  # 같은 요소의 조각이 상위를 채워도 서로 다른 요소 k개가 남도록 더 가져오는 배수
+CHUNKS_PER_PARENT = 2  # 한 요소에서 문맥에 싣는 조각 수 상한
+MIN_SIMILARITY = float(os.getenv("RAG_MIN_SIMILARITY", "0"))  # 이보다 유사도가 낮은 문장은 버린다 (0이면 끔, ada-002는 0.75~0.8 권장)
+SIMILARITY_MARGIN = float(os.getenv("RAG_SIMILARITY_MARGIN", "0"))  # 최고 유사도보다 이만큼 넘게 낮은 문장은 버린다 (적응형 k, 0이면 끔)
+
+def _fsync_path(path: str):
+    # 디렉터리는 rename 결과를 디스크에 남기기 위해 fsync (지원하지 않는 플랫폼은 건너뜀)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_atomic(path: str, write_fn):
+    tmp_path = f"{path}.tmp"
+    write_fn(tmp_path)
+    _fsync_path(tmp_path)
+    os.replace(tmp_path, path)
+    _fsync_path(os.path.dirname(os.path.abspath(path)))
+
+def _read_version() -> Optional[str]:
+    try:
+        with open(VERSION_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+# 요소 URI(없으면 문장)에서 안정적인 64비트 ID 생성 — FAISS의 -1(빈 슬롯)과 겹치지 않도록 양수만 사용
+def element_id(key: str) -> int:
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+def assign_element_ids(keys: List[str], seen: Optional[Dict[str, int]] = None) -> List[int]:
+    # 같은 URI가 여러 번 나오면 순번을 붙여 충돌을 피한다 (seen을 넘기면 여러 번 나눠 불러도 이어서 센다)
+    seen = {} if seen is None else seen
+    ids = []
+    for key in keys:
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        ids.append(element_id(key if n == 0 else f"{key}#{n}"))
+    return ids
+
+def _meta_dir(version: str) -> str:
+    return f"{META_DIR}.{version}"
+
+def _build_dir(version: str) -> str:
+    return f"{BUILD_DIR}.{version}"
+
+def _write_json(path: str, data: Dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _build_manifest(index, version: str, kinds, build_info: Optional[Dict]) -> Dict:
+    kind_counts: Dict[str, int] = {}
+    for kind in kinds or ():
+        kind_counts[kind or "unknown"] = kind_counts.get(kind or "unknown", 0) + 1
+    return {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "count": int(index.ntotal),
+        "kinds": kind_counts,
+        "index_type": type(_base_index(index)).__name__,
+        "metric": "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+        "dim": int(index.d),
+        **(build_info or {}),
+    }
+
+def _publish_to_disk(index, metadata: MetadataWriter, edges=None, build_info=None):
+    """새 빌드 디렉터리를 임시 이름으로 완성·fsync한 뒤 rename하고, 마지막에 버전 포인터를 바꾼다.
+
+    읽는 쪽은 포인터가 가리키는 완성된 빌드만 보므로 새 인덱스와 이전 메타데이터가 섞이지 않는다.
+    """
+    version = str(time.time_ns())
+    build_dir = _build_dir(version)
+    tmp_dir = f"{build_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        with timed("index_write"):
+            meta_dir = os.path.join(tmp_dir, BUILD_META_DIR)
+            metadata.write(meta_dir)
+            # BM25 색인과 종류별 개수는 방금 쓴 저장소에서 한 문장씩 읽어 만든다
+            store = MetadataStore(meta_dir)
+            rows = range(len(store))
+            LexicalIndex.write(os.path.join(meta_dir, LEXICAL_DIR), store.ids, (store.text_at(r) for r in rows))
+            if edges is not None:
+                GraphIndex.write(os.path.join(meta_dir, GRAPH_DIR), edges)
+            index_path = os.path.join(tmp_dir, BUILD_INDEX_FILE)
+            faiss.write_index(index, index_path)
+            _fsync_path(index_path)
+            kinds = (store.kind_at(r) for r in rows)
+            _write_json(os.path.join(tmp_dir, BUILD_MANIFEST), _build_manifest(index, version, kinds, build_info))
+            del store
+            for root, dirs, _ in os.walk(tmp_dir):
+                for d in dirs:
+                    _fsync_path(os.path.join(root, d))
+            _fsync_path(tmp_dir)
+            os.replace(tmp_dir, build_dir)
+
+            def _dump_version(p):
+                with open(p, "w", encoding="utf-8") as f:
+                    f.write(version)
+            _write_atomic(VERSION_FILE, _dump_version)
+    except BaseException:
+        metadata.discard()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    count_items("index_write", index.ntotal)
+
+    # 같은 프로세스의 상주 인덱스는 디스크를 다시 읽지 않고 바로 교체
+    _index_holder.publish(_open_snapshot(index, version, build_dir))
+    _collect_old_builds(version)
+
+def _collect_old_builds(current: str, keep: int = KEEP_VERSIONS):
+    # 최근 keep개 빌드는 아직 읽는 중인 프로세스가 있을 수 있으므로 남긴다.
+    # 이미 mmap으로 연 파일은 지워져도 해당 프로세스에서는 계속 읽힌다 (POSIX)
+    builds = sorted(glob.glob(f"{BUILD_DIR}.*[0-9]"), key=lambda d: int(d.rsplit(".", 1)[1]))
+    for old in builds[:-max(keep, 1)]:
+        if old != _build_dir(current):
+            shutil.rmtree(old, ignore_errors=True)
+    # 새 빌드가 게시되었으므로 구버전 배치 파일은 더 이상 읽히지 않는다
+    for old in glob.glob(f"{META_DIR}.*[0-9]"):
+        shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(INDEX_FILE):
+        os.remove(INDEX_FILE)
+
+def _create_index(n: int, dim: int, index_type: str, metric: int) -> faiss.Index:
+    if index_type == "flat":
+        return faiss.IndexFlat(dim, metric)
+    if index_type == "sq_fp16":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, metric)
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = max(1, min(IVF_NLIST, n // 39))
+        if index_type == "ivf_pq" and (n < 39 * 2 ** PQ_NBITS or dim % PQ_M):
+            print(f"⚠️ 벡터 {n}개(차원 {dim})로는 PQ 코드북을 학습할 수 없어 ivf_flat으로 대체합니다.")
+            index_type = "ivf_flat"
+        quantizer = faiss.IndexFlat(dim, metric)
+        if index_type == "ivf_flat":
+            return faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS, metric)
+    raise ValueError(f"❌ 지원하지 않는 인덱스 종류: {index_type}")
+
+# 인덱스 종류에 맞게 학습까지 마친 빈 인덱스를 생성 (ID 매핑은 호출하는 쪽에서 감싼다)
+# cosine이면 학습/추가하는 벡터는 prepare_vectors로 정규화해서 넘겨야 한다
+def build_index(
+    vectors: np.ndarray, index_type: str = INDEX_TYPE, pca_dim: int = PCA_DIM, metric: str = METRIC
+) -> faiss.Index:
+    n = len(vectors)
+    metric = faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+    if pca_dim and n < pca_dim:
+        print(f"⚠️ 벡터 {n}개로는 {pca_dim}차원 PCA를 학습할 수 없어 원래 차원으로 저장합니다.")
+        pca_dim = 0
+    index = _create_index(n, pca_dim or VECTOR_SIZE, index_type, metric)
+    if pca_dim:
+        # 질의 벡터도 같은 변환을 거치도록 인덱스 앞단에 붙인다.
+        # PCA는 길이를 보존하지 않으므로 cosine이면 줄인 벡터를 다시 정규화해야 내적이 코사인 유사도가 된다
+        if metric == faiss.METRIC_INNER_PRODUCT:
+            index = faiss.IndexPreTransform(faiss.NormalizationTransform(pca_dim), index)
+            index.prepend_transform(faiss.PCAMatrix(VECTOR_SIZE, pca_dim))
+        else:
+            index = faiss.IndexPreTransform(faiss.PCAMatrix(VECTOR_SIZE, pca_dim), index)
+    if not index.is_trained:
+        index.train(vectors)
+    return index
+
+# 내적 인덱스에 넣거나 질의할 벡터는 단위 길이로 맞춘다 (원본은 건드리지 않는다)
+def prepare_vectors(vectors, index: faiss.Index) -> np.ndarray:
+    vectors = np.array(vectors, dtype="float32", order="C", ndmin=2)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(vectors)
+    return vectors
+
+# 검색 거리를 코사인 유사도(클수록 가까움)로 바꾼다.
+# L2 저장본은 OpenAI 임베딩이 단위 길이라는 점을 이용해 |a-b|² = 2 - 2cos 로 환산한다
+def to_similarity(distances: np.ndarray, index: faiss.Index) -> np.ndarray:
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    return 1.0 - distances / 2.0
+
+# ID 매핑/차원 변환 래퍼를 벗긴 실제 인덱스
+def _base_index(index: faiss.Index) -> faiss.Index:
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+# 검색 시점 파라미터(nprobe, efSearch) 적용
+def apply_search_params(index: faiss.Index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+    return index
+
+# 허용된 ID만 후보로 삼는 검색 파라미터 (IVF/HNSW는 현재 nprobe/efSearch를 함께 넘겨야 한다)
+def search_params_for(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = base.nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = base.hnsw.efSearch
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+TRAINED_INDEX_TYPES = ("sq8", "ivf_flat", "ivf_pq")  # 벡터를 모아 학습해야 만들 수 있는 종류
+# 학습에 쓰는 벡터 수 상한 (IVF 클러스터당 39개 × 1024 이상). 나머지는 임시 파일에만 두었다가 학습 후 추가한다
+TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "65536"))
+ADD_CHUNK = 65536  # 학습 뒤 임시 파일에서 한 번에 읽어 추가하는 벡터 수
+
+class IndexBuilder:
+    """임베딩 배치를 받는 대로 ID 매핑 인덱스에 넣는다.
+
+    학습이 필요한 종류(SQ8, IVF, PCA)는 벡터를 임시 파일에 흘려 쓰면서 최대 TRAIN_SAMPLE개를
+    무작위 표본(저수지 표집)으로 남기고, finish()에서 표본으로 학습한 뒤 임시 파일에서 나눠 읽어 추가한다.
+    """
+
+    def __init__(
+        self, index_type: str = INDEX_TYPE, pca_dim: int = PCA_DIM, metric: str = METRIC,
+        train_sample: int = TRAIN_SAMPLE, spool_dir: str = "."
+    ):
+        self.index_type, self.pca_dim, self.metric = index_type, pca_dim, metric
+        self.train_sample = train_sample
+        self._index = None
+        self._spool = None
+        if not pca_dim and index_type not in TRAINED_INDEX_TYPES:
+            empty = np.empty((0, VECTOR_SIZE), dtype="float32")
+            self._index = apply_search_params(faiss.IndexIDMap2(build_index(empty, index_type, 0, metric)))
+        else:
+            self._spool = tempfile.NamedTemporaryFile(prefix=".vectors_spool.", dir=spool_dir, delete=False)
+            self._ids: List[np.ndarray] = []
+            self._sample = np.empty((0, VECTOR_SIZE), dtype="float32")
+            self._seen = 0
+            self._rng = np.random.default_rng(0)
+
+    def add(self, ids: Sequence[int], vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.metric == "cosine":
+            vectors = np.array(vectors)
+            faiss.normalize_L2(vectors)
+        ids = np.asarray(ids, dtype="int64")
+        if self._index is not None:
+            self._index.add_with_ids(vectors, ids)
+            return
+        self._spool.write(vectors.tobytes())
+        self._ids.append(ids)
+        self._keep_sample(vectors)
+
+    def _keep_sample(self, vectors: np.ndarray):
+        # 지금까지 본 벡터마다 같은 확률로 표본에 남는다 (표본이 차기 전에는 모두 남긴다)
+        room = max(self.train_sample - len(self._sample), 0)
+        if room:
+            self._sample = np.concatenate([self._sample, vectors[:room]])
+        rest = vectors[room:]
+        if len(rest):
+            positions = self._rng.integers(0, np.arange(self._seen + room, self._seen + len(vectors)) + 1)
+            keep = positions < self.train_sample
+            self._sample[positions[keep]] = rest[keep]
+        self._seen += len(vectors)
+
+    def finish(self) -> faiss.Index:
+        if self._index is None:
+            self._spool.close()
+            try:
+                ids = np.concatenate(self._ids) if self._ids else np.empty(0, dtype="int64")
+                index = faiss.IndexIDMap2(build_index(self._sample, self.index_type, self.pca_dim, self.metric))
+                self._index = apply_search_params(index)
+                self._sample = None
+                if len(ids):
+                    vectors = np.memmap(self._spool.name, dtype="float32", mode="r", shape=(len(ids), VECTOR_SIZE))
+                    for start in range(0, len(ids), ADD_CHUNK):
+                        chunk = np.ascontiguousarray(vectors[start:start + ADD_CHUNK])
+                        self._index.add_with_ids(chunk, ids[start:start + ADD_CHUNK])
+                    del vectors
+            finally:
+                self.discard()
+        return self._index
+
+    def discard(self):
+        """임시 파일을 지운다 (finish() 뒤나 빌드를 포기할 때)."""
+        if self._spool is not None:
+            self._spool.close()
+            if os.path.exists(self._spool.name):
+                os.remove(self._spool.name)
+            self._ids = []
 
 # 문장 + 벡터를 FAISS 인덱스와 메타데이터로 저장
-def save_embeddings_to_faiss(sentences: List[str], embeddings: List[List[float]]):
-    vectors = np.array(embeddings, dtype="float32")
-    index = faiss.IndexFlatL2(VECTOR_SIZE)
-    index.add(vectors)
+def save_embeddings_to_faiss(
+    sentences: List[str],
+    embeddings: List[List[float]],
+    ids: Optional[List[int]] = None,
+    uris: Optional[List[Optional[str]]] = None,
+    kinds: Optional[List[Optional[str]]] = None,
+    edges: Optional[List[Tuple[int, int]]] = None,
+    parents: Optional[List[Optional[int]]] = None,
+    build_info: Optional[Dict] = None,
+):
+    """build_info(임베딩 모델, 원본 해시 등)는 빌드 매니페스트에 함께 기록된다."""
+    if ids is None:
+        ids = list(range(len(sentences)))
+    builder = IndexBuilder()
+    builder.add(ids, embeddings)
+    save_built_index(builder.finish(), ids, sentences, uris, kinds, edges, parents, build_info)
+
+# IndexBuilder로 만든 인덱스를 문장 메타데이터와 함께 게시 (ids 순서는 인덱스에 넣은 순서와 달라도 된다)
+def save_built_index(
+    index: faiss.Index,
+    ids: List[int],
+    sentences: List[str],
+    uris: Optional[List[Optional[str]]] = None,
+    kinds: Optional[List[Optional[str]]] = None,
+    edges: Optional[List[Tuple[int, int]]] = None,
+    parents: Optional[List[Optional[int]]] = None,
+    build_info: Optional[Dict] = None,
+):
+    n = len(ids)
+    metadata = MetadataWriter()
+    for row in zip(ids, sentences, uris or [None] * n, kinds or [None] * n, parents or [None] * n):
+        metadata.add(*row)
+    publish_index(index, metadata, edges, build_info)
+
+# 문장 메타데이터를 MetadataWriter로 흘려 받은 경우 (전체 문서 목록을 메모리에 두지 않는 파이프라인용)
+def publish_index(
+    index: faiss.Index,
+    metadata: MetadataWriter,
+    edges: Optional[List[Tuple[int, int]]] = None,
+    build_info: Optional[Dict] = None,
+):
+    n = len(metadata)
+    _publish_to_disk(index, metadata, edges, build_info)
+    print(f"✅ 저장 완료: {n}개 문장을 FAISS에 저장했습니다.")
+
+# 변경된 문장만 반영하는 증분 업데이트 (삭제 후 추가)
+def update_faiss_index(
+    added_ids: List[int],
+    added_sentences: List[str],
+    added_embeddings,
+    removed_ids: List[int],
+    added_uris: Optional[List[Optional[str]]] = None,
+    added_kinds: Optional[List[Optional[str]]] = None,
+    edges: Optional[List[Tuple[int, int]]] = None,
+    added_parents: Optional[List[Optional[int]]] = None,
+    build_info: Optional[Dict] = None,
+):
+    """edges나 build_info를 주지 않으면 이전 버전의 관계 그래프·빌드 정보를 그대로 유지한다."""
+    index, metadata = load_faiss_index()
+    if not isinstance(index, faiss.IndexIDMap2) or not isinstance(metadata, MetadataStore):
+        raise ValueError("❌ 증분 업데이트는 ID 매핑 인덱스에서만 가능합니다. 전체 재구축이 필요합니다.")
+    if removed_ids and isinstance(_base_index(index), faiss.IndexHNSW):
+        raise ValueError("❌ HNSW 인덱스는 벡터 삭제를 지원하지 않습니다. 전체 재구축이 필요합니다.")
 
-    faiss.write_index(index, INDEX_FILE)
+    if removed_ids:
+        index.remove_ids(np.asarray(removed_ids, dtype="int64"))
+    if added_ids:
+        # 기존 인덱스의 척도를 따른다 (L2 저장본에 증분 추가해도 정규화하지 않는다)
+        vectors = prepare_vectors(added_embeddings, index)
+        index.add_with_ids(vectors, np.asarray(added_ids, dtype="int64"))
 
-    with open(META_FILE, "wb") as f:
-        pickle.dump(sentences, f)
+    if edges is None:
+        graph = _open_graph(metadata)
+        edges = list(graph.edges()) if graph is not None else None
+    if build_info is None:
+        previous = read_build_manifest() or {}
+        computed = _build_manifest(index, "", None, None)
+        build_info = {k: v for k, v in previous.items() if k not in computed}
 
-    print(f"✅ 저장 완료: {len(sentences)}개 문장을 FAISS에 저장했습니다.")
+    # 유지하는 문장은 이전 저장소에서 한 행씩 옮겨 쓴다
+    removed = set(removed_ids)
+    writer = MetadataWriter()
+    for r in metadata.records():
+        if r["id"] not in removed:
+            writer.add(r["id"], r["text"], r["uri"], r["kind"], r["parent"])
+    n_added = len(added_ids)
+    for row in zip(
+        added_ids, added_sentences, added_uris or [None] * n_added,
+        added_kinds or [None] * n_added, added_parents or [None] * n_added
+    ):
+        writer.add(*row)
+    _publish_to_disk(index, writer, edges, build_info)
 
-# FAISS와 문장 메타데이터 불러오기
-def load_faiss_index() -> Tuple[faiss.IndexFlatL2, List[str]]:
+    print(f"✅ 증분 업데이트 완료: 추가 {len(added_ids)}개, 삭제 {len(removed_ids)}개 (총 {index.ntotal}개)")
+
+def load_content_hashes() -> Optional[Dict[int, str]]:
+    """저장된 ID → 문장 내용 해시. 증분 업데이트가 불가능한 상태(없음/구버전)면 None."""
+    version = _read_version()
+    if version is None:
+        return None
+    if os.path.isdir(_build_dir(version)):
+        metadata = MetadataStore(os.path.join(_build_dir(version), BUILD_META_DIR))
+    elif os.path.exists(INDEX_FILE) and os.path.isdir(_meta_dir(version)):
+        metadata = MetadataStore(_meta_dir(version))
+    else:
+        return None
+    return {int(metadata.ids[row]): metadata.hash_at(row) for row in range(len(metadata))}
+
+def read_build_manifest(version: Optional[str] = None) -> Optional[Dict]:
+    """빌드 매니페스트 (개수, 종류별 개수, 인덱스 종류, 임베딩 모델, 원본 해시 등). 없으면 None."""
+    version = version or _read_version()
+    try:
+        with open(os.path.join(_build_dir(version), BUILD_MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (TypeError, FileNotFoundError):
+        return None
+
+Metadata = Union[MetadataStore, Dict[int, str]]
+
+# FAISS와 문장 메타데이터 불러오기 (매번 디스크에서 새로 읽으므로 수정해도 서비스 중인 인덱스에 영향이 없다)
+def load_faiss_index() -> Tuple[faiss.Index, Metadata]:
+    snapshot = _load_snapshot(_read_version())
+    return snapshot.index, snapshot.metadata
+
+def _load_snapshot(version: Optional[str]) -> "IndexSnapshot":
+    if version is not None and os.path.isdir(_build_dir(version)):
+        build_dir = _build_dir(version)
+        index = faiss.read_index(os.path.join(build_dir, BUILD_INDEX_FILE))
+        return _open_snapshot(apply_search_params(index), version, build_dir)
+
+    # 구버전 배치: 작업 디렉터리의 인덱스 파일 + 버전별 메타데이터 디렉터리
     index = faiss.read_index(INDEX_FILE)
+    if version is not None and os.path.isdir(_meta_dir(version)):
+        metadata = MetadataStore(_meta_dir(version))
+        return IndexSnapshot(apply_search_params(index), metadata, version, _open_lexical(metadata), _open_graph(metadata))
+
+    # 구버전 메타데이터(pickle)는 그대로 읽되, 문장 리스트면 행 번호를 ID로 사용
     with open(META_FILE, "rb") as f:
-        sentences = pickle.load(f)
-    return index, sentences
+        meta = pickle.load(f)
+    if isinstance(meta, list):
+        meta = dict(enumerate(meta))
+    return IndexSnapshot(apply_search_params(index), meta, version)
+
+def _open_snapshot(index, version: str, build_dir: str) -> "IndexSnapshot":
+    metadata = MetadataStore(os.path.join(build_dir, BUILD_META_DIR))
+    return IndexSnapshot(
+        index, metadata, version, _open_lexical(metadata), _open_graph(metadata), read_build_manifest(version)
+    )
+
+def _open_lexical(metadata: Metadata) -> Optional[LexicalIndex]:
+    # BM25 색인이 없는 이전 버전 저장본이면 None (벡터 검색만 사용)
+    if isinstance(metadata, MetadataStore):
+        path = os.path.join(metadata.path, LEXICAL_DIR)
+        if os.path.isdir(path):
+            return LexicalIndex(path)
+    return None
+
+def _open_graph(metadata: Metadata) -> Optional[GraphIndex]:
+    if isinstance(metadata, MetadataStore):
+        path = os.path.join(metadata.path, GRAPH_DIR)
+        if os.path.isdir(path):
+            return GraphIndex(path)
+    return None
+
+class IndexSnapshot:
+    """한 버전의 인덱스·메타데이터·BM25 색인·관계 그래프 묶음.
+
+    게시된 뒤에는 바뀌지 않으므로 잠금 없이 여러 스레드가 함께 읽고, 질의 하나는 처음 잡은 스냅샷만 사용한다.
+    """
+
+    def __init__(
+        self,
+        index,
+        metadata: Metadata,
+        version: Optional[str],
+        lexical: Optional[LexicalIndex] = None,
+        graph: Optional[GraphIndex] = None,
+        manifest: Optional[Dict] = None,
+    ):
+        self.index = index
+        self.metadata = metadata
+        self.version = version
+        self.lexical = lexical
+        self.graph = graph
+        self.manifest = manifest
+        self._kind_filters: Dict[Tuple[str, ...], Tuple[faiss.SearchParameters, Optional[np.ndarray]]] = {}
+
+    def _kind_filter(self, kinds: Optional[Sequence[str]]):
+        """(FAISS 검색 파라미터, BM25 행 마스크) — 종류 정보가 없는 저장본이거나 kinds가 없으면 (None, None).
+
+        종류 조합별로 한 번만 만들어 두고 이 스냅샷이 버려질 때 함께 버린다.
+        """
+        if not kinds or not isinstance(self.metadata, MetadataStore):
+            return None, None
+        key = tuple(sorted(kinds))
+        if key not in self._kind_filters:
+            ids = self.metadata.ids_of_kinds(key)
+            selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(np.ascontiguousarray(ids, dtype="int64")))
+            params = search_params_for(self.index, selector)
+            params.referenced_selector = selector  # 파라미터가 살아 있는 동안 선택자도 유지
+            mask = np.isin(self.lexical.ids, ids) if self.lexical is not None else None
+            self._kind_filters[key] = (params, mask)
+        return self._kind_filters[key]
+
+    def search(
+        self, query: np.ndarray, k: int, kinds: Optional[Sequence[str]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, Metadata]:
+        """(코사인 유사도, ID, 메타데이터). 인덱스보다 k가 크면 남는 자리는 ID -1로 채워진다.
+
+        kinds를 주면 그 요소 종류의 벡터만 검색한다.
+        """
+        params, _ = self._kind_filter(kinds)
+        with timed("search"):
+            distances, ids = self.index.search(prepare_vectors(query, self.index), k, params=params)
+        return to_similarity(distances, self.index), ids, self.metadata
+
+    def vector_candidates(
+        self, queries: np.ndarray, n: int, kinds: Optional[Sequence[str]] = None
+    ) -> List[Dict[int, float]]:
+        """질의마다 {ID: 코사인 유사도} (유사도 순). 인덱스보다 n이 커서 생긴 빈 자리(-1)는 뺀다."""
+        similarities, ids, _ = self.search(queries, n, kinds)
+        return [
+            {int(i): float(s) for i, s in zip(row_ids, row_similarities) if i != -1}
+            for row_ids, row_similarities in zip(ids, similarities)
+        ]
+
+    def fuse(
+        self, scores: Dict[int, float], text: str, k: int, candidates: int, kinds: Optional[Sequence[str]] = None
+    ) -> List[int]:
+        """벡터 후보(scores의 순서)와 같은 종류로 좁힌 BM25 후보를 RRF로 합친 상위 k개 ID."""
+        rankings = [list(scores)]
+        if self.lexical is not None:
+            _, mask = self._kind_filter(kinds)
+            with timed("lexical_search"):
+                rankings.append(self.lexical.search(text, max(k, candidates), mask)[1])
+        return reciprocal_rank_fusion(rankings, k)
+
+    def search_hybrid(
+        self, query: np.ndarray, text: str, k: int, candidates: int, kinds: Optional[Sequence[str]] = None
+    ) -> Tuple[List[int], Dict[int, float], Metadata]:
+        """벡터 검색과 BM25 검색의 후보를 RRF로 합친 상위 k개 ID와 벡터 후보의 코사인 유사도.
+
+        BM25로만 찾은 ID는 유사도 사전에 없다.
+        """
+        (scores,) = self.vector_candidates(query, max(k, candidates), kinds)
+        return self.fuse(scores, text, k, candidates, kinds), scores, self.metadata
+
+    def reconstruct(self, ids: List[int]) -> Optional[np.ndarray]:
+        try:
+            return np.stack([self.index.reconstruct(int(i)) for i in ids]) if ids else None
+        except RuntimeError:
+            # IVF(직접 매핑 없음)이거나 이 버전에 없는 ID
+            return None
+
+    def expand(self, ids: List[int], hops: int, budget: int) -> List[int]:
+        """검색된 ID의 관계 이웃 (관계 그래프가 없는 저장본이면 빈 목록)."""
+        if self.graph is None or hops <= 0 or budget <= 0:
+            return []
+        with timed("graph_expand"):
+            return self.graph.expand(ids, hops, budget)
+
+# 프로세스 전역에서 한 번만 로드하고, 새 버전이 게시되면 스냅샷 참조를 한 번에 바꾸는 인덱스 보관소
+class FaissIndexHolder:
+    LOAD_RETRIES = 3
+
+    def __init__(self):
+        self._reload_lock = threading.Lock()
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._pinned = threading.local()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._snapshot.version if self._snapshot is not None else None
+
+    def publish(self, snapshot: IndexSnapshot):
+        # 참조 교체는 원자적이다. 이전 스냅샷을 쓰는 질의는 끝날 때까지 그대로 쓴다
+        self._snapshot = snapshot
+
+    def _load_consistent(self) -> IndexSnapshot:
+        # 포인터를 읽은 직후 그 빌드가 정리될 수 있으므로(연속 게시) 몇 번 다시 시도
+        for _ in range(self.LOAD_RETRIES):
+            version = _read_version()
+            try:
+                snapshot = _load_snapshot(version)
+            except (FileNotFoundError, RuntimeError):
+                time.sleep(0.05)
+                continue
+            if snapshot.index.ntotal == len(snapshot.metadata):
+                return snapshot
+            time.sleep(0.05)
+        raise RuntimeError("❌ FAISS 인덱스와 메타데이터가 일치하지 않습니다. 저장이 진행 중인지 확인하세요.")
+
+    def refresh(self, force: bool = False):
+        on_disk = _read_version()
+        if not force and self._snapshot is not None and on_disk == self.version:
+            return
+        with self._reload_lock:
+            # 다른 스레드가 이미 교체했으면 다시 읽지 않는다
+            if not force and self._snapshot is not None and _read_version() == self.version:
+                return
+            with timed("index_load"):
+                snapshot = self._load_consistent()
+            self.publish(snapshot)
+
+    def pin(self) -> IndexSnapshot:
+        """이 스레드가 pinned() 안에 있으면 그 스냅샷, 아니면 최신 버전을 반영한 현재 스냅샷."""
+        pinned = getattr(self._pinned, "snapshot", None)
+        if pinned is not None:
+            return pinned
+        self.refresh()
+        return self._snapshot
+
+    @contextmanager
+    def pinned(self, snapshot: Optional[IndexSnapshot] = None):
+        """블록 안의 검색·확장·벡터 조회가 모두 같은 버전을 보도록 고정한다 (snapshot을 주면 그 버전으로)."""
+        previous = getattr(self._pinned, "snapshot", None)
+        self._pinned.snapshot = snapshot if snapshot is not None else self.pin()
+        try:
+            yield self._pinned.snapshot
+        finally:
+            self._pinned.snapshot = previous
+
+    def search(self, query: np.ndarray, k: int, kinds: Optional[Sequence[str]] = None):
+        return self.pin().search(query, k, kinds)
+
+    def search_hybrid(self, query: np.ndarray, text: str, k: int, candidates: int, kinds: Optional[Sequence[str]] = None):
+        return self.pin().search_hybrid(query, text, k, candidates, kinds)
+
+    def reconstruct(self, ids: List[int]) -> Optional[np.ndarray]:
+        return self.pin().reconstruct(ids)
+
+    def expand(self, ids: List[int], hops: int, budget: int) -> List[int]:
+        return self.pin().expand(ids, hops, budget)
+
+_index_holder = FaissIndexHolder()
+
+def get_index_holder() -> FaissIndexHolder:
+    return _index_holder
+
+# 디스크의 최신 버전을 반영한 뒤 현재 서비스 중인 인덱스 버전 반환 (캐시 무효화 키로 사용)
+def current_index_version() -> Optional[str]:
+    _index_holder.refresh()
+    return _index_holder.version
+
+# 질의 하나가 여러 번 검색·조회하는 동안 같은 인덱스 버전을 쓰도록 고정 (with pin_index() as snapshot: ...)
+# 다른 스레드에서 이어 검색할 때는 current_snapshot()으로 잡아 둔 스냅샷을 넘긴다
+def pin_index(snapshot: Optional[IndexSnapshot] = None):
+    return _index_holder.pinned(snapshot)
+
+# 디스크의 최신 버전을 반영한 현재 스냅샷 (스레드에 고정하지 않는다)
+def current_snapshot() -> IndexSnapshot:
+    return _index_holder.pin()
+
+# 유사도 기준을 넘는 결과만 남긴다: min_similarity 미만과 최고 점수보다 margin 넘게 낮은 결과를 버린다
+def filter_by_similarity(
+    ids: List[int],
+    scores: Dict[int, float],
+    min_similarity: float = MIN_SIMILARITY,
+    margin: float = SIMILARITY_MARGIN,
+) -> List[int]:
+    """점수가 없는 ID(BM25로만 찾은 문장)는 점수로 통과한 결과가 하나라도 있을 때만 남긴다."""
+    if min_similarity <= 0 and margin <= 0:
+        return ids
+    best = max((scores[i] for i in ids if i in scores), default=None)
+    if best is None:
+        return [] if min_similarity > 0 else ids
+    cutoff = max(min_similarity, best - margin) if margin > 0 else min_similarity
+    if best < cutoff:
+        return []
+    return [i for i in ids if i not in scores or scores[i] >= cutoff]
 
 # 질의 벡터에 대해 유사한 문장 top-k 검색
 def search_faiss(query_vector: List[float], k: int = 5) -> List[str]:
-    index, sentences = load_faiss_index()
+    return [text for text, _, _ in search_faiss_scored(query_vector, k)]
+
+# (문장, 코사인 유사도, 요소 메타데이터) top-k — 유사도 기준에 못 미치는 결과는 빠지므로 k개보다 적을 수 있다
+def search_faiss_scored(
+    query_vector: List[float],
+    k: int = 5,
+    min_similarity: float = MIN_SIMILARITY,
+    margin: float = SIMILARITY_MARGIN,
+    kinds: Optional[Sequence[str]] = None,
+) -> List[Tuple[str, float, Dict]]:
+    query = np.array([query_vector], dtype="float32")
+    similarities, ids, metadata = _index_holder.search(query, k, kinds)
+    scores = {int(i): float(s) for i, s in zip(ids[0], similarities[0]) if i != -1}
+    kept = filter_by_similarity(list(scores), scores, min_similarity, margin)
+    return [(metadata[i], scores[i], _element_metadata(metadata, i)) for i in kept]
+
+def _element_metadata(metadata: Metadata, id_: int) -> Dict:
+    if isinstance(metadata, MetadataStore):
+        record = metadata.get(id_)
+        del record["text"]
+        return record
+    return {"id": int(id_)}
+
+# 질의 벡터 + 질의 문장으로 벡터/BM25 혼합 검색
+def search_hybrid(query_vector: List[float], query_text: str, k: int = 5, candidates: int = HYBRID_CANDIDATES) -> List[str]:
     query = np.array([query_vector], dtype="float32")
-    distances, indices = index.search(query, k)
-    return [sentences[i] for i in indices[0]]
+    ids, _, metadata = _index_holder.search_hybrid(query, query_text, k, candidates)
+    return [metadata[i] for i in ids]
+
+# 검색 결과(query_text가 있으면 혼합 검색)에 관계 그래프로 이웃 요소 ID를 최대 budget개 덧붙인다
+def search_context_ids(
+    query_vector: List[float],
+    query_text: Optional[str] = None,
+    k: int = 5,
+    hops: int = 1,
+    budget: int = 5,
+    candidates: int = HYBRID_CANDIDATES,
+    min_similarity: float = MIN_SIMILARITY,
+    margin: float = SIMILARITY_MARGIN,
+    kinds: Optional[Sequence[str]] = None,
+    kind_fallback_similarity: float = 0.0,
+) -> Tuple[List[int], Metadata]:
+    """유사도 기준을 넘는 결과가 없으면 빈 목록 (그래프 확장도 하지 않는다).
+
+    kinds를 주면 검색과 그래프 확장 모두 그 요소 종류(예: ["rule"])로 제한한다. 그 종류에서 찾은 결과가 없거나
+    벡터 최고 유사도가 kind_fallback_similarity 미만이면 종류를 잘못 짚은 것으로 보고 전체에서 다시 찾는다.
+    """
+    (ids,), metadata = search_context_ids_batch(
+        [query_vector], [query_text], k, hops, budget, candidates, min_similarity, margin, [kinds],
+        kind_fallback_similarity,
+    )
+    return ids, metadata
+
+# search_context_ids를 여러 질의에 한꺼번에 적용 (일괄 평가용)
+def search_context_ids_batch(
+    query_vectors,
+    query_texts: Optional[Sequence[Optional[str]]] = None,
+    k: int = 5,
+    hops: int = 1,
+    budget: int = 5,
+    candidates: int = HYBRID_CANDIDATES,
+    min_similarity: float = MIN_SIMILARITY,
+    margin: float = SIMILARITY_MARGIN,
+    kinds: Optional[Sequence[Optional[Sequence[str]]]] = None,
+    kind_fallback_similarity: float = 0.0,
+) -> Tuple[List[List[int]], Metadata]:
+    """벡터 검색은 질의 전체를 묶어 index.search 한 번(종류를 좁힌 질의는 종류 조합마다 한 번씩 더)으로 하고,
+    BM25 결합·유사도 기준·조각 묶기·그래프 확장은 질의마다 적용한다. 결과는 질의 하나씩 부른 것과 같다.
+
+    query_texts[i]가 None이면 i번째 질의는 벡터 검색만, kinds[i]는 search_context_ids의 kinds와 같다.
+    """
+    queries = np.array(query_vectors, dtype="float32", ndmin=2)
+    texts = list(query_texts) if query_texts is not None else [None] * len(queries)
+    kinds = list(kinds) if kinds is not None else [None] * len(queries)
+    width = _candidate_width(k, candidates, any(t is not None for t in texts))
+    snapshot = _index_holder.pin()  # 검색과 그래프 확장이 같은 버전을 보도록
+    context = lambda row, scores, row_kinds=None: _context_ids(
+        snapshot, scores, texts[row], k, hops, budget, candidates, min_similarity, margin, row_kinds
+    )
+
+    results: List[Optional[List[int]]] = [None] * len(queries)
+    routed: Dict[Tuple[str, ...], List[int]] = {}
+    for row, row_kinds in enumerate(kinds):
+        if row_kinds:
+            routed.setdefault(tuple(sorted(row_kinds)), []).append(row)
+    for key, rows in routed.items():
+        for row, scores in zip(rows, snapshot.vector_candidates(queries[rows], width, key)):
+            ids = context(row, scores, key)
+            best = max(scores.values(), default=None)
+            if ids and (kind_fallback_similarity <= 0 or (best is not None and best >= kind_fallback_similarity)):
+                results[row] = ids
+            else:
+                count_items("kind_fallback", 1)
+
+    # 종류를 좁히지 않은 질의와 전체에서 다시 찾을 질의를 한 번에 검색
+    rest = [row for row, ids in enumerate(results) if ids is None]
+    if rest:
+        for row, scores in zip(rest, snapshot.vector_candidates(queries[rest], width)):
+            results[row] = context(row, scores)
+    return results, snapshot.metadata
+
+def _candidate_width(k: int, candidates: int, hybrid: bool) -> int:
+    # 조각 묶기로 줄어들 몫까지 가져오고, 혼합 검색이면 RRF에 넣을 벡터 후보 수만큼 가져온다
+    fetch = k * CHUNK_OVERFETCH
+    return max(fetch, candidates) if hybrid else fetch
+
+def _context_ids(
+    snapshot: IndexSnapshot,
+    scores: Dict[int, float],
+    query_text: Optional[str],
+    k: int,
+    hops: int,
+    budget: int,
+    candidates: int,
+    min_similarity: float,
+    margin: float,
+    kinds: Optional[Sequence[str]] = None,
+) -> List[int]:
+    """벡터 후보 하나(질의 하나)에 BM25 결합 → 유사도 기준 → 조각 묶기 → 그래프 확장을 적용한다."""
+    metadata = snapshot.metadata
+    if query_text is not None:
+        ids = snapshot.fuse(scores, query_text, k * CHUNK_OVERFETCH, candidates, kinds)
+    else:
+        ids = list(scores)[:k * CHUNK_OVERFETCH]
+    ids = filter_by_similarity(ids, scores, min_similarity, margin)
+    if not ids:
+        return []
+    groups = collapse_chunks(ids, metadata, k)
+    neighbors = snapshot.expand(list(groups), hops, budget)
+    # 증분 업데이트에서 이어받은 간선은 이미 삭제된 요소를 가리킬 수 있으므로 메타데이터에 있는 이웃만 사용
+    hits = [i for members in groups.values() for i in members]
+    neighbors = [i for i in neighbors if i in metadata and i not in groups]
+    if kinds and isinstance(metadata, MetadataStore):
+        neighbors = [i for i in neighbors if metadata.kind_of(i) in kinds]
+    return hits + neighbors
+
+# 같은 요소에서 나온 조각을 한데 모아 서로 다른 요소 상위 k개로 줄인다 ({대표 ID: [조각 ID...]}, 순위 순)
+def collapse_chunks(ids: List[int], metadata: Metadata, k: int) -> Dict[int, List[int]]:
+    groups: Dict[int, List[int]] = {}
+    for id_ in ids:
+        parent = metadata.parent_of(id_) if isinstance(metadata, MetadataStore) else id_
+        if parent not in groups:
+            if len(groups) == k:
+                continue
+            groups[parent] = []
+        if len(groups[parent]) < CHUNKS_PER_PARENT:
+            groups[parent].append(id_)
+    return groups
+
+def search_context(
+    query_vector: List[float],
+    query_text: Optional[str] = None,
+    k: int = 5,
+    hops: int = 1,
+    budget: int = 5,
+    candidates: int = HYBRID_CANDIDATES,
+    min_similarity: float = MIN_SIMILARITY,
+    margin: float = SIMILARITY_MARGIN,
+    kinds: Optional[Sequence[str]] = None,
+    kind_fallback_similarity: float = 0.0,
+) -> List[str]:
+    ids, metadata = search_context_ids(
+        query_vector, query_text, k, hops, budget, candidates, min_similarity, margin, kinds, kind_fallback_similarity
+    )
+    return [metadata[i] for i in ids]
+
+# 저장된 벡터를 ID로 다시 꺼낸다 (문맥 중복 제거용). 복원할 수 없는 인덱스면 None
+# 검색 결과와 같은 버전에서 꺼내려면 pin_index() 안에서 호출한다
+def lookup_vectors(ids: List[int]) -> Optional[np.ndarray]:
+    return _index_holder.reconstruct(ids)
+
+# 여러 질의 벡터를 한 번의 index.search로 검색
+def search_faiss_batch(
+    query_vectors,
+    k: int = 5,
+    min_similarity: float = MIN_SIMILARITY,
+    margin: float = SIMILARITY_MARGIN,
+    kinds: Optional[Sequence[str]] = None,
+) -> List[List[str]]:
+    queries = np.ascontiguousarray(query_vectors, dtype="float32")
+    similarities, ids, metadata = _index_holder.search(queries, k, kinds)
+    results = []
+    for row, row_similarities in zip(ids, similarities):
+        scores = {int(i): float(s) for i, s in zip(row, row_similarities) if i != -1}
+        results.append([metadata[i] for i in filter_by_similarity(list(scores), scores, min_similarity, margin)])
+    return results
 
-save_faiss_index = save_embeddings_to_faiss
\ No newline at end of file
+save_faiss_index = save_embeddings_to_faiss
@@ -1,13 +1,122 @@
+import os
+import re
+import time
 import requests
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Optional
+from metrics import timed, observe_duration, observe_payload, count_items
 
-FUSEKI_ENDPOINT = "http://3.36.178.68:3030/dataset/query"
+FUSEKI_ENDPOINT = os.getenv("FUSEKI_ENDPOINT", "http://3.36.178.68:3030/dataset/query")
+SPARQL_PAGE_SIZE = 10_000  # 큰 결과는 LIMIT/OFFSET으로 나눠 가져온다
+SPARQL_MAX_WORKERS = 5
+SPARQL_RESULT_FORMAT = os.getenv("SPARQL_RESULT_FORMAT", "tsv")  # tsv: 스트리밍 파싱, json: 응답 전체를 한 번에 파싱
 
-def run_sparql_query(query: str) -> List[Dict]:
+# 연결을 재사용하는 공유 세션 (동시 추출 시 쿼리마다 TCP 연결을 새로 맺지 않도록)
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=SPARQL_MAX_WORKERS, pool_maxsize=SPARQL_MAX_WORKERS))
+_session.mount("https://", HTTPAdapter(pool_connections=SPARQL_MAX_WORKERS, pool_maxsize=SPARQL_MAX_WORKERS))
+
+def run_sparql_query(query: str, query_name: str = "adhoc") -> List[Dict]:
     headers = {"Accept": "application/sparql-results+json"}
-    response = requests.post(FUSEKI_ENDPOINT, data={"query": query}, headers=headers)
-    response.raise_for_status()
-    return response.json()["results"]["bindings"]
+    with timed("sparql_fetch", query=query_name):
+        response = _session.post(FUSEKI_ENDPOINT, data={"query": query}, headers=headers)
+        response.raise_for_status()
+        bindings = response.json()["results"]["bindings"]
+    observe_payload("sparql_fetch", len(response.content), query=query_name)
+    count_items("sparql_fetch", len(bindings), query=query_name)
+    return bindings
+
+_XSD = "http://www.w3.org/2001/XMLSchema#"
+_TSV_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+_TSV_ESCAPE_RE = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+_TSV_LITERAL_RE = re.compile(r'^"(.*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?$', re.DOTALL)
+
+def _unescape_tsv(text: str) -> str:
+    def replace(m):
+        esc = m.group(1)
+        if esc[0] in "uU" and len(esc) > 1:
+            return chr(int(esc[1:], 16))
+        return _TSV_ESCAPES.get(esc, esc)
+    return _TSV_ESCAPE_RE.sub(replace, text)
+
+def _parse_tsv_term(term: str) -> Optional[Dict]:
+    # SPARQL 1.1 TSV의 RDF 항(Turtle 표기)을 JSON 결과 형식의 바인딩으로 변환
+    if not term:
+        return None
+    if term.startswith("<") and term.endswith(">"):
+        return {"type": "uri", "value": term[1:-1]}
+    if term.startswith("_:"):
+        return {"type": "bnode", "value": term[2:]}
+    m = _TSV_LITERAL_RE.match(term)
+    if m:
+        binding = {"type": "literal", "value": _unescape_tsv(m.group(1))}
+        if m.group(2):
+            binding["xml:lang"] = m.group(2)
+        if m.group(3):
+            binding["datatype"] = m.group(3)
+        return binding
+    # 숫자/불리언 축약 표기
+    if term in ("true", "false"):
+        datatype = "boolean"
+    elif re.fullmatch(r"[+-]?\d+", term):
+        datatype = "integer"
+    elif re.fullmatch(r"[+-]?\d*\.\d+", term):
+        datatype = "decimal"
+    else:
+        datatype = "double"
+    return {"type": "literal", "value": term, "datatype": _XSD + datatype}
+
+def run_sparql_query_stream(query: str, query_name: str = "adhoc") -> Iterator[Dict]:
+    """TSV 결과를 줄 단위로 읽어 바인딩을 하나씩 내보낸다 (응답 전체를 메모리에 올리지 않음)."""
+    headers = {"Accept": "text/tab-separated-values"}
+    # 소비하는 쪽이 바인딩을 처리하는 시간은 빼고 수신/파싱 시간만 잰다
+    elapsed, size, count = 0.0, 0, 0
+    started = time.perf_counter()
+    with _session.post(FUSEKI_ENDPOINT, data={"query": query}, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        lines = response.iter_lines(delimiter=b"\n")
+        header = next(lines, b"")
+        size += len(header) + 1
+        header = header.decode("utf-8").rstrip("\r")
+        variables = [v.lstrip("?$") for v in header.split("\t")] if header else []
+        for raw in lines:
+            size += len(raw) + 1
+            line = raw.decode("utf-8").rstrip("\r")
+            if not line and len(variables) != 1:
+                continue
+            binding = {}
+            for var, term in zip(variables, line.split("\t")):
+                value = _parse_tsv_term(term)
+                if value is not None:
+                    binding[var] = value
+            count += 1
+            elapsed += time.perf_counter() - started
+            yield binding
+            started = time.perf_counter()
+    elapsed += time.perf_counter() - started
+    observe_duration("sparql_fetch", elapsed, query=query_name)
+    observe_payload("sparql_fetch", size, query=query_name)
+    count_items("sparql_fetch", count, query=query_name)
+
+def iter_sparql_query(query: str, order_by: str, page_size: Optional[int] = None, query_name: str = "adhoc") -> Iterator[Dict]:
+    """ORDER BY로 순서를 고정한 뒤 페이지 단위로 가져와 바인딩을 하나씩 내보낸다."""
+    page_size = page_size or SPARQL_PAGE_SIZE
+    offset = 0
+    while True:
+        paged_query = f"{query}\nORDER BY {order_by}\nLIMIT {page_size}\nOFFSET {offset}"
+        if SPARQL_RESULT_FORMAT == "tsv":
+            count = 0
+            for binding in run_sparql_query_stream(paged_query, query_name):
+                count += 1
+                yield binding
+        else:
+            page = run_sparql_query(paged_query, query_name)
+            count = len(page)
+            yield from page
+        if count < page_size:
+            return
+        offset += page_size
 
 def get_classes() -> List[Dict]:
     query = """
@@ -21,7 +130,7 @@ def get_classes() -> List[Dict]:
       OPTIONAL { ?class rdfs:comment ?comment }
     }
     """
-    results = run_sparql_query(query)
+    results = iter_sparql_query(query, "?class ?label ?comment", query_name="classes")
     return [
         {
             "uri": r.get("class", {}).get("value"),
@@ -43,7 +152,7 @@ def get_object_properties() -> List[Dict]:
       OPTIONAL { ?property rdfs:range ?range }
     }
     """
-    results = run_sparql_query(query)
+    results = iter_sparql_query(query, "?property ?domain ?range", query_name="object_props")
     return [
         {
             "uri": r.get("property", {}).get("value"),
@@ -65,7 +174,7 @@ def get_data_properties() -> List[Dict]:
       OPTIONAL { ?property rdfs:range ?range }
     }
     """
-    results = run_sparql_query(query)
+    results = iter_sparql_query(query, "?property ?domain ?range", query_name="data_props")
     return [
         {
             "uri": r.get("property", {}).get("value"),
@@ -76,6 +185,9 @@ def get_data_properties() -> List[Dict]:
     ]
 
 def get_individuals_with_literals_and_relations() -> List[Dict]:
+    return list(iter_individuals_with_literals_and_relations())
+
+def iter_individuals_with_literals_and_relations() -> Iterator[Dict]:
     query = """
     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
     PREFIX owl: <http://www.w3.org/2002/07/owl#>
@@ -90,14 +202,20 @@ def get_individuals_with_literals_and_relations() -> List[Dict]:
       }
     }
     """
-    results = run_sparql_query(query)
-    individuals = {}
+    return group_individual_bindings(iter_sparql_query(query, "?individual ?type ?prop ?value", query_name="individuals"))
+
+def group_individual_bindings(results) -> Iterator[Dict]:
+    # (개체, 속성, 값) 행을 개체 단위로 묶는다 — ?individual 순으로 정렬된 스트림이므로
+    # 개체가 바뀔 때마다 완성된 개체를 내보내 메모리에는 한 개체만 유지
+    current = None
     for r in results:
         uri = r.get("individual", {}).get("value")
         if not uri:
             continue
-        if uri not in individuals:
-            individuals[uri] = {
+        if current is None or current["uri"] != uri:
+            if current is not None:
+                yield current
+            current = {
                 "uri": uri,
                 "type": r.get("type", {}).get("value"),
                 "literals": [],
@@ -108,16 +226,17 @@ def get_individuals_with_literals_and_relations() -> List[Dict]:
         if not prop or not value:
             continue
         if "valueType" in r and r["valueType"].get("value"):  # literal
-            individuals[uri]["literals"].append({
+            current["literals"].append({
                 "prop": prop,
                 "value": value
             })
         else:  # object property (relation)
-            individuals[uri]["relations"].append({
+            current["relations"].append({
                 "prop": prop,
                 "target": value
             })
-    return list(individuals.values())
+    if current is not None:
+        yield current
 
 def get_swrl_rules() -> List[Dict]:
     query = """
@@ -136,7 +255,7 @@ def get_swrl_rules() -> List[Dict]:
       OPTIONAL { ?rule swrl:head ?head }
     }
     """
-    results = run_sparql_query(query)
+    results = iter_sparql_query(query, "?rule ?label ?comment ?body ?head ?isEnabled", query_name="rules")
     return [
         {
             "uri": r.get("rule", {}).get("value"),
@@ -148,3 +267,21 @@ def get_swrl_rules() -> List[Dict]:
         }
         for r in results
     ]
+
+# 추출 쿼리를 공유 세션 위에서 동시에 실행
+# stream_individuals=True면 가장 큰 개체 결과는 제너레이터로 남겨 소비하는 쪽에서 한 개체씩 읽는다
+def fetch_ontology_elements(max_workers: int = SPARQL_MAX_WORKERS, stream_individuals: bool = False) -> Dict:
+    fetchers = {
+        "classes": get_classes,
+        "object_props": get_object_properties,
+        "data_props": get_data_properties,
+        "rules": get_swrl_rules,
+    }
+    if not stream_individuals:
+        fetchers["individuals"] = get_individuals_with_literals_and_relations
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(fetch) for name, fetch in fetchers.items()}
+        elements = {name: future.result() for name, future in futures.items()}
+    if stream_individuals:
+        elements["individuals"] = iter_individuals_with_literals_and_relations()
+    return elements
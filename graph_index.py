@@ -0,0 +1,105 @@
+# graph_index.py
+# 개체 간 관계(prop → target)를 요소 ID 기준 CSR 인접 배열로 저장하고 mmap으로 읽는다.
+# 질의마다 SPARQL을 다시 보내지 않고 검색된 문장의 이웃 요소를 1~2홉까지 바로 찾을 수 있다.
+
+import os
+import json
+import numpy as np
+from typing import Container, Dict, Iterable, List, Optional, Sequence, Tuple
+
+GRAPH_DIR = "graph"  # 메타데이터 디렉터리 안의 하위 디렉터리
+
+class EdgeCollector:
+    """문서를 하나씩 받아 두었다가 links(대상 IRI 목록)를 같은 IRI를 가진 문서 ID 사이의 간선으로 바꾼다.
+
+    문서 본문은 남기지 않고 IRI → ID, (ID, 대상 IRI)만 모은다.
+    """
+
+    def __init__(self):
+        self._ids_by_uri: Dict[str, List[int]] = {}
+        self._links: List[Tuple[int, str]] = []
+
+    def add(self, document: Dict, id_: int):
+        uri = document.get("uri")
+        # 여러 조각으로 나뉜 개체는 첫 조각만 노드가 된다
+        if isinstance(uri, str) and ":" in uri and not document.get("chunk"):
+            self._ids_by_uri.setdefault(uri, []).append(id_)
+        self._links.extend((id_, target) for target in document.get("links", ()))
+
+    def edges(self, allowed: Optional[Container[int]] = None) -> List[Tuple[int, int]]:
+        """allowed를 주면 양 끝이 모두 그 안에 있는 간선만 (예: 임베딩에 성공한 문서)."""
+        edges = []
+        for id_, target in self._links:
+            if allowed is not None and id_ not in allowed:
+                continue
+            edges.extend(
+                (id_, t) for t in self._ids_by_uri.get(target, ())
+                if t != id_ and (allowed is None or t in allowed)
+            )
+        return edges
+
+def edges_from_documents(documents: Sequence[Dict], ids: Sequence[int]) -> List[Tuple[int, int]]:
+    """문서의 links(대상 IRI 목록)를 같은 IRI를 가진 문서 ID 사이의 간선으로 바꾼다."""
+    collector = EdgeCollector()
+    for document, id_ in zip(documents, ids):
+        collector.add(document, id_)
+    return collector.edges()
+
+class GraphIndex:
+    """정렬된 노드 ID, 오프셋, 이웃 ID 세 열로 된 무방향 인접 구조 (읽기 전용)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.nodes = load("nodes")
+        self._offsets = load("offsets")
+        self._neighbors = load("neighbors")
+
+    @staticmethod
+    def write(path: str, edges: Iterable[Tuple[int, int]]):
+        pairs = np.array(list(edges), dtype="int64").reshape(-1, 2)
+        # 관계 방향과 무관하게 따라갈 수 있도록 역방향 간선도 넣고 중복 제거
+        pairs = np.unique(np.concatenate([pairs, pairs[:, ::-1]]), axis=0)
+        nodes, counts = np.unique(pairs[:, 0], return_counts=True)
+        offsets = np.zeros(len(nodes) + 1, dtype="int64")
+        np.cumsum(counts, out=offsets[1:])
+
+        os.makedirs(path, exist_ok=True)
+        for name, array in {"nodes": nodes, "offsets": offsets, "neighbors": pairs[:, 1]}.items():
+            with open(os.path.join(path, f"{name}.npy"), "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"nodes": len(nodes), "edges": len(pairs) // 2}, f)
+
+    def neighbors(self, id_: int) -> np.ndarray:
+        row = int(np.searchsorted(self.nodes, id_))
+        if row == len(self.nodes) or self.nodes[row] != id_:
+            return self._neighbors[:0]
+        return self._neighbors[self._offsets[row]:self._offsets[row + 1]]
+
+    def edges(self) -> Iterable[Tuple[int, int]]:
+        sources = np.repeat(np.asarray(self.nodes), np.diff(self._offsets))
+        return zip(sources.tolist(), np.asarray(self._neighbors).tolist())
+
+    def expand(self, seeds: Sequence[int], hops: int = 1, budget: int = 5) -> List[int]:
+        """seeds에서 hops 단계까지 너비 우선으로 이웃을 모은다 (가까운 홉·상위 검색 결과 순, 최대 budget개)."""
+        frontier = list(dict.fromkeys(int(s) for s in seeds))
+        seen = set(frontier)
+        added: List[int] = []
+        for _ in range(hops):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self.neighbors(node).tolist():
+                    if neighbor in seen:
+                        continue
+                    seen.add(neighbor)
+                    added.append(neighbor)
+                    next_frontier.append(neighbor)
+                    if len(added) >= budget:
+                        return added
+            frontier = next_frontier
+        return added
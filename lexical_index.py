@@ -0,0 +1,135 @@
+# lexical_index.py
+# 온톨로지 문장에 대한 BM25 역색인. FAISS 인덱스와 같은 요소 ID를 쓰고 버전별 메타데이터 디렉터리 안에 저장된다.
+# 벡터 검색이 놓치는 식별자(로컬 이름)와 한국어 도메인 용어의 정확한 일치를 보완한다.
+
+import os
+import re
+import json
+import unicodedata
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LEXICAL_DIR = "lexical"  # 메타데이터 디렉터리 안의 하위 디렉터리
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # reciprocal rank fusion 상수: 1 / (RRF_K + 순위)
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+_HANGUL_RE = re.compile(r"[가-힣]")
+
+def tokenize(text: str) -> List[str]:
+    """소문자 단어 + camelCase 조각(hasFreightCost → has, freight, cost) + 한글 단어의 2글자 조각.
+
+    형태소 분석기 없이도 '운송을'과 '운송'이 맞도록 한글은 바이그램을 함께 넣는다.
+    """
+    tokens = []
+    for word in _WORD_RE.findall(unicodedata.normalize("NFKC", text)):
+        lower = word.lower()
+        tokens.append(lower)
+        if _HANGUL_RE.search(word):
+            if len(word) > 2:
+                tokens.extend(lower[i:i + 2] for i in range(len(lower) - 1))
+        else:
+            parts = _CAMEL_RE.findall(word)
+            if len(parts) > 1:
+                tokens.extend(p.lower() for p in parts)
+    return tokens
+
+class LexicalIndex:
+    """용어별 게시 목록(CSR)을 .npy 열로 저장하고 mmap으로 읽는 읽기 전용 BM25 색인."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.terms = load("terms")  # 정렬된 용어
+        self._term_offsets = load("term_offsets")
+        self._postings = load("postings")  # 문서 행 번호
+        self._tfs = load("tfs")
+        self.ids = load("ids")  # 행 번호 → 요소 ID
+        k1, b = self.manifest["k1"], self.manifest["b"]
+        doc_lengths = np.asarray(load("doc_lengths"), dtype="float32")
+        avgdl = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        # 문서 길이 정규화 항은 질의와 무관하므로 미리 계산
+        self._norms = k1 * (1 - b + b * doc_lengths / (avgdl or 1.0))
+
+    @staticmethod
+    def write(path: str, ids: Sequence[int], texts: Iterable[str], k1: float = BM25_K1, b: float = BM25_B):
+        """texts는 ids와 같은 순서의 반복 가능한 객체 (저장소에서 한 문장씩 읽어 넘겨도 된다)."""
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[row] = counts.get(row, 0) + 1
+
+        doc_lengths = np.array(lengths, dtype="int32")
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype="int64")
+        np.cumsum([len(postings[t]) for t in terms], out=term_offsets[1:])
+        rows = np.fromiter((r for t in terms for r in postings[t]), dtype="int32", count=int(term_offsets[-1]))
+        tfs = np.fromiter((c for t in terms for c in postings[t].values()), dtype="float32", count=int(term_offsets[-1]))
+
+        os.makedirs(path, exist_ok=True)
+        columns = {
+            "terms": np.array(terms, dtype=str) if terms else np.array([], dtype="<U1"),
+            "term_offsets": term_offsets,
+            "postings": rows,
+            "tfs": tfs,
+            "ids": np.asarray(ids, dtype="int64"),
+            "doc_lengths": doc_lengths,
+        }
+        for name, array in columns.items():
+            with open(os.path.join(path, f"{name}.npy"), "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": len(doc_lengths), "terms": len(terms), "k1": k1, "b": b}, f)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _postings_of(self, term: str):
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return None
+        start, end = self._term_offsets[i], self._term_offsets[i + 1]
+        return self._postings[start:end], self._tfs[start:end]
+
+    def search(self, query: str, k: int = 5, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(점수, 요소 ID) — 질의 용어가 하나도 없는 문서는 결과에 넣지 않는다.
+
+        allowed는 행 번호별 불리언 마스크로, False인 문서는 결과에서 뺀다.
+        """
+        n = len(self.ids)
+        scores = np.zeros(n, dtype="float32")
+        for term in set(tokenize(query)):
+            found = self._postings_of(term)
+            if found is None:
+                continue
+            rows, tfs = found
+            idf = np.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.manifest["k1"] + 1) / (tfs + self._norms[rows])
+
+        if allowed is not None:
+            scores[~allowed] = 0
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return scores[matched], np.asarray(self.ids[matched])
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int, rrf_k: int = RRF_K) -> List[int]:
+    """여러 검색 결과(ID 순위 목록)를 순위만으로 합친다. 점수 척도가 달라도 그대로 결합할 수 있다."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking):
+            if id_ == -1:
+                continue
+            fused[int(id_)] = fused.get(int(id_), 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=lambda i: -fused[i])[:k]
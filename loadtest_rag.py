@@ -0,0 +1,99 @@
+# loadtest_rag.py
+# 로컬 OpenAI 대역을 상대로 비동기 질의 경로의 처리량과 꼬리 지연을 동시성 단계별로 측정
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from stub_openai import fake_embedding
+
+def start_stub_process(embed_latency: float, chat_latency: float):
+    # 대역 서버가 측정 대상 프로세스의 GIL을 나눠 쓰지 않도록 별도 프로세스로 실행
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_openai.py")
+    process = subprocess.Popen(
+        [sys.executable, script, "--port", str(port),
+         "--embed-latency", str(embed_latency), "--chat-latency", str(chat_latency)],
+        stdout=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("❌ OpenAI 대역 서버를 시작하지 못했습니다.")
+
+async def run_level(generate, concurrency: int, n_requests: int, offset: int):
+    latencies = []
+    queue = iter(range(offset, offset + n_requests))
+
+    async def worker():
+        for i in queue:
+            start = time.perf_counter()
+            await generate(f"질문 {i}: 수출업체는 어떤 조건에서 운송을 담당하나요?")
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, np.array(latencies) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="generate_answer_async 부하 테스트 (로컬 OpenAI 대역 사용)")
+    parser.add_argument("--levels", default="1,4,16,64", help="동시 요청 수 목록")
+    parser.add_argument("--requests", type=int, default=200, help="단계별 요청 수")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="대역 임베딩 응답 지연 (초)")
+    parser.add_argument("--chat-latency", type=float, default=0.2, help="대역 채팅 응답 지연 (초)")
+    parser.add_argument("--index-size", type=int, default=2000, help="테스트용 FAISS 인덱스 문장 수")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="RAG_MAX_CONCURRENCY 재정의")
+    args = parser.parse_args()
+
+    stub, port = start_stub_process(args.embed_latency, args.chat_latency)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    # 실제 인덱스/캐시 파일을 건드리지 않도록 임시 디렉터리에서 실행
+    os.chdir(tempfile.mkdtemp(prefix="rag_loadtest_"))
+    import embedding
+    import rag_query
+    from faiss_store import save_embeddings_to_faiss
+
+    from metrics import start_metrics_server_from_env
+
+    start_metrics_server_from_env()  # METRICS_PORT가 있으면 부하 중 단계별 지연을 /metrics로 볼 수 있다
+    embedding.EMBEDDING_CACHE_ENABLED = False
+    rag_query.ANSWER_CACHE_ENABLED = False
+    if args.max_concurrency:
+        rag_query.ASYNC_MAX_CONCURRENCY = args.max_concurrency
+
+    sentences = [f"Synthetic ontology sentence {i}" for i in range(args.index_size)]
+    save_embeddings_to_faiss(sentences, np.stack([fake_embedding(s) for s in sentences]))
+
+    print(f"🧪 대역 지연: 임베딩 {args.embed_latency * 1000:.0f} ms, 채팅 {args.chat_latency * 1000:.0f} ms, "
+          f"동시 처리 상한 {rag_query.ASYNC_MAX_CONCURRENCY}")
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+    async def run_all():
+        offset = 0
+        for level in (int(v) for v in args.levels.split(",")):
+            elapsed, latencies = await run_level(rag_query.generate_answer_async, level, args.requests, offset)
+            offset += args.requests
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"{level:>11} {args.requests / elapsed:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {latencies.max():>8.1f}")
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        stub.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# metadata_store.py
+# FAISS ID별 문장 메타데이터를 열(column) 단위 .npy 파일로 저장하고 mmap으로 읽는다.
+# 전체를 역직렬화하지 않으므로 시작 시간이 문장 수와 무관하고, 여러 프로세스가 페이지 캐시를 공유한다.
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+
+KINDS = ["unknown", "class", "object_property", "data_property", "individual", "rule"]
+MANIFEST_FILE = "manifest.json"
+
+def content_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+class MetadataWriter:
+    """문장을 받는 대로 임시 파일에 흘려 쓰고, write()에서 ID 순으로 정렬한 열 파일을 만든다.
+
+    문장·URI 본문은 메모리에 모아 두지 않으므로 행마다 고정 크기(ID, 오프셋, 종류, 해시, 부모)만 남는다.
+    """
+
+    def __init__(self, spool_dir: str = "."):
+        self._dir = tempfile.mkdtemp(prefix=".metadata_spool.", dir=spool_dir)
+        self._text = open(os.path.join(self._dir, "text.bin"), "wb")
+        self._uri = open(os.path.join(self._dir, "uri.bin"), "wb")
+        self._ids = array("q")
+        self._text_ends = array("q")
+        self._uri_ends = array("q")
+        self._kinds = array("B")
+        self._parents = array("q")
+        self._hashes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, id_: int, text: str, uri: Optional[str] = None, kind: Optional[str] = None, parent: Optional[int] = None):
+        encoded = text.encode("utf-8")
+        self._text.write(encoded)
+        self._text_ends.append(self._text.tell())
+        self._uri.write((uri or "").encode("utf-8"))
+        self._uri_ends.append(self._uri.tell())
+        self._ids.append(int(id_))
+        self._kinds.append(KINDS.index(kind) if kind in KINDS else 0)
+        self._parents.append(-1 if parent is None else int(parent))
+        self._hashes += hashlib.sha256(encoded).digest()
+
+    def write(self, path: str):
+        """임시 디렉터리에 모두 쓴 뒤 rename 하므로 path에는 완성된 저장소만 나타난다."""
+        self._text.close()
+        self._uri.close()
+        n = len(self._ids)
+        ids = np.frombuffer(self._ids, dtype="int64") if n else np.empty(0, dtype="int64")
+        order = np.argsort(ids, kind="stable")
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        text_offsets = _write_gathered(
+            os.path.join(tmp_path, "text.npy"), self._text.name, _column(self._text_ends, "int64"), order
+        )
+        uri_offsets = _write_gathered(
+            os.path.join(tmp_path, "uri.npy"), self._uri.name, _column(self._uri_ends, "int64"), order
+        )
+        columns = {
+            "ids": ids[order],
+            "text_offsets": text_offsets,
+            "uri_offsets": uri_offsets,
+            "kinds": _column(self._kinds, "uint8")[order],
+            "hashes": np.frombuffer(bytes(self._hashes), dtype="uint8").reshape(n, 32)[order],
+            "parents": _column(self._parents, "int64")[order],
+        }
+        for name, array_ in columns.items():
+            _save_column(os.path.join(tmp_path, f"{name}.npy"), array_)
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"count": n, "kinds": KINDS}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self.discard()
+
+    def discard(self):
+        """임시 파일을 지운다 (write() 뒤나 빌드를 포기할 때)."""
+        self._text.close()
+        self._uri.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+def _column(values: array, dtype: str) -> np.ndarray:
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype=dtype)
+
+def _save_column(path: str, values: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(values))
+        f.flush()
+        os.fsync(f.fileno())
+
+def _write_gathered(path: str, spool_path: str, ends: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """임시 파일에 추가 순서로 이어 쓴 문자열을 order 순으로 옮겨 쓰고 새 오프셋을 돌려준다."""
+    starts = np.concatenate([[0], ends[:-1]]).astype("int64")
+    lengths = (ends - starts)[order]
+    offsets = np.zeros(len(order) + 1, dtype="int64")
+    np.cumsum(lengths, out=offsets[1:])
+    total = int(offsets[-1])
+    if total == 0:
+        _save_column(path, np.empty(0, dtype="uint8"))
+        return offsets
+    source = np.memmap(spool_path, dtype="uint8", mode="r")
+    out = np.lib.format.open_memmap(path, mode="w+", dtype="uint8", shape=(total,))
+    for row, start, end in zip(order.tolist(), offsets[:-1].tolist(), offsets[1:].tolist()):
+        out[start:end] = source[starts[row]:starts[row] + (end - start)]
+    out.flush()
+    del out, source
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+    return offsets
+
+class MetadataStore:
+    """ID로 정렬된 열 파일(ids, 문장, URI, 요소 종류, 내용 해시, 부모 ID)을 mmap으로 여는 읽기 전용 저장소."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        self.ids = load("ids")
+        self._text_offsets = load("text_offsets")
+        self._text = load("text")
+        self._uri_offsets = load("uri_offsets")
+        self._uri = load("uri")
+        self._kinds = load("kinds")
+        self._hashes = load("hashes")
+        # 부모 ID 열이 없는 이전 저장본은 모든 요소가 자기 자신을 부모로 가진다
+        has_parents = os.path.exists(os.path.join(path, "parents.npy"))
+        self._parents = load("parents") if has_parents else None
+
+    @staticmethod
+    def write(
+        path: str,
+        ids: List[int],
+        texts: List[str],
+        uris: Optional[List[Optional[str]]] = None,
+        kinds: Optional[List[Optional[str]]] = None,
+        parents: Optional[List[Optional[int]]] = None,
+    ):
+        """임시 디렉터리에 모두 쓴 뒤 rename 하므로 path에는 완성된 저장소만 나타난다.
+
+        parents는 여러 조각으로 나뉜 요소의 대표(첫 조각) ID이며, 없으면 -1로 저장된다.
+        """
+        n = len(ids)
+        uris = uris if uris is not None else [None] * n
+        kinds = kinds if kinds is not None else [None] * n
+        parents = parents if parents is not None else [None] * n
+        writer = MetadataWriter(os.path.dirname(os.path.abspath(path)))
+        try:
+            for row in zip(ids, texts, uris, kinds, parents):
+                writer.add(*row)
+            writer.write(path)
+        finally:
+            writer.discard()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, id_: int) -> int:
+        row = int(np.searchsorted(self.ids, id_))
+        if row < len(self.ids) and self.ids[row] == id_:
+            return row
+        return -1
+
+    def __contains__(self, id_: int) -> bool:
+        return self.row_of(id_) != -1
+
+    def text_at(self, row: int) -> str:
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        return self._text[start:end].tobytes().decode("utf-8")
+
+    def uri_at(self, row: int) -> Optional[str]:
+        start, end = self._uri_offsets[row], self._uri_offsets[row + 1]
+        return self._uri[start:end].tobytes().decode("utf-8") or None
+
+    def kind_at(self, row: int) -> str:
+        return KINDS[self._kinds[row]]
+
+    def hash_at(self, row: int) -> str:
+        return self._hashes[row].tobytes().hex()
+
+    def kind_of(self, id_: int) -> Optional[str]:
+        row = self.row_of(id_)
+        return self.kind_at(row) if row != -1 else None
+
+    def ids_of_kinds(self, kinds: Sequence[str]) -> np.ndarray:
+        """주어진 요소 종류에 속하는 ID (정렬됨)."""
+        codes = [KINDS.index(k) for k in kinds if k in KINDS]
+        return np.asarray(self.ids[np.isin(self._kinds, codes)])
+
+    def parent_at(self, row: int) -> Optional[int]:
+        if self._parents is None or self._parents[row] == -1:
+            return None
+        return int(self._parents[row])
+
+    def parent_of(self, id_: int) -> int:
+        """검색 결과를 묶을 때 쓰는 요소 ID (조각이면 대표 조각 ID, 아니면 자기 자신)."""
+        row = self.row_of(id_)
+        parent = self.parent_at(row) if row != -1 else None
+        return int(id_) if parent is None else parent
+
+    def __getitem__(self, id_: int) -> str:
+        row = self.row_of(id_)
+        if row == -1:
+            raise KeyError(id_)
+        return self.text_at(row)
+
+    def get(self, id_: int) -> Optional[Dict]:
+        row = self.row_of(id_)
+        if row == -1:
+            return None
+        return {
+            "id": int(id_),
+            "text": self.text_at(row),
+            "uri": self.uri_at(row),
+            "kind": self.kind_at(row),
+            "hash": self.hash_at(row),
+            "parent": self.parent_at(row),
+        }
+
+    def records(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield {
+                "id": int(self.ids[row]),
+                "text": self.text_at(row),
+                "uri": self.uri_at(row),
+                "kind": self.kind_at(row),
+                "hash": self.hash_at(row),
+                "parent": self.parent_at(row),
+            }
@@ -0,0 +1,196 @@
+# metrics.py
+# 단계별 소요 시간/토큰/페이로드 크기를 모아 Prometheus 텍스트 형식과 JSON 로그로 내보내는 가벼운 계측 모듈
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+METRICS_JSON_LOG = os.getenv("METRICS_JSON_LOG", "0") == "1"  # 관측값마다 JSON 한 줄씩 로그
+METRICS_JSON_FILE = os.getenv("METRICS_JSON_FILE", "")  # JSON 로그를 쓸 파일 (비우면 표준 오류)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0이 아니면 서비스 진입점이 이 포트로 /metrics를 연다
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1_000, 2_000, 4_000, 8_000, 16_000)
+
+json_logger = logging.getLogger("rag.metrics")
+
+def _configure_json_logger():
+    # 진입점의 로깅 설정과 무관하게 JSON 한 줄만 그대로 남도록 전용 핸들러를 붙이고 루트로 전파하지 않는다
+    if json_logger.handlers:
+        return
+    handler = logging.FileHandler(METRICS_JSON_FILE, encoding="utf-8") if METRICS_JSON_FILE else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    json_logger.addHandler(handler)
+    json_logger.setLevel(logging.INFO)
+    json_logger.propagate = False
+
+if METRICS_JSON_LOG:
+    _configure_json_logger()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelKey, list] = {}  # labels -> [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(key, le=bound)} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(key, le='+Inf')} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(key)} {series[-1]}")
+        return "\n".join(lines)
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return "\n".join(lines)
+
+def _labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + [(k, str(v)) for k, v in extra.items()]
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+stage_duration = Histogram("rag_stage_duration_seconds", "Duration of pipeline and query stages.", DURATION_BUCKETS)
+payload_bytes = Histogram("rag_payload_bytes", "Size of request/response payloads.", SIZE_BUCKETS)
+prompt_tokens = Histogram("rag_prompt_tokens", "Tokens per assembled prompt/context.", TOKEN_BUCKETS)
+tokens_total = Counter("rag_tokens_total", "OpenAI tokens consumed.")
+items_total = Counter("rag_items_total", "Items processed per stage (sentences, bindings, vectors).")
+
+_ALL = (stage_duration, payload_bytes, prompt_tokens, tokens_total, items_total)
+
+def _log_json(event: Dict):
+    if METRICS_JSON_LOG:
+        json_logger.info(json.dumps(event, ensure_ascii=False))
+
+def observe_duration(stage: str, seconds: float, status: str = "ok", **labels):
+    stage_duration.observe(seconds, stage=stage, status=status, **labels)
+    _log_json({"metric": "stage_duration", "stage": stage, "status": status, "seconds": round(seconds, 6), **labels})
+
+@contextmanager
+def timed(stage: str, **labels):
+    """with timed("search"): ... — 블록 소요 시간을 단계별 히스토그램에 기록"""
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        observe_duration(stage, time.perf_counter() - started, status, **labels)
+
+def observe_payload(stage: str, size: int, **labels):
+    payload_bytes.observe(size, stage=stage, **labels)
+    _log_json({"metric": "payload_bytes", "stage": stage, "bytes": size, **labels})
+
+def observe_tokens(stage: str, n: int, **labels):
+    prompt_tokens.observe(n, stage=stage, **labels)
+    _log_json({"metric": "prompt_tokens", "stage": stage, "tokens": n, **labels})
+
+def count_tokens(stage: str, response, **labels):
+    """OpenAI 응답(또는 스트림 청크)의 usage에서 토큰 수를 기록"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value:
+            tokens_total.inc(value, stage=stage, kind=kind, **labels)
+    _log_json({
+        "metric": "tokens", "stage": stage,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        **labels,
+    })
+
+def count_items(stage: str, n: int, **labels):
+    items_total.inc(n, stage=stage, **labels)
+
+def render_prometheus() -> str:
+    return "\n".join(metric.render() for metric in _ALL) + "\n"
+
+def write_prometheus(path: str):
+    # node_exporter textfile collector 등에서 읽을 수 있도록 원자적으로 기록
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_metrics_server(port: int = 9108) -> ThreadingHTTPServer:
+    """/metrics 스크레이프용 HTTP 서버를 백그라운드 스레드로 시작"""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server_from_env(port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """METRICS_PORT가 설정되어 있으면 프로세스당 한 번만 /metrics 서버를 연다 (Streamlit처럼 스크립트를 다시 실행해도 안전)."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = start_metrics_server(port)
+            except OSError as e:
+                logging.warning(f"⚠️ 지표 서버를 {port}번 포트에 열지 못했습니다: {e}")
+                return None
+            logging.info(f"📈 지표 서버 시작: http://0.0.0.0:{port}/metrics")
+        return _server
@@ -0,0 +1,121 @@
+# ontology_loader.py
+# Fuseki를 거치지 않고 로컬 RDF/XML 파일에서 fuseki_query의 get_* 함수와 같은 구조를 추출
+
+import os
+from itertools import product
+from typing import Dict, List, Optional
+from rdflib import BNode, Graph, Literal, RDF, URIRef
+
+ONTOLOGY_FILE = os.getenv("ONTOLOGY_FILE", "./ontology/RDF_Forwarding.xml")
+
+OWL = "http://www.w3.org/2002/07/owl#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+SWRL = "http://www.w3.org/2003/11/swrl#"
+SWRLA = "http://swrl.stanford.edu/ontologies/3.3/swrla.owl#"
+
+def _value(term) -> Optional[str]:
+    return str(term) if term is not None else None
+
+def _binding(term) -> Dict:
+    # SPARQL JSON 결과 형식의 바인딩 (get_swrl_rules의 label/comment와 같은 모양)
+    if term is None:
+        return {}
+    if isinstance(term, Literal):
+        binding = {"type": "literal", "value": str(term)}
+        if term.language:
+            binding["xml:lang"] = term.language
+        elif term.datatype:
+            binding["datatype"] = str(term.datatype)
+        return binding
+    return {"type": "bnode" if isinstance(term, BNode) else "uri", "value": str(term)}
+
+def _options(graph, subject, predicate) -> List:
+    # SPARQL OPTIONAL과 같이 값이 없으면 [None] 한 행을 만든다
+    values = sorted(graph.objects(subject, predicate), key=str)
+    return values or [None]
+
+def _subjects_of_type(graph, type_uri: str) -> List:
+    return sorted(graph.subjects(RDF.type, URIRef(type_uri)), key=str)
+
+def get_classes(graph) -> List[Dict]:
+    return [
+        {"uri": _value(cls), "label": _value(label), "comment": _value(comment)}
+        for cls in _subjects_of_type(graph, OWL + "Class")
+        for label in _options(graph, cls, URIRef(RDFS + "label"))
+        for comment in _options(graph, cls, URIRef(RDFS + "comment"))
+    ]
+
+def _get_properties(graph, type_uri: str) -> List[Dict]:
+    return [
+        {"uri": _value(prop), "domain": _value(domain), "range": _value(range_)}
+        for prop in _subjects_of_type(graph, type_uri)
+        for domain in _options(graph, prop, URIRef(RDFS + "domain"))
+        for range_ in _options(graph, prop, URIRef(RDFS + "range"))
+    ]
+
+def get_object_properties(graph) -> List[Dict]:
+    return _get_properties(graph, OWL + "ObjectProperty")
+
+def get_data_properties(graph) -> List[Dict]:
+    return _get_properties(graph, OWL + "DatatypeProperty")
+
+def get_individuals_with_literals_and_relations(graph) -> List[Dict]:
+    excluded = {OWL + "Class", OWL + "ObjectProperty", OWL + "DatatypeProperty"}
+    types: Dict = {}
+    for subject, type_ in graph.subject_objects(RDF.type):
+        if str(type_) not in excluded:
+            types.setdefault(subject, []).append(type_)
+
+    individuals = []
+    for subject in sorted(types, key=str):
+        literals, relations = [], []
+        for prop, value in sorted(graph.predicate_objects(subject), key=lambda pv: (str(pv[0]), str(pv[1]))):
+            if isinstance(value, Literal):
+                literals.append({"prop": str(prop), "value": str(value)})
+            else:
+                relations.append({"prop": str(prop), "target": str(value)})
+        individuals.append({
+            "uri": str(subject),
+            "type": str(min(types[subject], key=str)),
+            "literals": literals,
+            "relations": relations,
+        })
+    return individuals
+
+def get_swrl_rules(graph) -> List[Dict]:
+    rules = []
+    for rule in _subjects_of_type(graph, SWRL + "Imp"):
+        rows = product(
+            _options(graph, rule, URIRef(RDFS + "label")),
+            _options(graph, rule, URIRef(RDFS + "comment")),
+            _options(graph, rule, URIRef(SWRLA + "isRuleEnabled")),
+            _options(graph, rule, URIRef(SWRL + "body")),
+            _options(graph, rule, URIRef(SWRL + "head")),
+        )
+        for label, comment, enabled, body, head in rows:
+            rules.append({
+                "uri": str(rule),
+                "label": _binding(label),
+                "comment": _binding(comment),
+                "body": _value(body),
+                "head": _value(head),
+                "isEnabled": _value(enabled),
+            })
+    return rules
+
+def load_graph(path: str = ONTOLOGY_FILE):
+    graph = Graph()
+    graph.parse(path, format="xml")
+    return graph
+
+def load_local_ontology_elements(path: str = ONTOLOGY_FILE) -> Dict[str, List[Dict]]:
+    return ontology_elements_from_graph(load_graph(path))
+
+def ontology_elements_from_graph(graph) -> Dict[str, List[Dict]]:
+    return {
+        "classes": get_classes(graph),
+        "object_props": get_object_properties(graph),
+        "data_props": get_data_properties(graph),
+        "individuals": get_individuals_with_literals_and_relations(graph),
+        "rules": get_swrl_rules(graph),
+    }
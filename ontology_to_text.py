@@ -1,5 +1,14 @@
+import os
 from urllib.parse import urlparse
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterator, List
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+# 개체 문장이 이보다 길면 속성별로 묶어 여러 문장으로 나눈다 (0이면 나누지 않음)
+INDIVIDUAL_CHUNK_MAX_CHARS = int(os.getenv("ONTOLOGY_CHUNK_MAX_CHARS", "1000"))
+
+def is_iri(uri) -> bool:
+    # 블랭크 노드 라벨(rdflib 'N…', Fuseki 'b0')에는 스킴 구분자 ':'가 없다
+    return isinstance(uri, str) and ":" in uri
 
 def extract_local_name(uri: Optional[object]) -> str:
     if not uri:
@@ -45,6 +54,55 @@ def individual_to_text(ind_uri, type_uri, literals: Optional[List[Dict]] = None,
     
     return text
 
+def _split_group(group: List[Dict]) -> List[List[Dict]]:
+    mid = len(group) // 2
+    return [group[:mid], group[mid:]]
+
+def individual_to_chunks(
+    ind_uri,
+    type_uri,
+    literals: Optional[List[Dict]] = None,
+    relations: Optional[List[Dict]] = None,
+    max_chars: int = INDIVIDUAL_CHUNK_MAX_CHARS,
+) -> List[str]:
+    """individual_to_text와 같은 형식이되, 길면 속성 단위로 묶어 max_chars 이하의 문장 여러 개로 나눈다.
+
+    모든 조각은 개체 이름과 타입으로 시작하므로 따로 검색되어도 주어를 알 수 있다.
+    """
+    text = individual_to_text(ind_uri, type_uri, literals, relations)
+    if not max_chars or len(text) <= max_chars:
+        return [text]
+
+    groups: Dict[tuple, List[Dict]] = {}
+    for literal in literals or []:
+        groups.setdefault(("literal", literal["prop"]), []).append(literal)
+    for relation in relations or []:
+        groups.setdefault(("relation", relation["prop"]), []).append(relation)
+    pending = list(groups.items())
+
+    render = lambda selected: individual_to_text(
+        ind_uri, type_uri,
+        [x for (kind, _), g in selected if kind == "literal" for x in g],
+        [x for (kind, _), g in selected if kind == "relation" for x in g],
+    )
+    chunks, current = [], []
+    while pending:
+        key, group = pending.pop(0)
+        if len(render(current + [(key, group)])) <= max_chars:
+            current.append((key, group))
+            continue
+        if current:
+            chunks.append(render(current))
+            current = []
+        if len(group) > 1 and len(render([(key, group)])) > max_chars:
+            # 값이 아주 많은 속성 하나는 값 목록을 반씩 나눠 다시 시도
+            pending[:0] = [(key, part) for part in _split_group(group)]
+        else:
+            current = [(key, group)]
+    if current:
+        chunks.append(render(current))
+    return chunks
+
 def swrl_rule_to_text(rule: Dict) -> str:
     label = rule.get("label", {}).get("value")
     comment = rule.get("comment", {}).get("value")
@@ -57,22 +115,57 @@ def swrl_rule_to_text(rule: Dict) -> str:
     else:
         return "Unnamed rule in the ontology."
 
-def ontology_elements_to_sentences(classes, object_props, data_props, individuals, rules):
-    sentences = []
+def iter_ontology_documents(
+    classes, object_props, data_props, individuals, rules,
+    chunk_max_chars: int = INDIVIDUAL_CHUNK_MAX_CHARS,
+) -> Iterator[Dict]:
+    """요소별 문장과 출처(URI, 요소 종류)를 하나씩 내보낸다. 입력은 리스트뿐 아니라 제너레이터도 가능.
 
+    긴 개체는 조각마다 문서가 되고, parent(개체 URI)와 chunk(순번)로 원래 요소를 가리킨다.
+    """
     for cls in classes:
-        sentences.append(class_to_text(cls.get("uri"), cls.get("label"), cls.get("comment")))
+        yield {"uri": cls.get("uri"), "kind": "class",
+               "text": class_to_text(cls.get("uri"), cls.get("label"), cls.get("comment"))}
 
     for prop in object_props:
-        sentences.append(object_property_to_text(prop.get("uri"), prop.get("domain"), prop.get("range")))
+        yield {"uri": prop.get("uri"), "kind": "object_property",
+               "text": object_property_to_text(prop.get("uri"), prop.get("domain"), prop.get("range"))}
 
     for prop in data_props:
-        sentences.append(data_property_to_text(prop.get("uri"), prop.get("domain"), prop.get("range")))
+        yield {"uri": prop.get("uri"), "kind": "data_property",
+               "text": data_property_to_text(prop.get("uri"), prop.get("domain"), prop.get("range"))}
 
     for ind in individuals:
-        sentences.append(individual_to_text(ind.get("uri"), ind.get("type"), ind.get("literals"), ind.get("relations")))
+        # 블랭크 노드 개체(SWRL 원자·리스트 등 룰을 이루는 보조 노드)는 파싱할 때마다 라벨이 바뀌어
+        # 증분 업데이트마다 다시 임베딩되고 문장 내용도 없으므로 싣지 않는다 (룰은 룰 문서로 들어간다)
+        if not is_iri(ind.get("uri")):
+            continue
+        # links: 관계 그래프용 대상 IRI (rdf:type은 클래스 하나에 개체가 몰려 이웃 확장을 흐리므로 제외)
+        relations = ind.get("relations") or []
+        links = [r["target"] for r in relations if r.get("prop") != RDF_TYPE and is_iri(r.get("target"))]
+        chunks = individual_to_chunks(ind.get("uri"), ind.get("type"), ind.get("literals"), relations, chunk_max_chars)
+        if len(chunks) == 1:
+            yield {"uri": ind.get("uri"), "kind": "individual", "text": chunks[0], "links": links}
+            continue
+        for n, chunk in enumerate(chunks):
+            # 관계 그래프의 노드는 첫 조각이 대표한다
+            yield {"uri": ind.get("uri"), "kind": "individual", "text": chunk,
+                   "links": links if n == 0 else [], "parent": ind.get("uri"), "chunk": n}
 
     for rule in rules:
-        sentences.append(swrl_rule_to_text(rule))
+        yield {"uri": rule.get("uri"), "kind": "rule", "text": swrl_rule_to_text(rule)}
+
+def ontology_elements_to_documents(classes, object_props, data_props, individuals, rules) -> List[Dict]:
+    return list(iter_ontology_documents(classes, object_props, data_props, individuals, rules))
 
-    return sentences
+def document_key(document: Dict) -> str:
+    # 블랭크 노드(SWRL 룰 등)는 로드할 때마다 라벨이 바뀌므로 IRI가 아니면 문장으로 식별
+    uri = document.get("uri")
+    if is_iri(uri):
+        # 첫 조각은 나누지 않은 요소와 같은 키(같은 ID)를 쓴다
+        return f"{uri}#chunk{document['chunk']}" if document.get("chunk") else uri
+    return f"{document.get('kind')}:{document.get('text')}"
+
+def ontology_elements_to_sentences(classes, object_props, data_props, individuals, rules):
+    documents = iter_ontology_documents(classes, object_props, data_props, individuals, rules)
+    return [d["text"] for d in documents]
@@ -0,0 +1,38 @@
+# openai_clients.py
+# 프로세스 전체가 공유하는 OpenAI 클라이언트 (연결 풀 재사용)
+
+import os
+import random
+import asyncio
+import weakref
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+RETRY_BASE_DELAY = 1.0  # 초, 시도마다 2배
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    # 서버가 retry-after를 주면 그만큼, 아니면 지수 백오프 + 지터
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return RETRY_BASE_DELAY * 2 ** attempt * (0.5 + random.random())
+
+# 비동기 클라이언트의 연결은 이벤트 루프에 묶이므로 루프마다 하나씩 만들어 재사용
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+def get_async_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        _async_clients[loop] = async_client
+    return async_client
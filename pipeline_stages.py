@@ -0,0 +1,185 @@
+# pipeline_stages.py
+# 스레드 단계들을 크기 제한 큐로 잇는 스트리밍 파이프라인
+# 뒤 단계가 느리면 큐가 차서 앞 단계가 기다리므로 메모리는 큐 크기만큼만 쓰고,
+# 전체 소요 시간은 단계 시간의 합이 아니라 가장 느린 단계에 가까워진다
+
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from metrics import count_items, observe_duration
+
+QUEUE_SIZE = 8  # 단계 사이 큐에 쌓아 둘 수 있는 항목(배치) 수
+_POLL_SECONDS = 0.1  # 다른 단계가 실패했는지 확인하는 주기
+
+_DONE = object()  # 앞 단계가 끝났음을 알리는 표지
+
+class _Cancelled(Exception):
+    pass
+
+class StageStats:
+    """단계별 처리 항목 수와 실제로 일한 시간 (큐를 기다린 시간 제외)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.wall_seconds if self.wall_seconds else 0.0
+
+class Pipeline:
+    """source → stage → ... 순서로 단계를 등록한 뒤 join()으로 모두 끝날 때까지 기다린다.
+
+    한 단계가 예외를 내면 나머지 단계도 멈추고, join()이 그 예외를 다시 던진다.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stats: Dict[str, StageStats] = {}
+        self._threads: List[threading.Thread] = []
+        self._errors: List[BaseException] = []
+        self._cancel = threading.Event()
+
+    def new_queue(self, maxsize: Optional[int] = None) -> queue.Queue:
+        return queue.Queue(maxsize=maxsize or self.queue_size)
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self._cancel.is_set():
+                raise _Cancelled()
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._cancel.is_set():
+                raise _Cancelled()
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+    def _start(self, name: str, target: Callable[[], None], workers: int = 1):
+        stats = self.stats[name] = StageStats(name)
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def run():
+            try:
+                target()
+            except _Cancelled:
+                pass
+            except BaseException as e:
+                logging.error(f"❌ 파이프라인 단계 '{name}' 실패: {e}")
+                self._errors.append(e)
+                self._cancel.set()
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        stats.finished = time.perf_counter()
+
+        for i in range(workers):
+            thread = threading.Thread(target=run, name=f"pipeline-{name}-{i}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def drain(self, q: queue.Queue, stage: Optional[str] = None) -> Iterator:
+        """앞 단계가 끝날 때까지 q의 항목을 내보낸다. stage를 주면 기다린 시간은 그 단계의 작업 시간에서 뺀다."""
+        while True:
+            started = time.perf_counter()
+            item = self._get(q)
+            if stage is not None:
+                self.stats[stage].busy_seconds -= time.perf_counter() - started
+            if item is _DONE:
+                return
+            yield item
+
+    def source(self, name: str, items: Iterable, out_q: queue.Queue, count: Callable = lambda item: 1):
+        """반복 가능한 입력을 out_q로 흘려보낸다 (제너레이터면 값을 꺼내는 시간이 이 단계의 작업 시간)."""
+
+        def target():
+            stats = self.stats[name]
+            iterator = iter(items)
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stats.busy_seconds += time.perf_counter() - started
+                stats.items += count(item)
+                self._put(out_q, item)
+            self._put(out_q, _DONE)
+
+        self._start(name, target)
+
+    def stage(
+        self,
+        name: str,
+        fn: Callable,
+        in_q: queue.Queue,
+        out_q: Optional[queue.Queue] = None,
+        workers: int = 1,
+        count: Callable = lambda item: 1,
+    ):
+        """in_q의 항목마다 fn을 호출하고, None이 아닌 결과를 out_q로 보낸다.
+
+        workers가 2 이상이면 여러 스레드가 같은 큐에서 꺼내 처리하므로 결과 순서는 보장되지 않는다.
+        count는 처리량 계산에 쓸 항목 수 (배치면 배치 안의 문장 수).
+        """
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def target():
+            stats = self.stats[name]
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    # 같은 단계의 다른 작업 스레드도 끝나도록 표지를 돌려놓는다
+                    self._put(in_q, _DONE)
+                    break
+                started = time.perf_counter()
+                result = fn(item)
+                with lock:
+                    stats.busy_seconds += time.perf_counter() - started
+                    stats.items += count(item)
+                if result is not None and out_q is not None:
+                    self._put(out_q, result)
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and out_q is not None:
+                self._put(out_q, _DONE)
+
+        self._start(name, target, workers)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def report(self):
+        """단계별 처리량을 로그와 지표로 남긴다."""
+        for stats in self.stats.values():
+            count_items(f"pipeline_{stats.name}", stats.items)
+            observe_duration(f"pipeline_{stats.name}", stats.busy_seconds)
+            logging.info(
+                f"📈 {stats.name}: {stats.items}건, {stats.wall_seconds:.2f}초 "
+                f"({stats.throughput:.1f}건/초, 작업 {stats.busy_seconds:.2f}초)"
+            )
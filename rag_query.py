@@ -1,33 +1,262 @@
 # rag_query.py
 
-from embedding import get_embedding
-from faiss_store import search_faiss
-from openai import OpenAI
+from embedding import get_embedding, get_embedding_async
+from faiss_store import search_context_ids, search_context_ids_batch, lookup_vectors, current_snapshot, pin_index
+from answer_cache import AnswerCache
+from context_builder import build_context, count_message_tokens
+from openai_clients import client, get_async_client
+from metrics import timed, count_tokens, count_items, observe_duration, observe_payload, observe_tokens
 import os
+import re
+import time
+import asyncio
+import unicodedata
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 GPT_MODEL = "gpt-3.5-turbo"
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") != "0"
+ASYNC_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "32"))  # 동시에 처리하는 질문 수 상한
+SEARCH_THREADS = 4  # FAISS 검색은 GIL을 놓으므로 스레드 풀에서 실행
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")  # hybrid: 벡터 + BM25 (RRF), vector: 벡터 검색만
+GRAPH_HOPS = int(os.getenv("RAG_GRAPH_HOPS", "1"))  # 검색 결과에서 관계를 따라 확장할 홉 수 (0이면 끔)
+GRAPH_BUDGET = int(os.getenv("RAG_GRAPH_BUDGET", "5"))  # 확장으로 덧붙일 문장 수 상한
+KIND_ROUTING = os.getenv("RAG_KIND_ROUTING", "1") != "0"  # 질문의 키워드로 검색할 요소 종류를 좁힐지 여부
+# 좁혀 찾은 최고 유사도가 이보다 낮으면 종류를 잘못 짚은 것으로 보고 전체에서 다시 검색 (0이면 결과가 없을 때만)
+KIND_FALLBACK_SIMILARITY = float(os.getenv("RAG_KIND_FALLBACK_SIMILARITY", "0.75"))
+# 질문의 단어(한글은 끝의 조사를 뗀 단어)가 이 키워드와 같으면 해당 종류의 문장만 검색
+KIND_KEYWORDS = {
+    "rule": ("rule", "rules", "규칙", "swrl"),
+}
+_WORD_RE = re.compile(r"[^\W_]+")
+_SCRIPT_BOUNDARY_RE = re.compile(r"(?<=[A-Za-z0-9])(?=[가-힣])|(?<=[가-힣])(?=[A-Za-z0-9])")
+# 단어 끝에서 떼어 볼 조사 ('규칙들은' → '규칙'). 긴 것부터 맞춰 본다
+_PARTICLE_RE = re.compile(r"들?(?:에서는|으로는|에서|으로|에는|이란|은|는|이|가|을|를|의|에|로|와|과|도|만|란)?$")
+
+answer_cache = AnswerCache()
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="faiss-search")
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+SYSTEM_PROMPT = "You are an expert AI assistant that uses domain knowledge to answer questions based on the provided context."
+# 유사도 기준(RAG_MIN_SIMILARITY)을 넘는 문장이 없을 때 GPT를 부르지 않고 바로 돌려주는 답변
+NO_CONTEXT_ANSWER = "온톨로지에서 질문과 관련된 정보를 찾지 못했습니다. 질문을 바꾸거나 더 구체적으로 입력해 주세요."
+
+def build_messages(user_question: str, context_sentences):
+    with timed("prompt_assembly"):
+        context = "\n".join(context_sentences)
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {user_question}"}
+        ]
+    observe_payload("prompt_assembly", sum(len(m["content"].encode("utf-8")) for m in messages))
+    observe_tokens("prompt", count_message_tokens(messages))
+    return messages
+
+def detect_kinds(user_question: str) -> Optional[List[str]]:
+    """질문이 특정 요소 종류(예: 규칙)에 관한 것이면 그 종류 목록, 아니면 None (전체 검색)."""
+    if not KIND_ROUTING:
+        return None
+    # 부분 문자열·한글 2글자 조각으로 비교하면 'ruler', 'overrule', '규칙적으로' 같은 단어에도 걸리므로
+    # 단어 전체, 또는 조사를 뗀 단어로만 비교한다 ('SWRL로'처럼 영문 뒤에 붙은 조사는 먼저 떼어 낸다)
+    text = unicodedata.normalize("NFKC", _SCRIPT_BOUNDARY_RE.sub(" ", user_question)).lower()
+    words = set()
+    for word in _WORD_RE.findall(text):
+        words.add(word)
+        words.add(_PARTICLE_RE.sub("", word) or word)
+    kinds = [kind for kind, keywords in KIND_KEYWORDS.items() if words.intersection(keywords)]
+    return kinds or None
+
+def retrieve(user_question: str, query_vec, top_k: int, snapshot=None) -> List[str]:
+    # 재검색·그래프 확장·벡터 조회 도중 새 인덱스가 게시되어도 한 버전만 보도록 고정
+    # (snapshot을 주면 답변 캐시 키로 쓴 바로 그 버전에서 검색한다)
+    with pin_index(snapshot):
+        return _retrieve(user_question, query_vec, top_k)
+
+def _retrieve(user_question: str, query_vec, top_k: int) -> List[str]:
+    query_text = user_question if RETRIEVAL_MODE == "hybrid" else None
+    kinds = detect_kinds(user_question)
+    # 해당 종류에서 찾지 못했거나 유사도가 낮으면 search_context_ids가 전체 문장에서 다시 찾는다
+    ids, metadata = search_context_ids(
+        query_vec, query_text, k=top_k, hops=GRAPH_HOPS, budget=GRAPH_BUDGET,
+        kinds=kinds, kind_fallback_similarity=KIND_FALLBACK_SIMILARITY
+    )
+    return _build_context(ids, metadata)
+
+def retrieve_batch(user_questions: List[str], query_vecs, top_k: int) -> List[List[str]]:
+    """retrieve를 여러 질문에 한꺼번에: 벡터 검색은 묶어서 한 번, BM25 결합·종류 선택·그래프 확장은 질문마다."""
+    query_texts = list(user_questions) if RETRIEVAL_MODE == "hybrid" else None
+    with pin_index():
+        results, metadata = search_context_ids_batch(
+            query_vecs, query_texts, k=top_k, hops=GRAPH_HOPS, budget=GRAPH_BUDGET,
+            kinds=[detect_kinds(q) for q in user_questions], kind_fallback_similarity=KIND_FALLBACK_SIMILARITY
+        )
+        return [_build_context(ids, metadata) for ids in results]
+
+def _build_context(ids: List[int], metadata) -> List[str]:
+    if not ids:
+        count_items("no_context", 1)
+        logging.info("🧾 유사도 기준을 넘는 문장이 없어 GPT 호출을 생략합니다.")
+        return []
+    # 중복 제거 + 긴 문장 분할 + 토큰 예산 안으로 채우기
+    with timed("context_build"):
+        context, stats = build_context([metadata[i] for i in ids], lookup_vectors(ids))
+    observe_tokens("context", stats["tokens"])
+    logging.info(
+        f"🧾 문맥 {stats['sentences']}개 문장 / {stats['tokens']} 토큰 "
+        f"(검색 {len(ids)}개, 중복 제외 {stats['duplicates']}개, 분할 {stats['split']}개, 예산 초과 제외 {stats['dropped']}개)"
+    )
+    return context
+
+def _lookup_cache(user_question: str, version, top_k: int):
+    """(캐시된 답변 또는 None, 질문 임베딩 또는 None)"""
+    # 같은 질문(정규화 기준)에 대한 답변이 있으면 임베딩도 하지 않는다
+    if ANSWER_CACHE_ENABLED:
+        cached = answer_cache.get_exact(user_question, version, top_k)
+        if cached is not None:
+            return cached, None
 
-def generate_answer(user_question: str, top_k: int = 5) -> str:
-    # 1. 사용자 질문을 임베딩
     query_vec = get_embedding(user_question)
 
-    # 2. FAISS에서 관련 문장 검색
-    context_sentences = search_faiss(query_vec, k=top_k)
-    context = "\n".join(context_sentences)
+    # 의미가 거의 같은 질문에 대한 답변이 있으면 재사용
+    if ANSWER_CACHE_ENABLED:
+        cached = answer_cache.get_semantic(query_vec, version, top_k)
+        if cached is not None:
+            return cached, query_vec
+    return None, query_vec
+
+def generate_answer(user_question: str, top_k: int = 5) -> str:
+    started = time.perf_counter()
+    # 캐시 조회·검색·캐시 기록이 모두 같은 인덱스 버전을 쓰도록 처음에 한 번 잡는다
+    snapshot = current_snapshot()
+    version = snapshot.version
+
+    # 1. 캐시 확인 + 사용자 질문을 임베딩
+    cached, query_vec = _lookup_cache(user_question, version, top_k)
+    if cached is not None:
+        return cached
+
+    # 2. FAISS(+ BM25)에서 관련 문장 검색 + 관계 그래프로 이웃 문장 확장
+    context_sentences = retrieve(user_question, query_vec, top_k, snapshot)
+    if not context_sentences:
+        return NO_CONTEXT_ANSWER
 
     # 3. GPT에 질의
-    messages = [
-        {"role": "system", "content": "You are an expert AI assistant that uses domain knowledge to answer questions based on the provided context."},
-        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {user_question}"}
-    ]
+    messages = build_messages(user_question, context_sentences)
+    with timed("completion"):
+        response = client.chat.completions.create(
+            model=GPT_MODEL,
+            messages=messages,
+            temperature=0.3
+        )
+    count_tokens("completion", response)
+    answer = response.choices[0].message.content.strip()
+
+    if ANSWER_CACHE_ENABLED and answer:
+        answer_cache.put(user_question, query_vec, answer, version, time.perf_counter() - started, top_k)
+    return answer
+
+def generate_answer_stream(user_question: str, top_k: int = 5) -> Iterator[str]:
+    """generate_answer와 같은 흐름이지만 완성된 토큰을 생성되는 대로 내보낸다."""
+    started = time.perf_counter()
+    # 생성기는 yield 사이에 다른 일이 끼어들 수 있으므로 스레드에 고정하지 않고 스냅샷만 잡아 둔다
+    snapshot = current_snapshot()
+    version = snapshot.version
+
+    cached, query_vec = _lookup_cache(user_question, version, top_k)
+    if cached is not None:
+        logging.info(f"⏱️ 캐시된 답변 반환 ({time.perf_counter() - started:.3f}초)")
+        yield cached
+        return
 
-    response = client.chat.completions.create(
+    context_sentences = retrieve(user_question, query_vec, top_k, snapshot)
+    if not context_sentences:
+        yield NO_CONTEXT_ANSWER
+        return
+    messages = build_messages(user_question, context_sentences)
+    completion_started = time.perf_counter()
+    stream = client.chat.completions.create(
         model=GPT_MODEL,
         messages=messages,
-        temperature=0.3
+        temperature=0.3,
+        stream=True,
+        stream_options={"include_usage": True}
     )
-    return response.choices[0].message.content.strip()
\ No newline at end of file
+
+    parts, finish_reason = [], None
+    for chunk in stream:
+        count_tokens("completion", chunk)
+        if not chunk.choices:
+            continue
+        finish_reason = chunk.choices[0].finish_reason or finish_reason
+        token = chunk.choices[0].delta.content
+        if not token:
+            continue
+        if not parts:
+            observe_duration("completion_first_token", time.perf_counter() - completion_started)
+            logging.info(f"⏱️ 첫 토큰까지 {time.perf_counter() - started:.3f}초")
+        parts.append(token)
+        yield token
+    observe_duration("completion", time.perf_counter() - completion_started, mode="stream")
+
+    elapsed = time.perf_counter() - started
+    logging.info(f"⏱️ 전체 생성 {elapsed:.3f}초")
+    # 끝까지 생성된(stop) 비어 있지 않은 답변만 캐시한다.
+    # 소비자가 도중에 닫으면 yield에서 GeneratorExit가 나 여기까지 오지 않는다
+    answer = "".join(parts).strip()
+    if ANSWER_CACHE_ENABLED and answer and finish_reason == "stop":
+        answer_cache.put(user_question, query_vec, answer, version, elapsed, top_k)
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    return _semaphores[loop]
+
+async def generate_answer_async(user_question: str, top_k: int = 5) -> str:
+    """generate_answer의 비동기 버전. 공유 AsyncOpenAI 클라이언트를 쓰고 동시 처리 수를 제한한다."""
+    async with _get_semaphore():
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(_search_executor, current_snapshot)
+        version = snapshot.version
+
+        # 답변 캐시는 잠금을 잡고 항목 전체와 유사도를 계산하므로 이벤트 루프 밖에서 조회·기록한다
+        if ANSWER_CACHE_ENABLED:
+            cached = await loop.run_in_executor(_search_executor, answer_cache.get_exact, user_question, version, top_k)
+            if cached is not None:
+                return cached
+
+        query_vec = await get_embedding_async(user_question)
+
+        if ANSWER_CACHE_ENABLED:
+            cached = await loop.run_in_executor(_search_executor, answer_cache.get_semantic, query_vec, version, top_k)
+            if cached is not None:
+                return cached
+
+        context_sentences = await loop.run_in_executor(
+            _search_executor, retrieve, user_question, query_vec, top_k, snapshot
+        )
+        if not context_sentences:
+            return NO_CONTEXT_ANSWER
+
+        messages = build_messages(user_question, context_sentences)
+        with timed("completion", mode="async"):
+            response = await get_async_client().chat.completions.create(
+                model=GPT_MODEL,
+                messages=messages,
+                temperature=0.3
+            )
+        count_tokens("completion", response)
+        answer = response.choices[0].message.content.strip()
+
+        if ANSWER_CACHE_ENABLED and answer:
+            await loop.run_in_executor(
+                _search_executor, answer_cache.put,
+                user_question, query_vec, answer, version, time.perf_counter() - started, top_k
+            )
+        return answer
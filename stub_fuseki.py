@@ -0,0 +1,132 @@
+# stub_fuseki.py
+# 벤치마크용 로컬 Fuseki 대역: RDF 파일을 rdflib로 읽어 SPARQL 질의에 미리 계산한 결과를 돌려준다
+# ORDER BY까지의 본문은 한 번만 실행해 두고 LIMIT/OFFSET 페이지는 잘라서 응답하므로
+# 측정값에는 서버의 질의 시간이 아니라 클라이언트 쪽 전송/파싱 시간이 주로 잡힌다
+
+import json
+import re
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from rdflib import BNode, URIRef
+
+_PAGE_RE = re.compile(r"^(.*)\nLIMIT (\d+)\nOFFSET (\d+)\s*$", re.DOTALL)
+
+def _json_term(term) -> dict:
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    binding = {"type": "literal", "value": str(term)}
+    if term.language:
+        binding["xml:lang"] = term.language
+    elif term.datatype:
+        binding["datatype"] = str(term.datatype)
+    return binding
+
+def _tsv_term(term) -> str:
+    if term is None:
+        return ""
+    if isinstance(term, URIRef):
+        return f"<{term}>"
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    value = (str(term).replace("\\", "\\\\").replace('"', '\\"')
+             .replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r"))
+    if term.language:
+        return f'"{value}"@{term.language}'
+    if term.datatype:
+        return f'"{value}"^^<{term.datatype}>'
+    return f'"{value}"'
+
+class CannedSparql:
+    """질의 본문별 결과 행을 캐시하고 페이지/형식에 맞춰 직렬화한다."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def _results(self, query: str):
+        with self._lock:
+            if query not in self._rows:
+                result = self.graph.query(query)
+                variables = [str(v) for v in result.vars]
+                self._rows[query] = (variables, [tuple(row) for row in result])
+            return self._rows[query]
+
+    def respond(self, query: str, tsv: bool) -> bytes:
+        match = _PAGE_RE.match(query)
+        if match:
+            variables, rows = self._results(match.group(1))
+            offset, limit = int(match.group(3)), int(match.group(2))
+            rows = rows[offset:offset + limit]
+        else:
+            variables, rows = self._results(query)
+
+        if tsv:
+            lines = ["\t".join(f"?{v}" for v in variables)]
+            lines += ["\t".join(_tsv_term(t) for t in row) for row in rows]
+            return ("\n".join(lines) + "\n").encode("utf-8")
+        bindings = [
+            {v: _json_term(t) for v, t in zip(variables, row) if t is not None}
+            for row in rows
+        ]
+        return json.dumps({"head": {"vars": variables}, "results": {"bindings": bindings}}).encode("utf-8")
+
+    def warm_up(self, queries):
+        for query in queries:
+            self.respond(query, tsv=True)
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+        tsv = "tab-separated" in self.headers.get("Accept", "")
+        try:
+            body = self.server.canned.respond(form["query"][0], tsv)
+        except Exception as e:
+            self.send_error(400, str(e))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/tab-separated-values" if tsv else "application/sparql-results+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+def start_stub_fuseki(graph, port: int = 0) -> ThreadingHTTPServer:
+    """백그라운드 스레드에서 서버를 띄우고 반환한다. 엔드포인트는 http://127.0.0.1:{server.server_port}/dataset/query"""
+    server = _StubServer(("127.0.0.1", port), _StubHandler)
+    server.canned = CannedSparql(graph)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    import argparse
+    from benchmark_loader import scale_graph
+    from ontology_loader import ONTOLOGY_FILE, load_graph
+
+    parser = argparse.ArgumentParser(description="로컬 Fuseki SPARQL 대역 서버")
+    parser.add_argument("--file", default=ONTOLOGY_FILE)
+    parser.add_argument("--scale", type=int, default=1, help="개체 복제 배수")
+    parser.add_argument("--port", type=int, default=3030)
+    args = parser.parse_args()
+    server = start_stub_fuseki(scale_graph(load_graph(args.file), args.scale), args.port)
+    print(f"🧪 Fuseki 대역 실행 중: http://127.0.0.1:{server.server_port}/dataset/query")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,134 @@
+# stub_openai.py
+# 부하 테스트/벤치마크용 로컬 OpenAI API 대역 (임베딩 + 채팅 완성(스트리밍 포함), 고정 지연 시간)
+
+import base64
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VECTOR_SIZE = 1536
+
+def fake_embedding(text: str) -> np.ndarray:
+    # 같은 문장은 항상 같은 단위 벡터
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(VECTOR_SIZE).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive로 연결 재사용을 측정할 수 있게
+
+    def setup(self):
+        super().setup()
+        # 헤더와 본문을 따로 쓰므로 Nagle 지연이 측정값에 섞이지 않도록 끈다
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request: dict, answer: str):
+        # stream=True면 단어마다 chat.completion.chunk 이벤트(SSE)를 보내고, 요청하면 마지막에 usage 청크를 붙인다
+        def chunk(choices, **extra):
+            return {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": choices,
+                **extra,
+            }
+
+        events = [chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+        events += [
+            chunk([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            for token in re.findall(r"\S+\s*", answer)
+        ]
+        events.append(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append(chunk([], usage={"prompt_tokens": 0, "completion_tokens": len(events) - 2, "total_tokens": len(events) - 2}))
+        body = "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events) + "data: [DONE]\n\n"
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/embeddings"):
+            time.sleep(self.server.embed_latency)
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            data = []
+            for i, text in enumerate(inputs):
+                vector = fake_embedding(text)
+                if request.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+                else:
+                    embedding = vector.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(len(t) for t in inputs)
+            self._send_json({
+                "object": "list",
+                "data": data,
+                "model": request["model"],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        elif self.path.endswith("/chat/completions"):
+            time.sleep(self.server.chat_latency)
+            question = request["messages"][-1]["content"].rsplit("Question:", 1)[-1].strip()
+            if request.get("stream"):
+                self._send_stream(request, f"(stub) {question}")
+                return
+            self._send_json({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": f"(stub) {question}"},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        else:
+            self.send_error(404)
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # 기본값(5)이면 동시 연결이 몰릴 때 접속이 지연된다
+
+def start_stub_server(embed_latency: float = 0.02, chat_latency: float = 0.2, port: int = 0) -> ThreadingHTTPServer:
+    """백그라운드 스레드에서 서버를 띄우고 반환한다. base URL은 http://127.0.0.1:{server.server_port}/v1"""
+    server = _StubServer(("127.0.0.1", port), _StubHandler)
+    server.embed_latency = embed_latency
+    server.chat_latency = chat_latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="로컬 OpenAI API 대역 서버")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    server = start_stub_server(args.embed_latency, args.chat_latency, args.port)
+    print(f"🧪 OpenAI 대역 실행 중: http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,101 @@
+# tests/conftest.py
+# 외부 서비스 없이 돌도록 OpenAI·Fuseki 대역(stub_openai, stub_fuseki)을 띄우고,
+# 테스트마다 빈 작업 디렉터리에서 인덱스·메타데이터를 만들게 한다
+
+import os
+import sys
+import shutil
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_openai import start_stub_server
+
+# openai_clients가 import 시점에 클라이언트를 만들므로 그 전에 대역 주소를 넣어 둔다
+_openai = start_stub_server(embed_latency=0, chat_latency=0)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{_openai.server_port}/v1"
+os.environ["OPENAI_API_KEY"] = "test"
+os.environ["EMBEDDING_CACHE_ENABLED"] = "0"
+
+import faiss_store
+from stub_openai import fake_embedding
+
+# (ID, 문장, 종류, 부모 ID) — 1~3은 한 개체를 세 조각으로 나눈 문서, 1과 4는 관계로 이어져 있다
+DOCUMENTS = [
+    (1, "shipment1 is an individual of type Shipment. It has literal values: weight = 10.", "individual", 1),
+    (2, "shipment1 is an individual of type Shipment. It is connected to: hasDocument → documentHBL1.", "individual", 1),
+    (3, "shipment1 is an individual of type Shipment. It is connected to: hasPort → busan.", "individual", 1),
+    (4, "documentHBL1 is an individual of type HouseBL.", "individual", None),
+    (5, "'hasDocument' is a relationship from Shipment to Document.", "object_property", None),
+    (6, "Rule S1: 특정 인코텀즈(EXW)일 경우 수출업체가 운송을 담당", "rule", None),
+]
+EDGES = [(1, 4)]
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """테스트마다 새 작업 디렉터리(온톨로지 파일 포함)와 새 인덱스 보관소를 쓴다."""
+    shutil.copytree(os.path.join(ROOT, "ontology"), tmp_path / "ontology")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(faiss_store, "_index_holder", faiss_store.FaissIndexHolder())
+    return tmp_path
+
+@pytest.fixture
+def publish():
+    """publish(index_type, pca_dim)로 DOCUMENTS를 대역 임베딩으로 색인해 게시한다."""
+
+    def publish(index_type="flat", pca_dim=0, documents=DOCUMENTS, edges=EDGES):
+        ids = [d[0] for d in documents]
+        texts = [d[1] for d in documents]
+        builder = faiss_store.IndexBuilder(index_type, pca_dim)
+        builder.add(ids, np.stack([fake_embedding(t) for t in texts]))
+        faiss_store.save_built_index(
+            builder.finish(), ids, texts,
+            uris=[f"urn:test:{i}" for i in ids],
+            kinds=[d[2] for d in documents],
+            edges=edges,
+            parents=[d[3] for d in documents],
+        )
+
+    return publish
+
+@pytest.fixture(scope="session")
+def ontology_graph():
+    from ontology_loader import load_graph
+    return load_graph(os.path.join(ROOT, "ontology", "RDF_Forwarding.xml"))
+
+@pytest.fixture
+def fuseki(monkeypatch):
+    """fuseki(graph)로 그 그래프를 응답하는 대역을 띄우고 fuseki_query가 그쪽으로 질의하게 한다."""
+    import fuseki_query
+    from stub_fuseki import start_stub_fuseki
+
+    servers = []
+
+    def start(graph):
+        server = start_stub_fuseki(graph)
+        servers.append(server)
+        monkeypatch.setattr(
+            fuseki_query, "FUSEKI_ENDPOINT", f"http://127.0.0.1:{server.server_port}/dataset/query"
+        )
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """update_pipeline이 임베딩 요청에 보낸 문장을 모두 기록한다."""
+    import update_pipeline
+
+    texts = []
+    original = update_pipeline.embed_sentences_batched
+
+    def spy(sentences, *args, **kwargs):
+        texts.extend(sentences)
+        return original(sentences, *args, **kwargs)
+
+    monkeypatch.setattr(update_pipeline, "embed_sentences_batched", spy)
+    return texts
@@ -0,0 +1,48 @@
+import answer_cache
+from answer_cache import AnswerCache
+from stub_openai import fake_embedding
+
+def test_answer_cache_exact_and_semantic_hits():
+    cache = AnswerCache(similarity=0.95)
+    vector = fake_embedding("EXW 조건이면 누가 운송하나요?")
+    cache.put("EXW 조건이면 누가 운송하나요?", vector, "수출업체", version="v1", latency=1.5)
+
+    assert cache.get_exact("exw 조건이면  누가 운송하나요", "v1") == "수출업체"
+    assert cache.get_semantic(vector + 0.001, "v1") == "수출업체"
+    assert cache.get_semantic(fake_embedding("다른 질문"), "v1") is None
+    assert cache.stats()["latency_saved_seconds"] == 3.0
+
+def test_answer_cache_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl=60, similarity=0.95)
+    vector = fake_embedding("q")
+    cache.put("q", vector, "a", version="v1", latency=1.0)
+
+    now[0] += 59
+    assert cache.get_exact("q", "v1") == "a"
+    now[0] += 2
+    assert cache.get_exact("q", "v1") is None
+    assert cache.get_semantic(vector, "v1") is None
+
+def test_answer_cache_semantic_tier_is_off_by_default():
+    cache = AnswerCache()
+    vector = fake_embedding("EXW 조건이면 누가 운송하나요?")
+    cache.put("EXW 조건이면 누가 운송하나요?", vector, "수출업체", version="v1", latency=1.5)
+
+    assert cache.similarity == 0
+    assert cache.get_semantic(vector, "v1") is None
+    assert cache.get_exact("EXW 조건이면 누가 운송하나요", "v1") == "수출업체"
+    assert cache.stats()["misses"] == 1
+
+def test_answer_cache_is_invalidated_by_new_index_version():
+    cache = AnswerCache(similarity=0.95)
+    vector = fake_embedding("q")
+    cache.put("q", vector, "old answer", version="v1", latency=1.0)
+
+    assert cache.get_exact("q", "v2") is None
+    assert cache.get_semantic(vector, "v2") is None
+    cache.put("other", fake_embedding("other"), "new answer", version="v2", latency=1.0)
+    # 새 버전 항목이 들어오면 이전 버전 항목은 지워진다
+    assert cache.stats()["entries"] == 1
+    assert cache.get_exact("q", "v1") is None
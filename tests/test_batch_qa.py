@@ -0,0 +1,61 @@
+import numpy as np
+
+import batch_qa
+import faiss_store
+import rag_query
+from conftest import DOCUMENTS
+from stub_openai import fake_embedding
+
+QUESTIONS = [
+    DOCUMENTS[3][1],                    # 개체 문장과 같은 질문 → 그래프 이웃까지 확장
+    "EXW 규칙은 무엇인가요?",              # 규칙으로 좁혀 검색 (유사도가 낮아 전체 검색으로 전환)
+    DOCUMENTS[5][1] + " 이 규칙은?",       # 규칙으로 좁혀 검색
+    "hasDocument relationship",
+]
+
+def _count_vector_searches(monkeypatch):
+    calls = []
+    original = faiss_store.IndexSnapshot.vector_candidates
+
+    def spy(self, queries, n, kinds=None):
+        calls.append((len(queries), kinds))
+        return original(self, queries, n, kinds)
+
+    monkeypatch.setattr(faiss_store.IndexSnapshot, "vector_candidates", spy)
+    return calls
+
+def test_batch_contexts_match_online_retrieval(publish, monkeypatch):
+    publish()
+    vectors = np.stack([fake_embedding(q) for q in QUESTIONS])
+    vectors[2] = fake_embedding(DOCUMENTS[5][1])
+    online = [rag_query.retrieve(q, v, 2) for q, v in zip(QUESTIONS, vectors)]
+    calls = _count_vector_searches(monkeypatch)
+
+    batched = rag_query.retrieve_batch(QUESTIONS, vectors, 2)
+
+    assert batched == online
+    # 규칙 질문 2개를 한 번, 나머지와 전체 검색으로 전환된 질문을 한 번에 검색
+    assert calls == [(2, ("rule",)), (3, None)]
+
+def test_answer_questions_batch_rows_share_schema(publish, monkeypatch):
+    publish()
+    original = batch_qa.embed_sentences_batched
+
+    def drop_second(questions):
+        # 두 번째 질문의 임베딩이 실패한 것처럼 (embed_sentences_batched는 실패한 문장을 빼고 돌려준다)
+        vectors, valid = original(questions)
+        keep = [j for j, i in enumerate(valid) if i != 1]
+        return vectors[keep], [valid[j] for j in keep]
+
+    monkeypatch.setattr(batch_qa, "embed_sentences_batched", drop_second)
+
+    results = batch_qa.answer_questions_batch(QUESTIONS, top_k=2)
+
+    assert len(results) == len(QUESTIONS)
+    assert len({tuple(sorted(r)) for r in results}) == 1
+    assert len({tuple(sorted(r["timings"])) for r in results}) == 1
+    assert results[1]["error"] == "임베딩 실패" and results[1]["prompt_tokens"] == 0
+    for i in (0, 2, 3):
+        assert results[i]["error"] is None
+        assert results[i]["answer"].startswith("(stub)")
+        assert results[i]["contexts"] and results[i]["prompt_tokens"] > 0
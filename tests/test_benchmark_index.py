@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import embedding
+from benchmark_index import vectors_from_saved_index
+from conftest import DOCUMENTS
+from embedding_cache import EmbeddingCache
+from stub_openai import fake_embedding
+
+def _normalized(texts):
+    vectors = np.stack([fake_embedding(t) for t in texts])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "sq_fp16", "hnsw"])
+def test_vectors_from_saved_index_reconstructs_plain_indexes(publish, index_type):
+    publish(index_type)
+
+    vectors = vectors_from_saved_index()
+
+    assert np.allclose(vectors, _normalized([d[1] for d in DOCUMENTS]), atol=1e-3)
+
+def test_vectors_from_saved_pca_index_come_from_embedding_cache(publish, workdir, monkeypatch):
+    publish("flat", pca_dim=4)
+    with pytest.raises(SystemExit):
+        vectors_from_saved_index()
+
+    cache = EmbeddingCache(str(workdir / "cache.sqlite3"))
+    texts = [d[1] for d in DOCUMENTS]
+    cache.put_many(texts, [fake_embedding(t) for t in texts], embedding.EMBEDDING_MODEL)
+    monkeypatch.setattr(embedding, "_cache", cache)
+    monkeypatch.setattr(embedding, "EMBEDDING_CACHE_ENABLED", True)
+
+    vectors = vectors_from_saved_index()
+
+    assert vectors.shape == (len(DOCUMENTS), 1536)
+    assert np.array_equal(vectors, np.stack([fake_embedding(t) for t in texts]))
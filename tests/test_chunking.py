@@ -0,0 +1,36 @@
+import faiss_store
+from faiss_store import collapse_chunks, get_index_holder
+from ontology_to_text import individual_to_chunks, individual_to_text
+
+URI = "http://example.org/ontology#shipment1"
+TYPE = "http://example.org/ontology#Shipment"
+
+def test_small_individual_stays_one_sentence():
+    literals = [{"prop": "urn:p#weight", "value": "10"}]
+
+    assert individual_to_chunks(URI, TYPE, literals, max_chars=1000) == [individual_to_text(URI, TYPE, literals)]
+
+def test_large_individual_is_split_into_bounded_chunks():
+    literals = [{"prop": f"urn:p#value{i % 3}", "value": f"값{i}"} for i in range(60)]
+    relations = [{"prop": "urn:p#hasDocument", "target": f"urn:d#document{i}"} for i in range(40)]
+
+    chunks = individual_to_chunks(URI, TYPE, literals, relations, max_chars=300)
+
+    assert len(chunks) > 1
+    assert all(len(c) <= 300 for c in chunks)
+    # 조각마다 주어가 있고, 값은 빠짐없이 한 번씩 들어간다
+    assert all(c.startswith("shipment1 is an individual of type Shipment.") for c in chunks)
+    joined = " ".join(chunks)
+    assert all(joined.count(f"= 값{i};") + joined.count(f"= 값{i}.") == 1 for i in range(60))
+    assert all(joined.count(f"→ document{i};") + joined.count(f"→ document{i}.") == 1 for i in range(40))
+
+def test_collapse_chunks_groups_by_parent(publish):
+    publish()
+    metadata = get_index_holder().pin().metadata
+
+    groups = collapse_chunks([2, 1, 4, 3, 5], metadata, k=2)
+
+    # 같은 개체의 조각은 대표 ID 아래로 모이고 CHUNKS_PER_PARENT개까지만 남는다
+    assert list(groups) == [1, 4]
+    assert groups[1] == [2, 1][:faiss_store.CHUNKS_PER_PARENT]
+    assert groups[4] == [4]
@@ -0,0 +1,61 @@
+import pytest
+
+import context_builder
+from context_builder import count_tokens, split_sentence
+
+class _ByteEncoding:
+    """UTF-8 바이트 하나를 토큰 하나로 보는 인코딩 (한 글자가 여러 토큰에 걸치는 경우 확인용)."""
+
+    def encode(self, text):
+        return list(text.encode("utf-8"))
+
+    def decode_bytes(self, tokens):
+        return bytes(tokens)
+
+    def decode(self, tokens):
+        return bytes(tokens).decode("utf-8", errors="replace")
+
+@pytest.fixture(params=["approximate", "encoding"])
+def tokenizer(request, monkeypatch):
+    if request.param == "encoding":
+        monkeypatch.setattr(context_builder, "_encoding", _ByteEncoding())
+        monkeypatch.setattr(context_builder, "_encoding_unavailable", False)
+    else:
+        monkeypatch.setattr(context_builder, "_encoding", None)
+        monkeypatch.setattr(context_builder, "_encoding_unavailable", True)
+    return request.param
+
+def _assert_pieces(pieces, max_tokens):
+    assert len(pieces) > 1
+    assert all(count_tokens(p) <= max_tokens for p in pieces)
+    assert not any(p.endswith("…") or ".." in p for p in pieces)
+
+def test_split_without_period_splits_on_semicolons(tokenizer):
+    items = [f"hasValue{i} = 항목{i}" for i in range(120)]
+    text = "; ".join(items)
+
+    pieces = split_sentence(text, 60)
+
+    _assert_pieces(pieces, 60)
+    joined = " ".join(pieces)
+    assert all(item in joined for item in items)
+
+def test_split_with_oversized_first_sentence_keeps_everything_once(tokenizer):
+    head = "shipment1 " + "매우 긴 설명 " * 60 + "끝"
+    tail = [f"hasPort{i} → busan{i}" for i in range(20)]
+    text = f"{head}. " + "; ".join(tail)
+
+    pieces = split_sentence(text, 60)
+
+    _assert_pieces(pieces, 60)
+    joined = " ".join(pieces)
+    assert joined.count("shipment1") == 1  # 너무 긴 첫 문장은 조각마다 반복하지 않는다
+    assert all(t in joined for t in tail)
+
+def test_split_without_any_boundary_uses_token_windows(tokenizer):
+    text = "가나다라마바사아자차카타파하" * 40
+
+    pieces = split_sentence(text, 50)
+
+    _assert_pieces(pieces, 50)
+    assert "".join(p.replace(" ", "") for p in pieces) == text
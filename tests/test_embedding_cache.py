@@ -0,0 +1,62 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+from stub_openai import fake_embedding
+
+MODEL = "text-embedding-ada-002"
+
+def test_embedding_cache_round_trip(workdir):
+    cache = EmbeddingCache(str(workdir / "cache.sqlite3"))
+    vector = fake_embedding("hello")
+    cache.put("hello", vector, MODEL)
+
+    assert np.array_equal(cache.get("hello", MODEL), vector)
+    assert cache.get("hello", "other-model") is None
+    assert cache.stats()["hits"] == 1
+
+def test_embedding_cache_evicts_least_recently_used(workdir):
+    cache = EmbeddingCache(str(workdir / "cache.sqlite3"), max_entries=3)
+    for text in ("a", "b", "c"):
+        cache.put(text, fake_embedding(text), MODEL)
+    cache.get("a", MODEL)  # a가 가장 최근에 쓰인 항목이 된다
+
+    cache.put("d", fake_embedding("d"), MODEL)
+
+    assert len(cache) == 3
+    assert set(cache.get_many(["a", "b", "c", "d"], MODEL)) == {"a", "c", "d"}
+
+def test_embedding_cache_batches_eviction_and_keeps_count(workdir):
+    path = str(workdir / "cache.sqlite3")
+    cache = EmbeddingCache(path, max_entries=10)
+    for i in range(10):
+        cache.put(str(i), fake_embedding(str(i)), MODEL)
+    cache.put("0", fake_embedding("0"), MODEL)  # 이미 있는 항목은 세지 않는다
+    assert len(cache) == 10
+
+    cache.put("new", fake_embedding("new"), MODEL)
+
+    # 한도를 넘으면 한도의 10%만큼 더 지워 두 번째 항목부터 남는다
+    assert len(cache) == 9
+    assert "0" not in cache.get_many(["0", "1"], MODEL)
+    assert len(EmbeddingCache(path, max_entries=10)) == 9
+
+def test_embedding_cache_batches_last_used_updates(workdir, monkeypatch):
+    import embedding_cache
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_TOUCH_BATCH", 2)
+    path = str(workdir / "cache.sqlite3")
+    cache = EmbeddingCache(path)
+    for text in ("a", "b", "c"):
+        cache.put(text, fake_embedding(text), MODEL)
+    last_used = lambda: dict(cache._conn.execute("SELECT key, last_used FROM embeddings"))
+    before = last_used()
+
+    cache.get("a", MODEL)
+    assert last_used() == before  # 아직 모아 두는 중
+    cache.get("b", MODEL)
+    after = last_used()
+    assert after[cache.make_key("a", MODEL)] > before[cache.make_key("a", MODEL)]
+    assert after[cache.make_key("c", MODEL)] == before[cache.make_key("c", MODEL)]
+
+    cache.get("c", MODEL)
+    cache.flush()
+    assert last_used()[cache.make_key("c", MODEL)] > before[cache.make_key("c", MODEL)]
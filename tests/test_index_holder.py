@@ -0,0 +1,28 @@
+from faiss_store import get_index_holder, read_build_manifest, save_embeddings_to_faiss
+from stub_openai import fake_embedding
+
+TEXTS = ["Shipment is handled by the exporter.", "Document is required for customs clearance."]
+
+def _publish(texts=TEXTS):
+    save_embeddings_to_faiss(texts, [fake_embedding(t) for t in texts], ids=list(range(1, len(texts) + 1)))
+    return read_build_manifest()["version"]
+
+def test_holder_loads_once_and_follows_new_versions():
+    version = _publish()
+    holder = get_index_holder()
+
+    snapshot = holder.pin()
+    assert holder.pin() is snapshot and holder.version == version
+
+    newer = _publish(TEXTS + ["Sensor triggers an alert if temperature is low."])
+    assert holder.pin() is not snapshot and holder.version == newer
+
+def test_pinned_snapshot_survives_publish():
+    _publish()
+    holder = get_index_holder()
+    with holder.pinned() as snapshot:
+        _publish(TEXTS + ["Sensor triggers an alert if temperature is low."])
+        # 고정한 스냅샷은 새 버전이 게시돼도 처음 버전을 그대로 읽는다
+        assert holder.pin() is snapshot
+        assert snapshot.index.ntotal == len(TEXTS)
+    assert holder.pin().index.ntotal == len(TEXTS) + 1
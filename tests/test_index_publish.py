@@ -0,0 +1,77 @@
+import glob
+import os
+import numpy as np
+import pytest
+
+import faiss_store
+from faiss_store import (
+    BUILD_DIR, VERSION_FILE, get_index_holder, load_content_hashes, read_build_manifest,
+    save_embeddings_to_faiss, search_faiss_scored, update_faiss_index
+)
+from stub_openai import fake_embedding
+
+TEXTS = ["Shipment is handled by the exporter.", "Document is required for customs clearance."]
+
+def _builds():
+    return sorted(glob.glob(f"{BUILD_DIR}.*"))
+
+def _publish(texts=TEXTS):
+    save_embeddings_to_faiss(texts, [fake_embedding(t) for t in texts], ids=list(range(1, len(texts) + 1)))
+    return read_build_manifest()["version"]
+
+def test_publish_writes_complete_build_and_pointer():
+    version = _publish()
+
+    with open(VERSION_FILE, encoding="utf-8") as f:
+        assert f.read() == version
+    assert _builds() == [f"{BUILD_DIR}.{version}"]
+    build_dir = _builds()[0]
+    assert sorted(os.listdir(build_dir)) == ["index.faiss", "manifest.json", "metadata"]
+    assert not glob.glob("*.tmp")
+    assert read_build_manifest()["count"] == len(TEXTS)
+
+def test_old_builds_are_collected(monkeypatch):
+    versions = [_publish() for _ in range(4)]
+
+    kept = [f"{BUILD_DIR}.{v}" for v in versions[-faiss_store.KEEP_VERSIONS:]]
+    assert _builds() == kept
+    assert get_index_holder().version == versions[-1]
+
+def test_other_process_picks_up_published_build():
+    version = _publish()
+    serving = faiss_store.FaissIndexHolder()  # 같은 디렉터리를 읽는 다른 프로세스
+    old = serving.pin()
+
+    newer = _publish(TEXTS + ["Sensor triggers an alert if temperature is low."])
+
+    assert serving.pin().version == newer and serving.pin().index.ntotal == len(TEXTS) + 1
+    # 먼저 잡은 스냅샷은 교체 뒤에도 자기 버전의 인덱스와 메타데이터를 그대로 읽는다
+    assert old.version == version and old.index.ntotal == len(old.metadata) == len(TEXTS)
+    assert old.metadata[1] == TEXTS[0]
+
+def test_failed_publish_keeps_previous_version(monkeypatch):
+    version = _publish()
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(faiss_store.faiss, "write_index", fail)
+    with pytest.raises(OSError):
+        _publish(TEXTS + ["never published"])
+
+    assert read_build_manifest()["version"] == version
+    assert _builds() == [f"{BUILD_DIR}.{version}"]
+    assert not glob.glob("*.tmp")
+    assert len(search_faiss_scored(fake_embedding(TEXTS[0]), k=5)) == len(TEXTS)
+
+def test_incremental_update_publishes_new_version():
+    version = _publish()
+    changed = "Shipment is handled by the importer."
+
+    update_faiss_index([1], [changed], np.stack([fake_embedding(changed)]), [1])
+
+    assert read_build_manifest()["version"] != version
+    hashes = load_content_hashes()
+    assert set(hashes) == {1, 2}
+    (text, score, meta), *_ = search_faiss_scored(fake_embedding(changed), k=1)
+    assert text == changed and meta["id"] == 1 and score == pytest.approx(1.0, abs=1e-4)
@@ -0,0 +1,89 @@
+import glob
+import numpy as np
+import pytest
+
+import faiss_store
+from conftest import DOCUMENTS
+from faiss_store import (
+    IndexBuilder, search_context_ids, search_faiss_batch, search_faiss_scored
+)
+from stub_openai import fake_embedding
+
+ALL_INDEX_TYPES = ("flat", "sq_fp16", "sq8", "ivf_flat", "ivf_pq", "hnsw")
+
+@pytest.mark.parametrize("index_type", ALL_INDEX_TYPES)
+def test_k_larger_than_index_returns_only_valid_ids(publish, index_type):
+    publish(index_type)
+    query = fake_embedding(DOCUMENTS[3][1])
+
+    results = search_faiss_scored(query, k=50)
+    assert 0 < len(results) <= len(DOCUMENTS)
+    assert {meta["id"] for _, _, meta in results} <= {d[0] for d in DOCUMENTS}
+
+    rules = search_faiss_scored(query, k=50, kinds=["rule"])
+    assert [meta["id"] for _, _, meta in rules] == [6]
+
+    (batch,) = search_faiss_batch(np.stack([query]), k=50)
+    assert set(batch) <= {d[1] for d in DOCUMENTS}
+
+    ids, metadata = search_context_ids(query, DOCUMENTS[3][1], k=50, hops=1)
+    assert ids and all(i in metadata for i in ids)
+
+def test_graph_expansion_adds_neighbors(publish):
+    publish()
+    query = fake_embedding(DOCUMENTS[3][1])
+
+    without, _ = search_context_ids(query, k=1, hops=0)
+    with_neighbors, _ = search_context_ids(query, k=1, hops=1)
+
+    assert without == [4]
+    assert with_neighbors == [4, 1]
+
+def _self_similarities(index_type, pca_dim, metric):
+    vectors = np.stack([fake_embedding(f"sentence {i}") for i in range(300)])
+    builder = IndexBuilder(index_type, pca_dim, metric)
+    builder.add(np.arange(1, 301), vectors)
+    index = faiss_store.apply_search_params(builder.finish())
+    snapshot = faiss_store.IndexSnapshot(index, {}, None)
+    similarities, ids, _ = snapshot.search(vectors[:20], 1)
+    assert ids[:, 0].tolist() == list(range(1, 21))
+    return similarities[:, 0]
+
+# 양자화 종류는 복원 오차만큼 1보다 작다 (ivf_pq는 벡터가 적어 ivf_flat으로 대체된다)
+SELF_SIMILARITY_TOLERANCE = {"sq8": 0.02}
+
+@pytest.mark.parametrize("pca_dim", [0, 64])
+@pytest.mark.parametrize("index_type", ALL_INDEX_TYPES)
+def test_self_similarity_is_one(index_type, pca_dim):
+    similarities = _self_similarities(index_type, pca_dim, "cosine")
+    tolerance = SELF_SIMILARITY_TOLERANCE.get(index_type, 1e-3)
+    assert similarities == pytest.approx(np.ones(len(similarities)), abs=tolerance)
+
+@pytest.mark.parametrize("pca_dim", [0, 64])
+def test_self_similarity_is_one_for_l2(pca_dim):
+    similarities = _self_similarities("flat", pca_dim, "l2")
+    assert similarities == pytest.approx(np.ones(len(similarities)), abs=1e-3)
+
+def test_builder_trains_on_bounded_sample(monkeypatch, workdir):
+    trained = []
+    original = faiss_store.build_index
+
+    def spy(vectors, *args, **kwargs):
+        trained.append(len(vectors))
+        return original(vectors, *args, **kwargs)
+
+    monkeypatch.setattr(faiss_store, "build_index", spy)
+    vectors = np.stack([fake_embedding(f"sentence {i}") for i in range(300)])
+    builder = IndexBuilder("ivf_flat", 0, "cosine", train_sample=50)
+    for start in range(0, 300, 64):
+        builder.add(np.arange(start + 1, min(start + 64, 300) + 1), vectors[start:start + 64])
+    assert glob.glob(str(workdir / ".vectors_spool.*"))
+
+    index = builder.finish()
+
+    assert trained == [50]
+    assert index.ntotal == 300
+    assert not glob.glob(str(workdir / ".vectors_spool.*"))
+    snapshot = faiss_store.IndexSnapshot(faiss_store.apply_search_params(index, nprobe=1), {}, None)
+    _, ids, _ = snapshot.search(vectors[250:260], 1)
+    assert ids[:, 0].tolist() == list(range(251, 261))
@@ -0,0 +1,63 @@
+import pytest
+
+import rag_query
+from conftest import DOCUMENTS
+from faiss_store import search_context_ids
+from stub_openai import fake_embedding
+
+RULE_TEXT = DOCUMENTS[5][1]
+DOCUMENT_TEXT = DOCUMENTS[3][1]
+
+@pytest.mark.parametrize("question, kinds", [
+    ("What rules apply to EXW?", ["rule"]),
+    ("EXW 규칙은 무엇인가요?", ["rule"]),
+    ("SWRL로 정의된 내용은?", ["rule"]),
+    ("rule은 몇 개인가요?", ["rule"]),
+    ("적용되는 규칙들을 알려줘", ["rule"]),
+    ("규칙적으로 운송되는 화물은?", None),
+    ("규칙적인 선적 일정은?", None),
+    ("Who is the ruler of the port?", None),
+    ("Can the importer overrule the carrier?", None),
+    ("documentHBL1의 문서 번호는?", None),
+])
+def test_detect_kinds_matches_whole_tokens(question, kinds):
+    assert rag_query.detect_kinds(question) == kinds
+
+def test_rule_question_searches_only_rules(publish):
+    publish()
+
+    context = rag_query.retrieve("EXW 규칙은?", fake_embedding(RULE_TEXT), top_k=3)
+
+    assert context == [RULE_TEXT]
+
+def test_weak_rule_match_falls_back_to_all_kinds(publish):
+    publish()
+
+    # 규칙 키워드가 있지만 질문 벡터는 개체 문장과 같다 → 규칙의 최고 유사도가 기준 미만
+    context = rag_query.retrieve("documentHBL1 규칙", fake_embedding(DOCUMENT_TEXT), top_k=1)
+
+    assert context[0] == DOCUMENT_TEXT
+
+def test_fallback_only_on_empty_when_threshold_is_zero(publish, monkeypatch):
+    publish()
+    monkeypatch.setattr(rag_query, "KIND_FALLBACK_SIMILARITY", 0.0)
+
+    context = rag_query.retrieve("documentHBL1 규칙", fake_embedding(DOCUMENT_TEXT), top_k=1)
+
+    assert context == [RULE_TEXT]
+
+def test_rule_question_without_rules_falls_back(publish):
+    publish(documents=DOCUMENTS[:5])
+
+    context = rag_query.retrieve("EXW 규칙은?", fake_embedding(DOCUMENT_TEXT), top_k=1)
+
+    assert context[0] == DOCUMENT_TEXT
+
+def test_graph_expansion_respects_kind_filter(publish):
+    publish()
+    query = fake_embedding(DOCUMENTS[3][1])
+
+    ids, metadata = search_context_ids(query, k=1, hops=1, kinds=["individual"])
+    assert ids == [4, 1]
+    ids, metadata = search_context_ids(query, k=1, hops=1, kinds=["rule"])
+    assert ids == [6]
@@ -0,0 +1,35 @@
+import glob
+import os
+import numpy as np
+
+from metadata_store import MetadataStore, MetadataWriter, content_hash
+
+def test_store_round_trips_columns_through_mmap(workdir):
+    MetadataStore.write("metadata", [5, 2], ["다섯", "two"], uris=["urn:test:5", None], kinds=["class", "individual"])
+
+    store = MetadataStore("metadata")
+    assert isinstance(store.ids, np.memmap)
+    assert list(store.records()) == [
+        {"id": 2, "text": "two", "uri": None, "kind": "individual", "hash": content_hash("two").hex(), "parent": None},
+        {"id": 5, "text": "다섯", "uri": "urn:test:5", "kind": "class", "hash": content_hash("다섯").hex(), "parent": None},
+    ]
+    assert 3 not in store and store.get(3) is None
+    assert store.ids_of_kinds(["class"]).tolist() == [5]
+    assert sorted(os.listdir(workdir)) == ["metadata", "ontology"]
+
+def test_metadata_writer_sorts_streamed_rows(workdir):
+    writer = MetadataWriter()
+    writer.add(30, "세 번째 문장", "urn:test:30", "rule")
+    writer.add(10, "first", None, "individual", 10)
+    writer.add(20, "", "urn:test:20", None, 10)
+    writer.write("metadata")
+
+    store = MetadataStore("metadata")
+    assert store.ids.tolist() == [10, 20, 30]
+    assert [store[i] for i in (10, 20, 30)] == ["first", "", "세 번째 문장"]
+    assert store.get(30) == {
+        "id": 30, "text": "세 번째 문장", "uri": "urn:test:30", "kind": "rule",
+        "hash": content_hash("세 번째 문장").hex(), "parent": None,
+    }
+    assert store.parent_of(20) == 10 and store.uri_at(0) is None
+    assert not glob.glob(str(workdir / ".metadata_spool.*"))
@@ -0,0 +1,46 @@
+import json
+import logging
+import socket
+import urllib.request
+
+import metrics
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_metrics_server_starts_once_from_env(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    assert metrics.start_metrics_server_from_env(0) is None
+
+    port = _free_port()
+    server = metrics.start_metrics_server_from_env(port)
+    try:
+        assert metrics.start_metrics_server_from_env(port) is server
+        metrics.observe_duration("test_stage", 0.01)
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode("utf-8")
+        assert 'stage="test_stage"' in body
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_json_metrics_logger_writes_bare_json_lines(monkeypatch, workdir):
+    path = workdir / "metrics.jsonl"
+    monkeypatch.setattr(metrics, "METRICS_JSON_LOG", True)
+    monkeypatch.setattr(metrics, "METRICS_JSON_FILE", str(path))
+    monkeypatch.setattr(metrics.json_logger, "handlers", [])
+    monkeypatch.setattr(metrics.json_logger, "propagate", True)
+    metrics._configure_json_logger()
+    try:
+        metrics.observe_duration("test_stage", 0.5, mode="batch")
+    finally:
+        for handler in metrics.json_logger.handlers:
+            handler.close()
+
+    with open(path, encoding="utf-8") as f:
+        event = json.loads(f.readline())
+    assert event == {"metric": "stage_duration", "stage": "test_stage", "status": "ok", "seconds": 0.5, "mode": "batch"}
+    assert metrics.json_logger.propagate is False
+    assert metrics.json_logger.level == logging.INFO
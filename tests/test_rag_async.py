@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import embedding
+import rag_query
+from answer_cache import AnswerCache
+from conftest import DOCUMENTS
+from embedding_cache import EmbeddingCache
+
+def _record_threads(obj, names, monkeypatch):
+    threads = []
+    for name in names:
+        original = getattr(obj, name)
+
+        def spy(*args, _original=original, **kwargs):
+            threads.append(threading.current_thread())
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(obj, name, spy)
+    return threads
+
+def test_async_embedding_cache_runs_off_the_event_loop(workdir, monkeypatch):
+    cache = EmbeddingCache(str(workdir / "cache.sqlite3"))
+    monkeypatch.setattr(embedding, "_cache", cache)
+    monkeypatch.setattr(embedding, "EMBEDDING_CACHE_ENABLED", True)
+    threads = _record_threads(cache, ["get", "put"], monkeypatch)
+
+    async def main():
+        first = await embedding.get_embedding_async("hello")
+        second = await embedding.get_embedding_async("hello")
+        return first, second, threading.current_thread()
+
+    first, second, loop_thread = asyncio.run(main())
+
+    assert first == second and len(cache) == 1
+    assert len(threads) == 3  # 조회(실패) → 기록 → 조회(적중)
+    assert loop_thread not in threads
+
+def test_async_answer_cache_runs_off_the_event_loop(publish, monkeypatch):
+    publish()
+    cache = AnswerCache()
+    monkeypatch.setattr(rag_query, "answer_cache", cache)
+    threads = _record_threads(cache, ["get_exact", "get_semantic", "put"], monkeypatch)
+    question = DOCUMENTS[3][1]
+
+    async def main():
+        first = await rag_query.generate_answer_async(question)
+        second = await rag_query.generate_answer_async(question)
+        return first, second, threading.current_thread()
+
+    first, second, loop_thread = asyncio.run(main())
+
+    assert first == second and first.startswith("(stub)")
+    assert cache.stats()["exact_hits"] == 1
+    assert len(threads) == 4  # 정확 일치(실패) → 의미 캐시(실패) → 기록 → 정확 일치(적중)
+    assert loop_thread not in threads
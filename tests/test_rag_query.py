@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import rag_query
+from answer_cache import AnswerCache
+from conftest import DOCUMENTS
+from faiss_store import current_index_version
+from stub_openai import fake_embedding
+
+RULE_TEXT = DOCUMENTS[5][1]
+
+def test_generate_answer_stream_yields_tokens_as_they_arrive(publish, monkeypatch):
+    publish()
+    monkeypatch.setattr(rag_query, "answer_cache", AnswerCache())
+    question = "EXW 조건이면 누가 운송하나요?"
+
+    tokens = list(rag_query.generate_answer_stream(question))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == f"(stub) {question}"
+
+def _fresh_cache(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(rag_query, "answer_cache", cache)
+    return cache
+
+def test_completed_stream_is_cached(publish, monkeypatch):
+    publish()
+    cache = _fresh_cache(monkeypatch)
+    question = "EXW 조건이면 누가 운송하나요?"
+
+    answer = "".join(rag_query.generate_answer_stream(question))
+
+    assert cache.stats()["entries"] == 1
+    assert rag_query.generate_answer(question) == answer
+    assert cache.stats()["exact_hits"] == 1
+
+def test_stream_closed_early_is_not_cached(publish, monkeypatch):
+    publish()
+    cache = _fresh_cache(monkeypatch)
+    tokens = rag_query.generate_answer_stream("EXW 조건이면 누가 운송하나요?")
+
+    next(tokens)
+    tokens.close()
+
+    assert cache.stats()["entries"] == 0
+
+def test_empty_stream_is_not_cached(publish, monkeypatch):
+    publish()
+    cache = _fresh_cache(monkeypatch)
+    finished = SimpleNamespace(
+        usage=None, choices=[SimpleNamespace(finish_reason="stop", delta=SimpleNamespace(content=None))]
+    )
+    monkeypatch.setattr(rag_query.client.chat.completions, "create", lambda **_: iter([finished]))
+    question = "EXW 조건이면 누가 운송하나요?"
+
+    assert "".join(rag_query.generate_answer_stream(question)) == ""
+
+    assert cache.stats()["entries"] == 0
+    assert cache.get_exact(question, current_index_version(), 5) is None
+
+def test_answer_is_cached_under_the_version_it_was_built_from(publish, monkeypatch):
+    publish()
+    version = current_index_version()
+    cache = _fresh_cache(monkeypatch)
+    contexts = []
+    original_embedding, original_messages = rag_query.get_embedding, rag_query.build_messages
+
+    def embed_then_publish(text):
+        # 질문을 임베딩하는 사이에 규칙이 없는 새 버전이 게시된다
+        publish(documents=DOCUMENTS[:5])
+        return fake_embedding(RULE_TEXT)
+
+    def record(question, context):
+        contexts.append(list(context))
+        return original_messages(question, context)
+
+    monkeypatch.setattr(rag_query, "get_embedding", embed_then_publish)
+    monkeypatch.setattr(rag_query, "build_messages", record)
+    rag_query.generate_answer("EXW 규칙은?", top_k=1)
+
+    assert current_index_version() != version
+    assert contexts == [[RULE_TEXT]]
+    assert [key[0] for key in cache._entries] == [version]
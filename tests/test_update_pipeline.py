@@ -0,0 +1,144 @@
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+from faiss_store import load_content_hashes, read_build_manifest
+
+FWD = "http://www.qlinx.co.kr/ontology/forwarding#"
+DOCUMENT_NUMBER = URIRef(FWD + "hasDocumentNumber")
+
+@pytest.fixture
+def update_pipeline(workdir):
+    # import 시점에 작업 디렉터리에 pipeline.log를 여므로 테스트 디렉터리로 옮긴 뒤 불러온다
+    import update_pipeline
+    return update_pipeline
+
+def _copy(graph):
+    copy = Graph()
+    copy += graph
+    return copy
+
+def _spy_updates(update_pipeline, monkeypatch):
+    calls = []
+    original = update_pipeline.update_faiss_index
+
+    def spy(added_ids, added_sentences, added_embeddings, removed_ids, **kwargs):
+        calls.append({"added": list(added_sentences), "removed": list(removed_ids)})
+        return original(added_ids, added_sentences, added_embeddings, removed_ids, **kwargs)
+
+    monkeypatch.setattr(update_pipeline, "update_faiss_index", spy)
+    return calls
+
+def test_full_build_from_fuseki(update_pipeline, fuseki, ontology_graph, embedded):
+    fuseki(ontology_graph)
+    update_pipeline.main(incremental=False, source="fuseki")
+
+    manifest = read_build_manifest()
+    assert manifest["count"] == len(load_content_hashes()) == len(embedded)
+    assert manifest["source"] == "fuseki"
+    assert manifest["kinds"]["rule"] == 6
+
+def test_incremental_unchanged_input_embeds_nothing(update_pipeline, fuseki, ontology_graph, embedded, monkeypatch):
+    fuseki(ontology_graph)
+    update_pipeline.main(incremental=False, source="fuseki")
+    version = read_build_manifest()["version"]
+    embedded.clear()
+    updates = _spy_updates(update_pipeline, monkeypatch)
+
+    update_pipeline.main(incremental=True, source="fuseki")
+
+    assert embedded == []
+    assert updates == []
+    assert read_build_manifest()["version"] == version
+
+def test_incremental_changed_literal_reembeds_one(update_pipeline, fuseki, ontology_graph, embedded, monkeypatch):
+    fuseki(ontology_graph)
+    update_pipeline.main(incremental=False, source="fuseki")
+    before = load_content_hashes()
+    embedded.clear()
+    updates = _spy_updates(update_pipeline, monkeypatch)
+
+    changed = _copy(ontology_graph)
+    subject = URIRef(FWD + "documentHBL1")
+    changed.set((subject, DOCUMENT_NUMBER, Literal("HBL9999")))
+    fuseki(changed)
+    update_pipeline.main(incremental=True, source="fuseki")
+
+    assert len(embedded) == 1 and "HBL9999" in embedded[0]
+    assert len(updates) == 1
+    assert len(updates[0]["removed"]) == 1 and updates[0]["added"] == embedded
+    after = load_content_hashes()
+    assert set(after) == set(before)
+    assert sum(after[i] != before[i] for i in after) == 1
+
+def test_local_source_rerun_embeds_nothing(update_pipeline, embedded, monkeypatch):
+    # 로컬 파서는 실행마다 블랭크 노드 라벨을 새로 만든다
+    update_pipeline.main(incremental=False, source="local")
+    version = read_build_manifest()["version"]
+    embedded.clear()
+    updates = _spy_updates(update_pipeline, monkeypatch)
+
+    update_pipeline.main(incremental=True, source="local")
+
+    assert embedded == []
+    assert updates == []
+    assert read_build_manifest()["version"] == version
+    # 블랭크 노드 보조 개체는 문서가 되지 않는다 (룰은 IRI가 없어도 룰 문서로 남는다)
+    assert all(":" in uri or kind == "rule" for uri, kind in _uris_and_kinds())
+
+def test_full_build_streams_documents_to_disk(update_pipeline, monkeypatch, workdir):
+    durations = {}
+    monkeypatch.setattr(update_pipeline, "observe_duration", lambda stage, seconds, **_: durations.setdefault(stage, seconds))
+
+    update_pipeline.main(incremental=False, source="local")
+
+    manifest = read_build_manifest()
+    assert durations["sentence_conversion"] > 0
+    with open(update_pipeline.SENTENCE_LOG_FILE, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == manifest["documents"] >= manifest["count"]
+    # 메타데이터·벡터 임시 파일은 게시 뒤 남지 않는다
+    assert not list(workdir.glob(".*_spool.*"))
+
+def test_incremental_fallback_refetches_source(update_pipeline, fuseki, ontology_graph, monkeypatch):
+    fuseki(ontology_graph)
+    update_pipeline.main(incremental=False, source="fuseki")
+    version = read_build_manifest()["version"]
+    changed = _copy(ontology_graph)
+    changed.set((URIRef(FWD + "documentHBL1"), DOCUMENT_NUMBER, Literal("HBL9999")))
+    fuseki(changed)
+
+    def refuse(*args, **kwargs):
+        raise ValueError("증분 불가")
+
+    fetches = []
+    original = update_pipeline.load_ontology_elements
+    monkeypatch.setattr(update_pipeline, "update_faiss_index", refuse)
+    monkeypatch.setattr(update_pipeline, "load_ontology_elements", lambda source: fetches.append(source) or original(source))
+    update_pipeline.main(incremental=True, source="fuseki")
+
+    assert fetches == ["fuseki", "fuseki"]
+    assert read_build_manifest()["version"] != version
+    assert any("HBL9999" in r["text"] for r in _records())
+
+@pytest.mark.parametrize("failing", ["build_index", "publish_index"])
+def test_failed_full_build_leaves_no_spool_files(update_pipeline, monkeypatch, workdir, failing):
+    import faiss_store
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("실패")
+
+    # 학습이 필요한 종류로 만들어 벡터도 임시 파일을 거치게 한다
+    monkeypatch.setattr(update_pipeline, "IndexBuilder", lambda: faiss_store.IndexBuilder("sq8", 0))
+    monkeypatch.setattr(faiss_store if failing == "build_index" else update_pipeline, failing, fail)
+
+    with pytest.raises(RuntimeError):
+        update_pipeline.main(incremental=False, source="local")
+
+    assert not list(workdir.glob(".*_spool.*"))
+    assert read_build_manifest() is None
+
+def _records():
+    from faiss_store import get_index_holder
+    return list(get_index_holder().pin().metadata.records())
+
+def _uris_and_kinds():
+    return [(r["uri"], r["kind"]) for r in _records()]
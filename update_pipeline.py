@@ -1,16 +1,30 @@
+import os
+import time
+import hashlib
+import argparse
 import logging
+import threading
+import numpy as np
 from datetime import datetime
+from typing import Optional
 
-from fuseki_query import (
-    get_classes,
-    get_object_properties,
-    get_data_properties,
-    get_individuals_with_literals_and_relations,
-    get_swrl_rules,
+from fuseki_query import fetch_ontology_elements
+from ontology_to_text import iter_ontology_documents, document_key
+from embedding import (
+    EMBEDDING_BATCH_MAX_CHARS, EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL, embed_sentences_batched, get_embedding_cache
 )
-from ontology_to_text import ontology_elements_to_sentences
-from embedding import get_embedding
-from faiss_store import save_faiss_index
+from faiss_store import IndexBuilder, publish_index, update_faiss_index, assign_element_ids, load_content_hashes
+from metadata_store import MetadataWriter, content_hash
+from graph_index import EdgeCollector
+from metrics import timed, count_items, observe_duration, write_prometheus
+from openai_clients import RETRYABLE_ERRORS, retry_delay
+from pipeline_stages import Pipeline
+
+ONTOLOGY_SOURCE = os.getenv("ONTOLOGY_SOURCE", "fuseki")  # fuseki | local (RDF/XML 파일 직접 파싱)
+METRICS_FILE = os.getenv("PIPELINE_METRICS_FILE", "pipeline_metrics.prom")  # 실행이 끝나면 단계별 지표를 Prometheus 텍스트로 기록
+EMBED_IN_FLIGHT = int(os.getenv("PIPELINE_EMBED_IN_FLIGHT", "4"))  # 동시에 보내는 임베딩 요청 수
+EMBED_MAX_RETRIES = 6  # 속도 제한·일시 오류로 배치 하나를 다시 보내는 횟수
+INDIVIDUAL_QUEUE_SIZE = 1024  # 수신 단계와 변환 단계 사이에 쌓아 둘 개체 수
 
 # 로깅 설정
 logging.basicConfig(
@@ -25,44 +39,245 @@ logging.basicConfig(
 timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 SENTENCE_LOG_FILE = f"sentences_{timestamp}.log"
 
-def save_sentences_to_file(sentences, filename=SENTENCE_LOG_FILE):
-    with open(filename, "w", encoding="utf-8") as f:
-        for i, sentence in enumerate(sentences, 1):
-            f.write(f"{i}. {sentence}\n")
-    logging.info(f"📝 자연어 문장 {len(sentences)}개를 '{filename}'에 저장 완료")
-
-def main():
-    logging.info("🚀 Fuseki에서 온톨로지 요소 가져오는 중...")
-    classes = get_classes()
-    object_props = get_object_properties()
-    data_props = get_data_properties()
-    individuals = get_individuals_with_literals_and_relations()
-    swrl_rules = get_swrl_rules()
-    logging.info("✅ 온톨로지 요소 불러오기 완료")
-
-    logging.info("🧠 자연어 문장으로 변환 중...")
-    sentences = ontology_elements_to_sentences(
-        classes, object_props, data_props, individuals, swrl_rules
+def build_info(document_hashes, source: str):
+    """빌드 매니페스트에 남길 원본 정보: 임베딩 모델, 원본 종류, 문서 내용 해시 (로컬이면 파일 해시도).
+
+    document_hashes는 문서마다 content_hash(f"{document_key}\t{text}") 값이다.
+    """
+    digest = hashlib.sha256()
+    for h in sorted(document_hashes):
+        digest.update(h)
+    info = {
+        "embedding_model": EMBEDDING_MODEL,
+        "source": source,
+        "documents": len(document_hashes),
+        "documents_hash": digest.hexdigest(),
+    }
+    if source == "local":
+        from ontology_loader import ONTOLOGY_FILE
+        with open(ONTOLOGY_FILE, "rb") as f:
+            info["source_file"] = ONTOLOGY_FILE
+            info["source_file_hash"] = hashlib.sha256(f.read()).hexdigest()
+    return info
+
+class _RateLimitGate:
+    """한 요청이 속도 제한에 걸리면 다른 임베딩 작업 스레드도 같은 시각까지 새 요청을 멈춘다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until = 0.0
+
+    def wait(self):
+        delay = self._until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def block(self, seconds: float):
+        with self._lock:
+            self._until = max(self._until, time.monotonic() + seconds)
+
+def embed_batch_with_retry(texts, gate: _RateLimitGate):
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        gate.wait()
+        try:
+            return embed_sentences_batched(texts)
+        except RETRYABLE_ERRORS as e:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            delay = retry_delay(e, attempt)
+            gate.block(delay)
+            logging.warning(f"⏳ 임베딩 {type(e).__name__} → {delay:.1f}초 후 재시도 ({attempt + 1}/{EMBED_MAX_RETRIES})")
+
+class _BuildState:
+    """파이프라인 단계들이 채우는 문서별 요약 (ID, 내용 해시, 관계).
+
+    문서 본문은 큐에 떠 있는 동안만 메모리에 있고, 문장 파일·메타데이터 저장소에는 받는 대로 흘려 쓴다.
+    증분 업데이트면 바뀐 문서만 added에 남긴다.
+    """
+
+    def __init__(self):
+        self.hashes = {}  # ID → 문장 내용 해시 (증분 비교용)
+        self.document_hashes = []  # 빌드 매니페스트의 원본 해시용
+        self.edges = EdgeCollector()
+        self.embedded_ids = set()
+        self.added = []  # 증분: (ID, 문서, 부모 ID)
+        self.added_vectors = []
+        self.complete = False  # 모든 단계가 끝까지 돌았는지 (문서 목록이 온전한지)
+
+def _document_batches(documents, previous_hashes, state: _BuildState, sentence_log):
+    """문서마다 ID·부모 ID를 붙여 기록하고, 임베딩할 문서(전체 재구축이면 전부, 증분이면 바뀐 것)를 배치로 묶는다."""
+    seen, first_chunk = {}, {}
+    batch, chars = [], 0
+    for n, document in enumerate(documents, 1):
+        key = document_key(document)
+        id_ = assign_element_ids([key], seen)[0]
+        # 여러 조각으로 나뉜 개체는 첫 조각의 ID를 부모로 가진다 (첫 조각이 항상 먼저 나온다)
+        if document.get("parent") and document.get("chunk") == 0:
+            first_chunk[document["parent"]] = id_
+        text = document["text"]
+        sentence_log.write(f"{n}. {text}\n")
+        h = content_hash(text).hex()
+        state.hashes[id_] = h
+        state.document_hashes.append(content_hash(f"{key}\t{text}"))
+        state.edges.add(document, id_)
+        if previous_hashes is not None and previous_hashes.get(id_) == h:
+            continue
+        if batch and (len(batch) >= EMBEDDING_BATCH_SIZE or chars + len(text) > EMBEDDING_BATCH_MAX_CHARS):
+            yield batch
+            batch, chars = [], 0
+        batch.append((id_, document, first_chunk.get(document.get("parent"))))
+        chars += len(text)
+    if batch:
+        yield batch
+
+def stream_documents(pipeline: Pipeline, elements):
+    """개체 수신(SPARQL 스트림)은 별도 단계로 돌리고, 변환 단계가 받은 개체부터 문장으로 바꾼다."""
+    individuals = pipeline.new_queue(INDIVIDUAL_QUEUE_SIZE)
+    pipeline.source("fetch", elements["individuals"], individuals)
+    return iter_ontology_documents(
+        elements["classes"], elements["object_props"], elements["data_props"],
+        pipeline.drain(individuals, "convert"), elements["rules"]
     )
-    logging.info(f"✅ 총 {len(sentences)}개의 문장 생성")
-    save_sentences_to_file(sentences)
 
-    logging.info("🔍 OpenAI 임베딩 생성 중...")
-    embeddings = []
-    valid_sentences = []
-    for sentence in sentences:
+def run_build(pipeline: Pipeline, documents, previous_hashes, source: str, state: Optional[_BuildState] = None) -> _BuildState:
+    """변환 → 임베딩(요청 여러 개 동시) → 인덱스 추가를 크기 제한 큐로 이어 동시에 돌린 뒤 저장한다.
+
+    previous_hashes가 있으면 바뀐 문서만 임베딩해 증분 업데이트하고, 없으면 전체를 새로 만든다.
+    """
+    state = _BuildState() if state is None else state
+    full = previous_hashes is None
+    builder = IndexBuilder() if full else None
+    metadata = MetadataWriter() if full else None
+    gate = _RateLimitGate()
+
+    def embed(batch):
+        vectors, valid = embed_batch_with_retry([document["text"] for _, document, _ in batch], gate)
+        return [batch[i] for i in valid], vectors
+
+    def insert(item):
+        batch, vectors = item
+        state.embedded_ids.update(id_ for id_, _, _ in batch)
+        if builder is not None:
+            builder.add([id_ for id_, _, _ in batch], vectors)
+            for id_, document, parent in batch:
+                metadata.add(id_, document["text"], document["uri"], document["kind"], parent)
+        else:
+            state.added.extend(batch)
+            state.added_vectors.append(vectors)
+
+    batches, embedded = pipeline.new_queue(), pipeline.new_queue()
+    logging.info(f"🔍 변환·임베딩(동시 요청 {EMBED_IN_FLIGHT}개)·인덱스 추가를 함께 진행합니다...")
+    try:
+        with open(SENTENCE_LOG_FILE, "w", encoding="utf-8") as sentence_log:
+            pipeline.source("convert", _document_batches(documents, previous_hashes, state, sentence_log), batches, count=len)
+            pipeline.stage("embed", embed, batches, embedded, workers=EMBED_IN_FLIGHT, count=len)
+            pipeline.stage("index", insert, embedded, count=lambda item: len(item[0]))
+            pipeline.join()
+    except BaseException:
+        if builder is not None:
+            builder.discard()
+            metadata.discard()
+        raise
+    pipeline.report()
+    state.complete = True
+
+    # 개체 수신을 기다린 시간은 빼고 문장 변환에 쓴 시간만
+    observe_duration("sentence_conversion", pipeline.stats["convert"].busy_seconds)
+    count_items("sentence_conversion", len(state.hashes))
+    logging.info(f"✅ 총 {len(state.hashes)}개의 문장 생성, 임베딩 {len(state.embedded_ids)}개")
+    logging.info(f"📝 자연어 문장 {len(state.hashes)}개를 '{SENTENCE_LOG_FILE}'에 저장 완료")
+    info = build_info(state.document_hashes, source)
+
+    if builder is not None:
+        logging.info("💾 FAISS 인덱스 저장 중...")
         try:
-            emb = get_embedding(sentence)
-            embeddings.append(emb)
-            valid_sentences.append(sentence)
-        except Exception as e:
-            logging.warning(f"❌ 임베딩 실패: '{sentence}' => {e}")
+            publish_index(
+                builder.finish(),
+                metadata,
+                edges=state.edges.edges(allowed=state.embedded_ids),
+                build_info=info,
+            )
+        except BaseException:
+            # 학습·게시에 실패해도 벡터·메타데이터 임시 파일을 남기지 않는다
+            builder.discard()
+            metadata.discard()
+            raise
+        logging.info("✅ FAISS 인덱스 저장 완료")
+        return state
+
+    # 문장이 바뀐 요소는 같은 ID로 삭제 후 다시 추가
+    removed_ids = [i for i, h in previous_hashes.items() if state.hashes.get(i) != h]
+    changed = sum(1 for i, h in state.hashes.items() if previous_hashes.get(i) != h)
+    logging.info(
+        f"🧮 변경 분석: 추가/수정 {changed}개, 삭제/수정 {len(removed_ids)}개, 유지 {len(state.hashes) - changed}개"
+    )
+    if not changed and not removed_ids:
+        logging.info("✅ 변경 사항 없음. FAISS 인덱스를 그대로 유지합니다.")
+        return state
+
+    added = [document for _, document, _ in state.added]
+    logging.info("💾 FAISS 인덱스 증분 업데이트 중...")
+    update_faiss_index(
+        [id_ for id_, _, _ in state.added],
+        [d["text"] for d in added],
+        np.concatenate(state.added_vectors) if state.added_vectors else np.empty((0, 0), dtype="float32"),
+        removed_ids,
+        added_uris=[d["uri"] for d in added],
+        added_kinds=[d["kind"] for d in added],
+        edges=state.edges.edges(),
+        added_parents=[parent for _, _, parent in state.added],
+        build_info=info,
+    )
+    logging.info("✅ FAISS 인덱스 증분 업데이트 완료")
+    return state
+
+def load_ontology_elements(source: str = ONTOLOGY_SOURCE):
+    if source == "local":
+        # rdflib은 로컬 모드에서만 필요하므로 여기서 불러온다
+        from ontology_loader import load_local_ontology_elements
+        logging.info("🚀 로컬 RDF 파일에서 온톨로지 요소 가져오는 중...")
+        return load_local_ontology_elements()
+    if source == "fuseki":
+        logging.info("🚀 Fuseki에서 온톨로지 요소 가져오는 중...")
+        # 개체는 변환 단계에서 스트림으로 소비해 SPARQL 결과 전체를 메모리에 올리지 않는다
+        return fetch_ontology_elements(stream_individuals=True)
+    raise ValueError(f"❌ 지원하지 않는 온톨로지 소스: {source}")
+
+def main(incremental: bool = True, source: str = ONTOLOGY_SOURCE):
+    try:
+        _run(incremental, source)
+    finally:
+        cache = get_embedding_cache()
+        if cache is not None:
+            cache.flush()  # 캐시 적중 항목의 last_used 갱신을 남긴다
+        if METRICS_FILE:
+            write_prometheus(METRICS_FILE)
 
-    logging.info(f"✅ 임베딩 생성 완료: {len(embeddings)}개")
+def _run(incremental: bool, source: str):
+    # 클래스·속성·룰은 먼저 받고, 개체는 스트림으로 받으면서 바로 변환·임베딩한다
+    with timed("ontology_fetch", source=source):
+        elements = load_ontology_elements(source)
+    logging.info("✅ 온톨로지 요소 불러오기 완료: " + ", ".join(
+        f"{k}={len(v)}" for k, v in elements.items() if isinstance(v, list)))
+    get_embedding_cache()  # 작업 스레드들이 같은 캐시를 쓰도록 미리 연다
 
-    logging.info("💾 FAISS 인덱스 저장 중...")
-    save_faiss_index(valid_sentences, embeddings)
-    logging.info("✅ FAISS 인덱스 저장 완료")
+    previous_hashes = load_content_hashes() if incremental else None
+    pipeline, state = Pipeline(), _BuildState()
+    try:
+        run_build(pipeline, stream_documents(pipeline, elements), previous_hashes, source, state)
+    except ValueError as e:
+        # 인덱스 반영 단계에서 증분이 불가능하다고 판단한 경우에만 (문서를 끝까지 받았을 때) 전환
+        if previous_hashes is None or not state.complete:
+            raise
+        logging.warning(f"{e} → 전체 재구축으로 전환")
+        # 문서를 메모리에 남겨 두지 않으므로 원본에서 다시 받는다 (증분에서 임베딩한 문장은 캐시에서 바로 채워진다)
+        elements = load_ontology_elements(source)
+        pipeline = Pipeline()
+        run_build(pipeline, stream_documents(pipeline, elements), None, source)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fuseki 온톨로지로 FAISS 인덱스 갱신")
+    parser.add_argument("--full", action="store_true", help="증분 업데이트 대신 전체 재구축")
+    parser.add_argument("--source", choices=["fuseki", "local"], default=ONTOLOGY_SOURCE, help="온톨로지 추출 경로")
+    args = parser.parse_args()
+    main(incremental=not args.full, source=args.source)